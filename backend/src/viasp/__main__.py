@@ -12,7 +12,7 @@ from clingo.script import enable_python
 from clingo import Control as clingoControl
 
 from viasp.server import startup
-from viasp.shared.defaults import DEFAULT_BACKEND_HOST, DEFAULT_BACKEND_PORT, DEFAULT_FRONTEND_PORT, DEFAULT_FRONTEND_HOST, DEFAULT_BACKEND_PROTOCOL, DEFAULT_COLOR, CLINGRAPH_PATH, GRAPH_PATH, PROGRAM_STORAGE_PATH, STDIN_TMP_STORAGE_PATH, SERVER_PID_FILE_PATH, FRONTEND_PID_FILE_PATH
+from viasp.shared.defaults import DEFAULT_BACKEND_HOST, DEFAULT_BACKEND_PORT, DEFAULT_FRONTEND_PORT, DEFAULT_FRONTEND_HOST, DEFAULT_BACKEND_PROTOCOL, DEFAULT_COLOR, CLINGRAPH_PATH, GRAPH_PATH, PROGRAM_STORAGE_PATH, STDIN_TMP_STORAGE_PATH, SERVER_PID_FILE_PATH, FRONTEND_PID_FILE_PATH, DEFAULT_JOBS
 from viasp.shared.defaults import _
 from viasp.shared.io import clingo_model_to_stable_model, clingo_symbols_to_stable_model
 import viasp.shared.simple_logging
@@ -243,6 +243,12 @@ class ViaspArgumentParser:
         basic.add_argument('--reset',
                            action='store_true',
                            help=_("VIASP_RESET_HELP"))
+        basic.add_argument('-j',
+                           '--jobs',
+                           metavar='<n>',
+                           type=int,
+                           help=_("VIASP_JOBS_HELP"),
+                           default=DEFAULT_JOBS)
 
         # Solving Options
         solving = cmd_parser.add_argument_group(_("CLINGO_SOLVING_OPTION"))
@@ -692,6 +698,7 @@ class ViaspRunner():
         viasp.api.set_config(
             show_all_derived = options.get("show_all_derived", False),
             color_theme = options.get("color", DEFAULT_COLOR),
+            jobs = options.get("jobs", DEFAULT_JOBS),
             viasp_backend_url=self.backend_url)
         if relax:
             self.run_relaxer(encoding_files, options, head_name,
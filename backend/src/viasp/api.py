@@ -21,7 +21,7 @@ import clingo.ast
 from clingo.symbol import Symbol
 import clingo.util
 
-from .shared.defaults import DEFAULT_COLOR
+from .shared.defaults import DEFAULT_COLOR, DEFAULT_JOBS
 from .shared.io import clingo_symbols_to_stable_model
 from .shared.model import StableModel
 from .wrapper import ShowConnector, Control as viaspControl
@@ -803,10 +803,14 @@ def deregister_session(session_id, **kwargs) -> int:
 
 def set_config(show_all_derived=False,
                color_theme=DEFAULT_COLOR,
+               jobs=DEFAULT_JOBS,
                **kwargs):
     r"""
     Get the value of the show_all_derived flag.
 
+    :param jobs: ``int``
+        Number of worker processes used to construct the graph's paths.
+
     Kwargs:
         * *viasp_backend_url* (``str``) --
           url of the viasp backend
@@ -814,4 +818,4 @@ def set_config(show_all_derived=False,
           a viasp client object
     """
     connector = _get_connector(**kwargs)
-    connector.show_all_derived(show_all_derived, color_theme)
+    connector.show_all_derived(show_all_derived, color_theme, jobs)
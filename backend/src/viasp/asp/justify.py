@@ -1,18 +1,34 @@
 """This module is concerned with finding reasons for why a stable model is found."""
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import copyreg
+from dataclasses import replace
+from itertools import count, repeat
 from logging import warning
-from typing import List, Collection, Dict, Iterable, Union, Set, Tuple
+import io
+import multiprocessing
+import pickle
+import threading
+from multiprocessing.connection import Connection
+from typing import Any, Callable, List, Collection, Dict, Iterable, Union, Set, Tuple, Sequence, Optional
+from uuid import uuid4
 
 import networkx as nx
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on windows
+    resource = None
 
-from clingo import Control, Symbol, Model
+from clingo import Control, Symbol, Model, Function, String, parse_term
 
-from clingo.ast import AST, ASTType
+from clingo.ast import AST, ASTType, parse_string
 
-from .reify import ProgramAnalyzer, reify_recursion_transformation, LiteralWrapper
+from .reify import ProgramAnalyzer, reify_recursion_transformation, reify_with_model_index, LiteralWrapper
 from .recursion import RecursionReasoner
 from .utils import insert_atoms_into_nodes, identify_reasons, calculate_spacing_factor, is_constraint, is_minimize
 from ..shared.model import Node, RuleContainer, Transformation, SymbolIdentifier, SearchResultSymbolWrapper
+from ..shared.defaults import SEARCH_CONTEXT_MAX_QUERIES, SEARCH_CONTEXT_CACHE_MAX_ENTRIES, SEARCH_WORKER_MEMORY_LIMIT_BYTES
 from ..shared.simple_logging import info
 from ..shared.util import pairwise, get_leafs_from_graph
 
@@ -51,6 +67,62 @@ def get_h_symbols_from_model(wrapped_stable_model: Iterable[str],
     return rules_that_are_reasons_why
 
 
+def get_h_symbols_from_models(wrapped_stable_models: Sequence[Iterable[str]],
+                              transformed_prg: Collection[Union[str, AST]],
+                              facts: List[Symbol],
+                              constants: List[str],
+                              h="h",
+                              h_showTerm="h_showTerm",
+                              model="model",
+                              model_index="M",
+                              show_all_derived: bool = False) -> List[List[Symbol]]:
+    """
+    Batched version of ``get_h_symbols_from_model``.
+    The reified program is tagged with a model index and grounded once
+    for all models. The resulting h symbols are split by model index.
+
+    :param wrapped_stable_models: The stable models as lists of facts.
+    :param model: The conflict free name of the predicate tagging model atoms.
+    :param model_index: The conflict free name of the model index variable.
+    :return: The h symbols of every model, in the order of the models.
+    """
+    h_symbols_by_model: List[List[Symbol]] = [[] for _ in wrapped_stable_models]
+    if len(wrapped_stable_models) == 0:
+        return h_symbols_by_model
+    ctl = Control()
+    tagged_prg = reify_with_model_index(transformed_prg,
+                                        h_str=h,
+                                        h_showTerm_str=h_showTerm,
+                                        model_str=model,
+                                        model_index_str=model_index)
+    new_head = f"_{h}"
+    if show_all_derived:
+        get_new_atoms_rule = f"{new_head}(M, I, J, H, G) :- {h}(M, I, J, H, G)."
+    else:
+        get_new_atoms_rule = f"{new_head}(M, I, J, H, G) :- {h}(M, I, J, H, G), not {h}(M, II,_,H,_) : II<I, {h}(M, II,_,_,_)."
+    tagged_models = []
+    for i, wrapped_stable_model in enumerate(wrapped_stable_models):
+        tagged_models.extend(f"{model}({i},{fact})." for fact in facts)
+        tagged_models.extend(f"{model}({i},{part.rstrip().rstrip('.')})."
+                             for part in wrapped_stable_model)
+    ctl.add("base", [], "".join(constants))
+    ctl.add("base", [], "\n".join(map(str, tagged_prg)))
+    ctl.add("base", [], "".join(tagged_models))
+    ctl.add("base", [], get_new_atoms_rule)
+    ctl.ground([("base", [])])
+    for x in ctl.symbolic_atoms.by_signature(new_head, 5):
+        model_nr, *arguments = x.symbol.arguments
+        if arguments[2] in facts:
+            continue
+        h_symbols_by_model[model_nr.number].append(
+            Function(new_head, arguments))
+    for x in ctl.symbolic_atoms.by_signature(h_showTerm, 5):
+        model_nr, *arguments = x.symbol.arguments
+        h_symbols_by_model[model_nr.number].append(
+            Function(h_showTerm, arguments))
+    return h_symbols_by_model
+
+
 def get_facts(original_program) -> Collection[Symbol]:
     ctl = Control()
     facts = set()
@@ -106,20 +178,109 @@ def collect_h_symbols_and_create_nodes(
     return h_nodes
 
 
-def make_reason_path_from_facts_to_stable_model(rule_mapping: Dict[int, Transformation],
-                                            fact_node: Node,
-                                            h_symbols: List[Symbol],
-                                            recursive_transformations_hashes: Set[str],
-                                            h="h",
-                                            analyzer: ProgramAnalyzer = ProgramAnalyzer(),
-                                            pad=True) \
-                                            -> nx.DiGraph:
+def make_reason_nodes_from_facts_to_stable_model(
+        rule_nrs: Collection[int],
+        fact_node: Node,
+        h_symbols: List[Symbol],
+        recursion_programs: Dict[int, Tuple[str, str]],
+        h="h",
+        n="n",
+        pad=True,
+        prefix: Optional[List[Node]] = None) -> List[Node]:
+    """
+    Create the sorted list of nodes on the path from the facts to a stable model.
+    Only takes picklable arguments, so that it can be run in a worker process.
+
+    :param rule_nrs: The ids of the transformations that make up the path.
+    :param recursion_programs: Maps the ids of recursive transformations to
+        their recursion justification program and a description used in warnings.
+    :param n: The conflict free name of the iteration index.
+    :param prefix: The already justified beginning of the path, starting with
+        the fact node. Only the nodes after it are created.
+    """
+    if prefix:
+        rule_nrs = [r for r in rule_nrs if r > prefix[-1].rule_nr]
     h_syms: List[Node] = collect_h_symbols_and_create_nodes(
-        h_symbols, rule_mapping, pad)
+        h_symbols, dict.fromkeys(rule_nrs), pad)
     h_syms.sort(key=lambda node: node.rule_nr)
-    h_syms.insert(0, fact_node)
+    first_new_node = len(prefix) if prefix else 1
+    h_syms[0:0] = prefix if prefix else [fact_node]
 
     insert_atoms_into_nodes(h_syms)
+    for a, b in pairwise(h_syms[first_new_node - 1:]):
+        if b.rule_nr in recursion_programs:
+            justification_program, description = recursion_programs[b.rule_nr]
+            b.recursive = get_recursion_subgraph_from_program(
+                a.atoms, b.diff, justification_program, h, n, description)
+    return h_syms
+
+
+def _reduce_symbol(symbol: Symbol):
+    # symbols are handles into the symbol table of the process,
+    # send their string form to the worker processes instead
+    return parse_term, (str(symbol), )
+
+
+_WORKER_DISPATCH_TABLE = copyreg.dispatch_table.copy()
+_WORKER_DISPATCH_TABLE[Symbol] = _reduce_symbol
+
+
+def _dumps_for_worker(obj: Any) -> bytes:
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = _WORKER_DISPATCH_TABLE
+    pickler.dump(obj)
+    return buffer.getvalue()
+
+
+def _make_reason_nodes_in_worker(task: bytes) -> bytes:
+    h_syms = make_reason_nodes_from_facts_to_stable_model(*pickle.loads(task))
+    # atoms are cumulative, recreate them in the main process
+    # instead of sending them back
+    for node in h_syms:
+        node.atoms = frozenset()
+        for subnode in node.recursive:
+            subnode.atoms = frozenset()
+    return _dumps_for_worker(h_syms)
+
+
+_reason_pool: Optional[ProcessPoolExecutor] = None
+_reason_pool_workers = 0
+_reason_pool_lock = threading.Lock()
+
+
+def _submit_to_reason_pool(tasks: List[bytes], workers: int) -> Iterable[bytes]:
+    """
+    Map the tasks over the reason pool of the process, which is started on
+    first use and grows to the largest number of workers asked for.
+    """
+    global _reason_pool, _reason_pool_workers
+    with _reason_pool_lock:
+        if _reason_pool is None or _reason_pool_workers < workers:
+            if _reason_pool is not None:
+                # the tasks already submitted to it are still completed
+                _reason_pool.shutdown(wait=False)
+            # forking a server with running threads can copy locks in a held state
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _reason_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(start_method))
+            _reason_pool_workers = workers
+        pool = _reason_pool
+        results = pool.map(_make_reason_nodes_in_worker, tasks,
+                           chunksize=max(1, len(tasks) // (workers * 4)))
+    try:
+        return list(results)
+    except BrokenProcessPool:
+        with _reason_pool_lock:
+            if _reason_pool is pool:
+                _reason_pool = None
+        raise
+
+
+def make_path_from_reason_nodes(rule_mapping: Dict[int, Transformation],
+                                h_syms: List[Node]) -> nx.DiGraph:
+    fact_node = h_syms[0]
     g = nx.DiGraph()
     if len(h_syms) == 1:
         # If there is a stable model that is exactly the same as the facts.
@@ -130,15 +291,92 @@ def make_reason_path_from_facts_to_stable_model(rule_mapping: Dict[int, Transfor
         return g
 
     for a, b in pairwise(h_syms):
-        if rule_mapping[b.rule_nr].hash in recursive_transformations_hashes:
-            b.recursive = get_recursion_subgraph(a.atoms, b.diff,
-                                                 rule_mapping[b.rule_nr], h,
-                                                 analyzer)
         g.add_edge(a, b, transformation=rule_mapping[b.rule_nr])
 
     return g
 
 
+def make_recursion_programs(rule_mapping: Dict[int, Transformation],
+                            recursive_transformations_hashes: Set[str],
+                            analyzer: ProgramAnalyzer) -> Dict[int, Tuple[str, str]]:
+    return {
+        rule_nr: (make_recursion_justification_program(transformation, analyzer),
+                  str(transformation.rules))
+        for rule_nr, transformation in rule_mapping.items()
+        if transformation.hash in recursive_transformations_hashes
+    }
+
+
+def make_reason_path_from_facts_to_stable_model(rule_mapping: Dict[int, Transformation],
+                                            fact_node: Node,
+                                            h_symbols: List[Symbol],
+                                            recursive_transformations_hashes: Set[str],
+                                            h="h",
+                                            analyzer: ProgramAnalyzer = ProgramAnalyzer(),
+                                            pad=True) \
+                                            -> nx.DiGraph:
+    recursion_programs = make_recursion_programs(
+        rule_mapping, recursive_transformations_hashes, analyzer)
+    h_syms = make_reason_nodes_from_facts_to_stable_model(
+        rule_mapping.keys(), fact_node, h_symbols, recursion_programs, h,
+        analyzer.get_conflict_free_iterindex(), pad)
+    return make_path_from_reason_nodes(rule_mapping, h_syms)
+
+
+def make_reason_paths(rule_mapping: Dict[int, Transformation],
+                      fact_node: Node,
+                      h_symbols_by_model: Iterable[List[Symbol]],
+                      recursive_transformations_hashes: Set[str],
+                      h: str,
+                      analyzer: ProgramAnalyzer,
+                      jobs: int = 1,
+                      prefixes: Optional[List[List[Node]]] = None) -> List[nx.DiGraph]:
+    """
+    Create the paths from the facts to every stable model.
+    With more than one job, the nodes of the paths are created in a pool of
+    worker processes. The paths are returned in the order of the models.
+
+    :param h_symbols_by_model: The h symbols of every stable model.
+    :param jobs: The number of worker processes.
+    :param prefixes: The already justified beginning of the path of every
+        stable model, see ``get_unchanged_prefixes``.
+    """
+    if not prefixes:
+        recursion_mapping = rule_mapping
+    else:
+        first_new_rule_nr = min(prefix[-1].rule_nr for prefix in prefixes) + 1
+        recursion_mapping = {
+            rule_nr: transformation
+            for rule_nr, transformation in rule_mapping.items()
+            if rule_nr >= first_new_rule_nr
+        }
+    recursion_programs = make_recursion_programs(
+        recursion_mapping, recursive_transformations_hashes, analyzer)
+    tasks = [(list(rule_mapping.keys()), fact_node, h_symbols,
+              recursion_programs, h, analyzer.get_conflict_free_iterindex(),
+              True, prefix)
+             for h_symbols, prefix in zip(
+                 h_symbols_by_model,
+                 prefixes if prefixes is not None else repeat(None))]
+    if jobs > 1 and len(tasks) > 1:
+        nodes_by_model = [
+            pickle.loads(result) for result in _submit_to_reason_pool(
+                [_dumps_for_worker(t) for t in tasks], min(jobs, len(tasks)))
+        ]
+        for h_syms in nodes_by_model:
+            insert_atoms_into_nodes(h_syms)
+            for node in h_syms:
+                insert_atoms_into_nodes(node.recursive)
+    else:
+        nodes_by_model = [
+            make_reason_nodes_from_facts_to_stable_model(*t) for t in tasks
+        ]
+    return [
+        make_path_from_reason_nodes(rule_mapping, h_syms)
+        for h_syms in nodes_by_model
+    ]
+
+
 def join_paths_with_facts(paths: Collection[nx.DiGraph]) -> nx.DiGraph:
     combined = nx.DiGraph()
     for path in paths:
@@ -175,15 +413,82 @@ def append_noops(result_graph: nx.DiGraph,
                                   next_transformation_id, RuleContainer(ast=tuple(pass_through))))
 
 
+def get_unchanged_prefixes(graph: nx.DiGraph,
+                           models: Sequence[Collection[Symbol]],
+                           first_changed_rule_nr: int) -> Optional[List[List[Node]]]:
+    """
+    Get the beginning of the path of every stable model from a graph that was
+    built for a sort whose transformations before ``first_changed_rule_nr``
+    are the same. The path of a stable model ends in the leaf whose atoms are
+    exactly the symbols of the model.
+    The nodes are copied with new uuids, so they can be saved with a new graph.
+
+    :param models: The symbols of every stable model.
+    :return: The nodes with a rule_nr before ``first_changed_rule_nr`` on the
+        path of every stable model, or None if a model has no unique path.
+    """
+    leafs: Dict[frozenset, Node] = {}
+    for leaf in get_leafs_from_graph(graph):
+        atoms = frozenset(s.symbol for s in leaf.atoms)
+        if atoms in leafs:
+            return None
+        leafs[atoms] = leaf
+
+    copies: Dict[int, Node] = {}
+
+    def copy_node(node: Node) -> Node:
+        if id(node) not in copies:
+            copies[id(node)] = replace(
+                node,
+                uuid=uuid4(),
+                recursive=[replace(n, uuid=uuid4()) for n in node.recursive])
+        return copies[id(node)]
+
+    prefixes = []
+    for model in models:
+        node = leafs.get(frozenset(model))
+        if node is None:
+            return None
+        path = [node]
+        while graph.in_degree(node) != 0:
+            node = next(graph.predecessors(node))
+            path.append(node)
+        path.reverse()
+        prefixes.append([
+            copy_node(node) for node in path
+            if node.rule_nr < first_changed_rule_nr
+        ])
+    return prefixes
+
+
+def remove_symbols_derived_in_prefix(h_symbols: List[Symbol],
+                                     prefix: List[Node],
+                                     h_showTerm="h_showTerm") -> List[Symbol]:
+    derived = {s.symbol for node in prefix for s in node.diff}
+    return [
+        s for s in h_symbols
+        if s.name == h_showTerm or s.arguments[2] not in derived
+    ]
+
+
 def build_graph(wrapped_stable_models: List[List[str]],
                 transformed_prg: Collection[AST],
                 sorted_program: List[Transformation],
                 analyzer: ProgramAnalyzer,
                 recursion_transformations_hashes: Set[str],
                 commandline_constants: Dict[str,str],
-                show_all_derived: bool = False) -> nx.DiGraph:
+                show_all_derived: bool = False,
+                batch_justification: bool = True,
+                jobs: int = 1,
+                prefixes: Optional[List[List[Node]]] = None) -> nx.DiGraph:
+    """
+    Justify the stable models and join their paths into a graph.
+
+    :param prefixes: The unchanged beginnings of the paths of a previous graph,
+        see ``get_unchanged_prefixes``. In that case ``transformed_prg``
+        only contains the transformations after the prefixes.
+    """
 
-    paths: List[nx.DiGraph] = []
     facts = analyzer.get_facts(commandline_constants)
     conflict_free_h = analyzer.get_conflict_free_h()
     conflict_free_h_showTerm = analyzer.get_conflict_free_h_showTerm()
@@ -192,21 +497,34 @@ def build_graph(wrapped_stable_models: List[List[str]],
     mapping = make_transformation_mapping(sorted_program_no_constraints)
     fact_node = Node(frozenset(identifiable_facts), -1,
                      frozenset(identifiable_facts))
+    if prefixes:
+        fact_node = prefixes[0][0]
     if not len(mapping):
         info(f"Program only contains facts. {fact_node}")
         single_node_graph = nx.DiGraph()
         single_node_graph.add_node(fact_node)
         return single_node_graph
-    for model in wrapped_stable_models:
-        h_symbols = get_h_symbols_from_model(model, transformed_prg, facts,
-                                             analyzer.get_constants(),
-                                             conflict_free_h,
-                                             conflict_free_h_showTerm,
-                                             show_all_derived)
-        new_path = make_reason_path_from_facts_to_stable_model(
-            mapping, fact_node, h_symbols, recursion_transformations_hashes,
-            conflict_free_h, analyzer)
-        paths.append(new_path)
+    if batch_justification:
+        h_symbols_by_model = get_h_symbols_from_models(
+            wrapped_stable_models, transformed_prg, facts,
+            analyzer.get_constants(), conflict_free_h,
+            conflict_free_h_showTerm, analyzer.get_conflict_free_model(),
+            analyzer.get_conflict_free_variable("M"), show_all_derived)
+        analyzer.clear_temp_names()
+    else:
+        h_symbols_by_model = (get_h_symbols_from_model(
+            model, transformed_prg, facts, analyzer.get_constants(),
+            conflict_free_h, conflict_free_h_showTerm, show_all_derived)
+                              for model in wrapped_stable_models)
+    if prefixes is not None and not show_all_derived:
+        h_symbols_by_model = [
+            remove_symbols_derived_in_prefix(h_symbols, prefix,
+                                             conflict_free_h_showTerm)
+            for h_symbols, prefix in zip(h_symbols_by_model, prefixes)
+        ]
+    paths = make_reason_paths(mapping, fact_node, h_symbols_by_model,
+                              recursion_transformations_hashes,
+                              conflict_free_h, analyzer, jobs, prefixes)
 
     result_graph = nx.DiGraph()
     result_graph.update(join_paths_with_facts(paths))
@@ -233,24 +551,17 @@ def filter_body_aggregates(element: AST):
     return True
 
 
-def get_recursion_subgraph(
-        facts: frozenset, supernode_symbols: frozenset,
-        transformation: Transformation, conflict_free_h: str,
-        analyzer: ProgramAnalyzer) -> List[Node]:
+def make_recursion_justification_program(transformation: Transformation,
+                                         analyzer: ProgramAnalyzer) -> str:
     """
-    Get a recursion explanation for the given facts and the recursive transformation.
-    Generate graph from explanation, sorted by the iteration step number.
+    Reify the recursive transformation into the program used by the
+    ``RecursionReasoner`` to justify the recursion step by step.
 
-    :param facts: The symbols that were true before the recursive node.
-    :param supernode_symbols: The SymbolIdentifiers of the recursive node.
     :param transformation: The recursive transformation. An ast object.
-    :param conflict_free_h: The name of the h predicate.
     """
-    init = [fact.symbol for fact in facts]
     justification_program = ""
     model_str: str = analyzer.get_conflict_free_model(
     ) if analyzer else "model"
-    n_str: str = analyzer.get_conflict_free_iterindex() if analyzer else "n"
 
     justifier_rules = reify_recursion_transformation(
         transformation,
@@ -265,7 +576,44 @@ def get_recursion_subgraph(
         conflict_free_derivable_str=analyzer.get_conflict_free_derivable())
     justification_program += "\n".join(map(str, justifier_rules))
     justification_program += f"\n{model_str}(@new())."
+    return justification_program
 
+
+def get_recursion_subgraph(
+        facts: frozenset, supernode_symbols: frozenset,
+        transformation: Transformation, conflict_free_h: str,
+        analyzer: ProgramAnalyzer) -> List[Node]:
+    """
+    Get a recursion explanation for the given facts and the recursive transformation.
+    Generate graph from explanation, sorted by the iteration step number.
+
+    :param facts: The symbols that were true before the recursive node.
+    :param supernode_symbols: The SymbolIdentifiers of the recursive node.
+    :param transformation: The recursive transformation. An ast object.
+    :param conflict_free_h: The name of the h predicate.
+    """
+    n_str: str = analyzer.get_conflict_free_iterindex() if analyzer else "n"
+    justification_program = make_recursion_justification_program(
+        transformation, analyzer)
+    return get_recursion_subgraph_from_program(facts, supernode_symbols,
+                                               justification_program,
+                                               conflict_free_h, n_str,
+                                               str(transformation.rules))
+
+
+def get_recursion_subgraph_from_program(
+        facts: frozenset, supernode_symbols: frozenset,
+        justification_program: str, conflict_free_h: str, conflict_free_n: str,
+        description: str = "") -> List[Node]:
+    """
+    Get a recursion explanation from an already reified justification program,
+    see ``get_recursion_subgraph``.
+
+    :param justification_program: The program created by ``make_recursion_justification_program``.
+    :param conflict_free_n: The name of the iteration index.
+    :param description: Describes the recursive transformation in warnings.
+    """
+    init = [fact.symbol for fact in facts]
     h_syms = set()
 
     try:
@@ -274,14 +622,14 @@ def get_recursion_subgraph(
                           program=justification_program,
                           callback=h_syms.add,
                           conflict_free_h=conflict_free_h,
-                          conflict_free_n=n_str).main()
+                          conflict_free_n=conflict_free_n).main()
     except RuntimeError:
-        warning(f"Could not analyze recursion for {transformation.rules}")
+        warning(f"Could not analyze recursion for {description}")
         return []
 
     h_syms = collect_h_symbols_and_create_nodes(
         h_syms,
-        rule_mapping={-1: transformation},
+        rule_mapping={},
         pad=False,
         supernode_symbols=supernode_symbols)
     if len(h_syms) == 1:
@@ -297,51 +645,353 @@ def index_of_symbolstr_in_results(results: List[SearchResultSymbolWrapper], symb
             return i
     return -1
 
-def search_nonground_term_in_symbols(query, db_graph_symbols):
-    model_atoms: List[str] = []
-    symbol_uuid_str: str = "SYMBOLUUID"
-    branch_position_str: str = "BRANCHPOSITION"
-    results: List[SearchResultSymbolWrapper] = []
-    unsorted_results: Dict[str,List[Tuple[str, float]]] = dict()
-    for s, branch_position in db_graph_symbols:
-        model_atoms.append(f'model({s.symbol}, "{s.symbol_uuid}", "{branch_position}").')
-
-    control = Control()
-    query_rule = f'result({query},{symbol_uuid_str}, {branch_position_str}):-model({query},{symbol_uuid_str},{branch_position_str}).'
-    try:
-        control.add("base", [], query_rule)
-        control.add("base", [], "\n".join(model_atoms))
-        control.ground([("base", [])])
-
-        for x in control.symbolic_atoms.by_signature("result", 3):
-            if str(x.symbol.arguments[0]) in unsorted_results:
-                unsorted_results[str(x.symbol.arguments[0])].append((str(x.symbol.arguments[1].string), float(x.symbol.arguments[2].string)))
-            else:
-                unsorted_results[str(x.symbol.arguments[0])] = [(str(x.symbol.arguments[1].string), float(x.symbol.arguments[2].string))]
+class SymbolSearchContext:
+    """
+    Evaluates non-ground queries against the symbol occurrences of a graph.
+
+    The occurrences are added as ``model(Symbol, UUID)`` facts through the
+    backend of a single control. Every query is grounded in its own program
+    part on top of these facts, so that they are only loaded once per graph.
+    The rules of a part are guarded by an external atom, which is released
+    once the results are read, so that their ground atoms are cleaned up
+    again. The control is rebuilt after ``max_queries`` queries or a
+    grounding error.
+    """
 
-    except RuntimeError:
-        return [
-            SearchResultSymbolWrapper(
-                repr=query,
-                includes=[],
-                is_autocomplete=False,
-                awaiting_input=True,
-                hide_in_suggestions=True,
-            )
-        ]
-    for symbol_str, symbol_and_branch_position in unsorted_results.items():
-        symbol_and_branch_position.sort(key=lambda x: x[1])
-        results.append(SearchResultSymbolWrapper(
-            repr = symbol_str,
-            includes = [x for x,_ in symbol_and_branch_position],
+    def __init__(self, occurrences: Sequence[Tuple[str, str, float]],
+                 max_queries: int = SEARCH_CONTEXT_MAX_QUERIES):
+        self.max_queries = max_queries
+        self.branch_positions: Dict[str, float] = {}
+        self.facts: List[Symbol] = []
+        symbol_strings = [s for s, _, _ in occurrences]
+        # parse all symbols in a single call, like shared.io.parse_symbols
+        symbols = parse_term(f"({','.join(symbol_strings)},)").arguments \
+            if len(symbol_strings) > 0 else []
+        for symbol, (_, symbol_uuid, branch_position) in zip(symbols, occurrences):
+            self.facts.append(Function("model", [symbol, String(symbol_uuid)]))
+            self.branch_positions[symbol_uuid] = branch_position
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        self.control = Control()
+        self.queries = 0
+        with self.control.backend() as backend:
+            for fact in self.facts:
+                backend.add_rule([backend.add_atom(fact)])
+        self.control.ground([("base", [])])
+
+    @staticmethod
+    def _invalid_query_result(query: str) -> SearchResultSymbolWrapper:
+        return SearchResultSymbolWrapper(
+            repr=query,
+            includes=[],
+            is_autocomplete=False,
+            awaiting_input=True,
+            hide_in_suggestions=True,
+        )
+
+    def search(self, query: str) -> List[SearchResultSymbolWrapper]:
+        with self.lock:
+            if self.queries >= self.max_queries:
+                self._load()
+            self.queries += 1
+            part = f"query_{self.queries}"
+            query_rule = f"#external {part}. result_{self.queries}({query},SYMBOLUUID):-model({query},SYMBOLUUID),{part}."
+            try:
+                # a rule that does not parse would leave the control unusable
+                parse_string(query_rule, lambda _: None, logger=lambda *_: None)
+            except RuntimeError:
+                return [self._invalid_query_result(query)]
+            try:
+                self.control.add(part, [], query_rule)
+                self.control.ground([(part, [])])
+            except RuntimeError:
+                self._load()
+                return [self._invalid_query_result(query)]
+            unsorted_results: Dict[str, List[str]] = defaultdict(list)
+            for x in self.control.symbolic_atoms.by_signature(f"result_{self.queries}", 2):
+                unsorted_results[str(x.symbol.arguments[0])].append(
+                    x.symbol.arguments[1].string)
+            # releasing the guard makes the results false, solving
+            # propagates this and cleanup removes them from the control
+            self.control.release_external(Function(part))
+            self.control.solve()
+            self.control.cleanup()
+
+        results: List[SearchResultSymbolWrapper] = []
+        for symbol_str, symbol_uuids in unsorted_results.items():
+            symbol_uuids.sort(key=self.branch_positions.__getitem__)
+            results.append(SearchResultSymbolWrapper(
+                repr = symbol_str,
+                includes = symbol_uuids,
+                is_autocomplete = False,
+                awaiting_input = False,
+            ))
+
+        return results if len(results) else [SearchResultSymbolWrapper(
+            repr = query,
+            includes = [],
             is_autocomplete = False,
             awaiting_input = False,
-        ))
+            hide_in_suggestions=True,
+        )]
+
 
-    return results if len(results) else [SearchResultSymbolWrapper(
-        repr = query,
-        includes = [],
-        is_autocomplete = False,
-        awaiting_input = False,
+def too_broad_query_result(query: str) -> SearchResultSymbolWrapper:
+    return SearchResultSymbolWrapper(
+        repr=query,
+        includes=[],
+        is_autocomplete=False,
+        awaiting_input=False,
         hide_in_suggestions=True,
-    )]
+        too_broad=True,
+    )
+
+
+SearchKey = Tuple[str, ...]
+
+
+def _run_search_worker(connection: Connection, memory_limit: int,
+                       max_queries: int):
+    """
+    Serve the requests of a ``SearchWorker`` until its connection is closed.
+    The worker owns the search context of a single graph, every request but
+    ``unload`` is answered with its id, a status and a value.
+    """
+    if memory_limit > 0 and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    context: Optional[SymbolSearchContext] = None
+    connection.send((None, "ready", None))
+    while True:
+        try:
+            request_id, command, payload = connection.recv()
+        except EOFError:
+            return
+        try:
+            if command == "unload":
+                context = None
+            elif command == "load":
+                if context is None:
+                    context = SymbolSearchContext(payload, max_queries)
+                connection.send((request_id, "loaded", None))
+            elif context is None:
+                connection.send((request_id, "missing", None))
+            elif command == "stats":
+                connection.send((request_id, "stats", {
+                    "queries": context.queries,
+                    "atoms": len(context.control.symbolic_atoms),
+                }))
+            else:
+                connection.send((request_id, "results", context.search(payload)))
+        except MemoryError:
+            # the control of the context can not be used anymore
+            context = None
+            connection.send((request_id, "too_broad", None))
+        except Exception as e:
+            connection.send((request_id, "error", str(e)))
+
+
+class SearchWorker:
+    """
+    A process that keeps the search context of a graph and evaluates queries
+    against it. The replies are read by a thread and handed to the waiting
+    requests. A search that takes longer than its timeout stops the process,
+    and one that exceeds its memory limit fails inside of it. Both are
+    answered as too broad, the context is loaded again by the next search.
+    """
+
+    def __init__(self, memory_limit: int = SEARCH_WORKER_MEMORY_LIMIT_BYTES,
+                 max_queries: int = SEARCH_CONTEXT_MAX_QUERIES):
+        self.memory_limit = memory_limit
+        self.max_queries = max_queries
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.connection: Optional[Connection] = None
+        self.pending: Dict[int, Future] = {}
+        self.request_ids = count()
+        self.lock = threading.Lock()
+
+    def _start(self):
+        # spawn, so that the worker does not inherit the locks of the server's
+        # threads and the memory limit only applies to the worker's own memory
+        context = multiprocessing.get_context("spawn")
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_run_search_worker,
+                                       args=(child_connection,
+                                             self.memory_limit,
+                                             self.max_queries),
+                                       daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.connection.recv()
+        self.pending = {}
+        threading.Thread(target=self._read_replies,
+                         args=(self.connection, self.pending),
+                         daemon=True).start()
+
+    @staticmethod
+    def _read_replies(connection: Connection, pending: Dict[int, Future]):
+        while True:
+            try:
+                request_id, status, value = connection.recv()
+            except (EOFError, OSError):
+                break
+            future = pending.pop(request_id, None)
+            if future is not None:
+                future.set_result((status, value))
+        for future in list(pending.values()):
+            future.set_result(None)
+        pending.clear()
+
+    def _stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.process = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _send(self, message: Tuple, timeout: float,
+              future: Optional[Future] = None) -> Optional[Dict[int, Future]]:
+        """
+        Send a message to the worker, which is started if it is not running.
+        Waits at most ``timeout`` for other requests that are being sent.
+
+        :param future: Gets the reply to the message.
+        :return: The pending replies of the worker, None if the message was not sent.
+        """
+        if not self.lock.acquire(timeout=timeout):
+            return None
+        try:
+            if self.process is None or not self.process.is_alive():
+                self._stop()
+                self._start()
+            pending = self.pending
+            if future is not None:
+                pending[message[0]] = future
+            self.connection.send(message)
+            return pending
+        except (EOFError, OSError):
+            self._stop()
+            return None
+        finally:
+            self.lock.release()
+
+    def _request(self, command: str, payload: Any,
+                 timeout: float) -> Optional[Tuple[str, Any]]:
+        request_id = next(self.request_ids)
+        future: Future = Future()
+        pending = self._send((request_id, command, payload), timeout, future)
+        if pending is None:
+            return None
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            pending.pop(request_id, None)
+            # grounding can not be interrupted, stop the worker instead
+            with self.lock:
+                if self.pending is pending:
+                    self._stop()
+            return None
+
+    def search(self, query: str,
+               load_occurrences: Callable[[], Iterable[Tuple[str, str, float]]],
+               timeout: float,
+               load_timeout: float) -> List[SearchResultSymbolWrapper]:
+        """
+        Search the query in the context of the worker, which is loaded from
+        ``load_occurrences`` if the worker does not hold it yet.
+        """
+        reply = self._request("search", query, timeout)
+        if reply is not None and reply[0] == "missing":
+            reply = self._request("load", list(load_occurrences()),
+                                  load_timeout)
+            if reply is not None and reply[0] == "loaded":
+                reply = self._request("search", query, timeout)
+        if reply is not None and reply[0] == "error":
+            warning(f"Searching {query} failed: {reply[1]}")
+        if reply is None or reply[0] != "results":
+            return [too_broad_query_result(query)]
+        return reply[1]
+
+    def stats(self, timeout: float) -> Optional[Dict[str, int]]:
+        """
+        :return: The number of queries of the current context and its number
+            of ground atoms, None if the worker holds no context.
+        """
+        reply = self._request("stats", None, timeout)
+        return reply[1] if reply is not None and reply[0] == "stats" else None
+
+    def unload(self):
+        """Drop the context of the worker, so that it can serve another graph."""
+        with self.lock:
+            if self.connection is None:
+                return
+            try:
+                self.connection.send((None, "unload", None))
+            except OSError:
+                self._stop()
+
+    def stop(self):
+        with self.lock:
+            self._stop()
+
+
+class SearchWorkerPool:
+    """
+    Assigns a ``SearchWorker`` to each of the recently searched graphs, so
+    that a slow search only stops the worker of its own graph. The workers
+    of invalidated or least recently searched graphs are reused.
+    """
+
+    def __init__(self, max_workers: int = SEARCH_CONTEXT_CACHE_MAX_ENTRIES,
+                 **kwargs):
+        self.max_workers = max_workers
+        self.worker_kwargs = kwargs
+        self.workers: OrderedDict[SearchKey, SearchWorker] = OrderedDict()
+        self.idle: List[SearchWorker] = []
+        self.lock = threading.Lock()
+
+    def get_worker(self, key: SearchKey) -> SearchWorker:
+        with self.lock:
+            worker = self.workers.get(key)
+            if worker is None:
+                if len(self.idle) > 0:
+                    worker = self.idle.pop()
+                elif len(self.workers) >= self.max_workers:
+                    worker = self.workers.popitem(last=False)[1]
+                    worker.unload()
+                else:
+                    worker = SearchWorker(**self.worker_kwargs)
+                self.workers[key] = worker
+            self.workers.move_to_end(key)
+            return worker
+
+    def search(self, key: SearchKey, query: str,
+               load_occurrences: Callable[[], Iterable[Tuple[str, str, float]]],
+               timeout: float,
+               load_timeout: float) -> List[SearchResultSymbolWrapper]:
+        return self.get_worker(key).search(query, load_occurrences, timeout,
+                                           load_timeout)
+
+    def _remove(self, key_prefix: SearchKey):
+        with self.lock:
+            for key in [k for k in self.workers if k[:len(key_prefix)] == key_prefix]:
+                worker = self.workers.pop(key)
+                worker.unload()
+                self.idle.append(worker)
+
+    def invalidate(self, encoding_id: str, graph_hash: Optional[str] = None):
+        self._remove((encoding_id, ) if graph_hash is None else (encoding_id, graph_hash))
+
+    def clear(self):
+        self._remove(())
+
+    def stop(self):
+        with self.lock:
+            workers = [*self.workers.values(), *self.idle]
+            self.workers.clear()
+            self.idle.clear()
+        for worker in workers:
+            worker.stop()
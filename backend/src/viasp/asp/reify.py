@@ -842,6 +842,58 @@ class LiteralWrapper(Transformer):
         return ast.Literal(literal.location, ast.Sign.NoSign, wrap_atm)
 
 
+class ModelIndexWrapper(Transformer):
+    """
+    Tags a reified program with a model index, so that the justifications
+    of several stable models can be grounded in a single pass.
+
+    In: h(1, "hash", H, (B,)) :- H, B, not C.
+    Out: h(M, 1, "hash", H, (B,)) :- model(M, H), model(M, B), not model(M, C).
+
+    Rules that do not derive h or h_showTerm atoms (facts, constraints,
+    minimize statements) are dropped, as the atoms of every model are
+    provided as tagged facts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.h_str: str = kwargs.pop("h_str", "h")
+        self.h_showTerm_str: str = kwargs.pop("h_showTerm_str", "h_showTerm")
+        self.model_str: str = kwargs.pop("model_str", "model")
+        self.model_index_str: str = kwargs.pop("model_index_str", "M")
+        super().__init__(*args, **kwargs)
+
+    def _is_h_head(self, head: AST) -> bool:
+        return head.ast_type == ASTType.Literal and \
+            head.atom.ast_type == ASTType.SymbolicAtom and \
+            head.atom.symbol.ast_type == ASTType.Function and \
+            head.atom.symbol.name in [self.h_str, self.h_showTerm_str]
+
+    def visit_Rule(self, rule: ast.Rule) -> Optional[AST]:  # type: ignore
+        if not self._is_h_head(rule.head):
+            return None
+        loc = rule.location
+        h_fun = rule.head.atom.symbol
+        index_var = ast.Variable(loc, self.model_index_str)
+        head = rule.head.update(atom=ast.SymbolicAtom(
+            h_fun.update(arguments=[index_var, *h_fun.arguments])))
+        return rule.update(head=head, body=self.visit_sequence(rule.body))
+
+    def visit_SymbolicAtom(self, atom: ast.SymbolicAtom) -> AST:  # type: ignore
+        index_var = ast.Variable(atom.symbol.location, self.model_index_str)
+        return ast.SymbolicAtom(
+            ast.Function(atom.symbol.location, self.model_str,
+                         [index_var, atom.symbol], 0))
+
+    def visit_Minimize(self, minimize: ast.Minimize) -> None:  # type: ignore
+        return None
+
+    def visit_ShowSignature(self, show: AST) -> None:
+        return None
+
+    def visit_External(self, external: AST) -> None:
+        return None
+
+
 class ProgramReifierForRecursions(ProgramReifier):
 
     def __init__(self, *args, **kwargs):
@@ -943,6 +995,19 @@ def reify_list(transformations: Iterable[Transformation],
     return reified
 
 
+def reify_with_model_index(reified: Iterable[Union[str, AST]],
+                           **kwargs) -> List[AST]:
+    """
+    Tag an already reified program with a model index,
+    see ``ModelIndexWrapper``.
+    """
+    visitor = ModelIndexWrapper(**kwargs)
+    result: List[AST] = []
+    parse_string("\n".join(map(str, reified)),
+                 lambda rule: result.append(visitor.visit(rule)))
+    return [rule for rule in result if rule is not None]
+
+
 def extract_symbols(facts, constants=set(), other_constant_tuples=dict()):
     options = []
     for k, v in other_constant_tuples.items():
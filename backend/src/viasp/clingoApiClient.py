@@ -1,21 +1,61 @@
 import json
-from typing import Collection
+import threading
+import time
+from typing import Collection, Dict, Sequence, Union
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from .shared.defaults import DEFAULT_BACKEND_URL, DEFAULT_FRONTEND_URL, _
-from .shared.io import DataclassJSONEncoder
+from .shared.defaults import DEFAULT_BACKEND_URL, DEFAULT_FRONTEND_URL, DEFAULT_JOBS, BACKEND_LIVENESS_TTL_SECONDS, _
+from .shared.io import DataclassJSONEncoder, to_compact_json
 from .shared.model import ClingoMethodCall, StableModel, TransformerTransport
 from .shared.interfaces import ViaspClient
 from .shared.simple_logging import info, error
 
 
-def server_is_running(url=DEFAULT_BACKEND_URL):
+# shared by all clients of a process: connection pools and the time until
+# which a backend is considered running, per url
+_adapters: Dict[str, HTTPAdapter] = {}
+_alive_until: Dict[str, float] = {}
+_pool_lock = threading.Lock()
+
+
+def server_is_running(url=DEFAULT_BACKEND_URL, session=None):
     try:
-        r = requests.get(f"{url}/healthcheck")
-        return r.status_code == 200
+        r = (session or requests).get(f"{url}/healthcheck")
+        running = r.status_code == 200
     except requests.exceptions.ConnectionError:
-        return False
+        running = False
+    if running:
+        _alive_until[url] = time.monotonic() + BACKEND_LIVENESS_TTL_SECONDS
+    else:
+        _alive_until.pop(url, None)
+    return running
+
+
+def server_is_available(url=DEFAULT_BACKEND_URL, session=None):
+    """
+    Like ``server_is_running``, but a successful healthcheck is trusted for
+    ``BACKEND_LIVENESS_TTL_SECONDS`` or until a request fails to connect.
+    """
+    if _alive_until.get(url, 0.0) > time.monotonic():
+        return True
+    return server_is_running(url, session)
+
+
+def get_pooled_session(url=DEFAULT_BACKEND_URL) -> requests.Session:
+    """
+    Create a session that sends its requests to the url through the
+    keep-alive connection pool of the process. The session keeps its own
+    cookies, which identify the viasp session on the backend.
+    """
+    with _pool_lock:
+        if url not in _adapters:
+            _adapters[url] = HTTPAdapter()
+        adapter = _adapters[url]
+    session = requests.Session()
+    session.mount(url, adapter)
+    return session
 
 
 def dict_factory_that_supports_uuid(kv_pairs):
@@ -25,27 +65,35 @@ def dict_factory_that_supports_uuid(kv_pairs):
 class ClingoClient(ViaspClient):
 
     def __init__(self, **kwargs):
-        self.session = requests.Session()
         if "viasp_backend_url" in kwargs:
             self.backend_url = kwargs["viasp_backend_url"]
         else:
             self.backend_url = DEFAULT_BACKEND_URL
-        if not server_is_running(self.backend_url):
+        self.session = get_pooled_session(self.backend_url)
+        if not self.is_available():
             error(_("BACKEND_UNAVAILABLE").format(self.backend_url))
 
     def is_available(self):
-        return server_is_running(self.backend_url)
+        return server_is_available(self.backend_url, self.session)
 
     def register_function_call(self, name, sig, args, kwargs):
         serializable_call = ClingoMethodCall.merge(name, sig, args, kwargs)
         self._register_function_call(serializable_call)
 
-    def _register_function_call(self, call: ClingoMethodCall):
-        if server_is_running(self.backend_url):
+    def register_function_calls(self, calls: Sequence[ClingoMethodCall]):
+        self._register_function_call(list(calls))
+
+    def _register_function_call(self, call: Union[ClingoMethodCall, Sequence[ClingoMethodCall]]):
+        if self.is_available():
             serialized = json.dumps(call, cls=DataclassJSONEncoder)
-            r = self.session.post(f"{self.backend_url}/control/add_call",
-                              data=serialized,
-                              headers={'Content-Type': 'application/json'})
+            try:
+                r = self.session.post(f"{self.backend_url}/control/add_call",
+                                      data=serialized,
+                                      headers={'Content-Type': 'application/json'})
+            except requests.exceptions.ConnectionError:
+                _alive_until.pop(self.backend_url, None)
+                error(_("BACKEND_UNAVAILABLE").format(self.backend_url))
+                return
             if r.ok:
                 info(_("REGISTER_FUNCTION_CALL_SUCCESS"))
             else:
@@ -55,7 +103,7 @@ class ClingoClient(ViaspClient):
             error(_("BACKEND_UNAVAILABLE").format(self.backend_url))
 
     def set_target_stable_model(self, stable_models: Collection[StableModel]):
-        serialized = json.dumps(stable_models, cls=DataclassJSONEncoder)
+        serialized = to_compact_json(stable_models)
         r = self.session.post(f"{self.backend_url}/control/models",
                           data=serialized,
                           headers={'Content-Type': 'application/json'})
@@ -64,6 +112,26 @@ class ClingoClient(ViaspClient):
         else:
             error(_("MARK_MODELS_FAILED").format(r.status_code, r.reason))
 
+    def stream_target_stable_models(self, stable_models: Collection[StableModel]):
+        lines = ((to_compact_json(model) + "\n").encode("utf-8")
+                 for model in stable_models)
+        r = self.session.post(f"{self.backend_url}/control/models/stream",
+                              data=lines,
+                              headers={'Content-Type': 'application/x-ndjson'},
+                              stream=True)
+        if not r.ok:
+            error(_("MARK_MODELS_FAILED").format(r.status_code, r.reason))
+            return
+        for line in r.iter_lines():
+            progress = json.loads(line)
+            if "error" in progress:
+                error(_("MARK_MODELS_FAILED").format(r.status_code,
+                                                     progress["error"]))
+                return
+            if not progress.get("done", False):
+                info(_("MARK_MODELS_PROGRESS").format(progress["models"]))
+        info(_("MARK_MODELS_SUCCESS"))
+
     def show(self):
         r = self.session.post(f"{self.backend_url}/control/show")
         if r.ok:
@@ -88,7 +156,7 @@ class ClingoClient(ViaspClient):
             return None
 
     def clear_program(self):
-        r = requests.delete(f"{self.backend_url}/control/program")
+        r = self.session.delete(f"{self.backend_url}/control/program")
         if r.ok:
             info(_("CLEAR_PROGRAM_SUCCESS"))
         else:
@@ -176,11 +244,12 @@ class ClingoClient(ViaspClient):
             error(_("DEREGISTER_SESSION_FAILED").format(r.status_code, r.reason))
             return 0
 
-    def show_all_derived(self, show, color_theme):
+    def show_all_derived(self, show, color_theme, jobs=DEFAULT_JOBS):
         r = self.session.post(f"{self.backend_url}/control/config",
             data=json.dumps({
                 "show": show,
-                "color_theme": color_theme
+                "color_theme": color_theme,
+                "jobs": jobs
             }),
             headers={'Content-Type': 'application/json'})
         if r.ok:
@@ -1,6 +1,6 @@
 from typing import Tuple, Any, Dict, Iterable, List
 
-from flask import current_app, request, Blueprint, jsonify, abort, Response, session
+from flask import current_app, request, Blueprint, jsonify, abort, Response, session, stream_with_context
 from uuid import uuid4
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import select, delete
@@ -11,55 +11,44 @@ from clingraph.orm import Factbase
 from clingraph.graphviz import compute_graphs, render
 import networkx as nx
 
-from .dag_api import DatabaseInconsistencyError, generate_graph, wrap_marked_models, load_analyzer
-from ..database import db_session, ensure_encoding_id
+from .dag_api import DatabaseInconsistencyError, wrap_marked_models, load_analyzer, start_sort_precomputation, cancel_sort_precomputation, release_graph_generation_locks, ensure_graph_of_sort, graph_cache, search_workers
+from ..database import db_session, ensure_encoding_id, insert_or_ignore
+from ..storage import append_program_chunk, get_encoding_programs, delete_encoding
 from ..models import *
 from ...asp.reify import ProgramAnalyzer
 from ...asp.relax import ProgramRelaxer, relax_constraints
 from ...shared.model import ClingoMethodCall, StableModel, TransformerTransport
-from ...shared.util import hash_from_sorted_transformations, get_compatible_node_link_data
-from ...shared.defaults import CLINGRAPH_PATH
+from ...shared.util import hash_from_sorted_transformations, get_compatible_node_link_data, hash_string
+from ...shared.defaults import CLINGRAPH_PATH, DEFAULT_JOBS, MODEL_UPLOAD_BATCH_SIZE
 
 bp = Blueprint("api", __name__, template_folder='../templates/')
 
 using_clingraph: List[str] = []
 
 
-def handle_call_received(call: ClingoMethodCall, encoding_id: str) -> None:
+def apply_call(call: ClingoMethodCall, encoding_id: str) -> None:
     if call.name == "load":
         path = call.kwargs["path"] if "path" in call.kwargs else "<string>"
-        prg = call.kwargs["program"]
-
-        db_encoding = db_session.query(Encodings).filter_by(
-            encoding_id=encoding_id, filename=path).first()
-        if db_encoding is not None:
-            db_encoding.program += prg
-        else:
-            db_encoding = Encodings(encoding_id=encoding_id,
-                                    filename=path,
-                                    program=prg)
-            db_session.add(db_encoding)
+        append_program_chunk(encoding_id, call.kwargs["program"], path)
     elif call.name == "add":
-        db_encoding = db_session.query(Encodings).filter_by(
-            encoding_id=encoding_id).first()
-        if db_encoding is not None:
-            db_encoding.program += call.kwargs["program"]
-        else:
-            db_encoding = Encodings(encoding_id=encoding_id,
-                                    filename="<string>",
-                                    program=call.kwargs["program"])
-            db_session.add(db_encoding)
+        append_program_chunk(encoding_id, call.kwargs["program"])
     elif call.name == "clear":
-        db_session.execute(
-            delete(Encodings).where(Encodings.encoding_id == encoding_id))
+        delete_encoding(encoding_id)
     else:
         pass
+    # later calls of the same request have to see this one
+    db_session.flush()
+
+
+def handle_call_received(call: ClingoMethodCall, encoding_id: str) -> None:
+    apply_call(call, encoding_id)
     db_session.commit()
 
 
 def handle_calls_received(calls: Iterable[ClingoMethodCall], encoding_id: str) -> None:
     for call in calls:
-        handle_call_received(call, encoding_id)
+        apply_call(call, encoding_id)
+    db_session.commit()
 
 
 @bp.route("/control/program", methods=["GET", "POST", "DELETE"])
@@ -70,15 +59,7 @@ def get_program():
         if not isinstance(program, str):
             return "Invalid program object", 400
         encoding_id = session['encoding_id']
-
-        db_encoding = db_session.query(Encodings).filter_by(
-            encoding_id=encoding_id).first()
-        if db_encoding is not None:
-            db_encoding.program += program
-        else:
-            db_encoding = Encodings(encoding_id=encoding_id, filename="<string>", program=program)
-            db_session.add(db_encoding)
-
+        append_program_chunk(encoding_id, program)
 
         try:
             db_session.commit()
@@ -87,14 +68,11 @@ def get_program():
             return "Error saving program", 500
     elif request.method == "GET":
         encoding_id = session['encoding_id']
-        result = db_session.execute(
-            select(Encodings.program).where(
-                Encodings.encoding_id == encoding_id)).scalars().all()
+        result = get_encoding_programs(encoding_id)
         return jsonify("".join(result)) if result else "ok", 200
     elif request.method == "DELETE":
         encoding_id = session['encoding_id']
-        db_session.execute(
-            delete(Encodings).where(Encodings.encoding_id == encoding_id))
+        delete_encoding(encoding_id)
         db_session.commit()
     return "ok", 200
 
@@ -127,6 +105,16 @@ def get_by_name_or_index_from_args_or_kwargs(name: str, index: int, *args:
 
 
 
+UNEXPECTED_MODEL_TYPE = "Received unexpected data type, consider using viasp.shared.io.clingo_model_to_stable_model()"
+
+
+def make_model_row(model: StableModel, encoding_id: str) -> Dict[str, Any]:
+    serialized = current_app.json.dumps(model, compact_symbols=True)
+    return dict(encoding_id=encoding_id,
+                model_hash=hash_string(serialized),
+                data=compress_model(serialized))
+
+
 @bp.route("/control/models", methods=["GET", "POST", "DELETE"])
 @ensure_encoding_id
 def set_stable_models():
@@ -142,14 +130,14 @@ def set_stable_models():
         encoding_id = session['encoding_id']
 
         db_session.query(Models).filter_by(encoding_id = encoding_id).delete()
+        db_models = []
         for model in parsed_models:
             if not isinstance(model, StableModel):
-                return "Received unexpected data type, consider using viasp.shared.io.clingo_model_to_stable_model()", 400
-            db_session.add(Models(encoding_id=encoding_id, model=current_app.json.dumps(model)))
-            try:
-                db_session.commit()
-            except IntegrityError:
                 db_session.rollback()
+                return UNEXPECTED_MODEL_TYPE, 400
+            db_models.append(make_model_row(model, encoding_id))
+        insert_or_ignore(Models, db_models)
+        db_session.commit()
     elif request.method == "GET":
         result = db_session.query(Models).where(Models.encoding_id == session['encoding_id']).all()
         return jsonify([m.model for m in result])
@@ -159,6 +147,45 @@ def set_stable_models():
     return "ok", 200
 
 
+@bp.route("/control/models/stream", methods=["POST"])
+@ensure_encoding_id
+def stream_stable_models():
+    """
+    Replace the marked models with newline-delimited models that are stored
+    while they are received. The response reports the number of received
+    models after every stored batch, one JSON object per line.
+    """
+    encoding_id = session['encoding_id']
+
+    def store_models():
+        db_session.query(Models).filter_by(encoding_id=encoding_id).delete()
+        db_models = []
+        received = 0
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                model = current_app.json.loads(line)
+            except ValueError:
+                model = None
+            if not isinstance(model, StableModel):
+                db_session.rollback()
+                yield current_app.json.dumps({"error": UNEXPECTED_MODEL_TYPE}) + "\n"
+                return
+            db_models.append(make_model_row(model, encoding_id))
+            received += 1
+            if len(db_models) >= MODEL_UPLOAD_BATCH_SIZE:
+                insert_or_ignore(Models, db_models)
+                db_models = []
+                yield current_app.json.dumps({"models": received}) + "\n"
+        insert_or_ignore(Models, db_models)
+        db_session.commit()
+        yield current_app.json.dumps({"models": received, "done": True}) + "\n"
+
+    return Response(stream_with_context(store_models()),
+                    mimetype="application/x-ndjson")
+
+
 @bp.route("/control/models/clear", methods=["POST"])
 @ensure_encoding_id
 def models_clear():
@@ -220,9 +247,9 @@ def set_warnings():
     if request.method == "POST":
         if not isinstance(request.json, list):
             return "Expected a list of warnings", 400
-        db_warnings = [Warnings(encoding_id=session['encoding_id'], warning=current_app.json.dumps(w)) for w in request.json]
-        db_session.add_all(db_warnings)
+        db_warnings = [dict(encoding_id=session['encoding_id'], warning=current_app.json.dumps(w)) for w in request.json]
         try:
+            insert_or_ignore(Warnings, db_warnings)
             db_session.commit()
         except Exception as e:
             db_session.rollback()
@@ -251,25 +278,14 @@ def set_primary_sort(analyzer: ProgramAnalyzer, encoding_id: str):
         db_session.add(db_current_graph)
     db_session.commit()
 
-    db_graph = db_session.query(Graphs).filter(Graphs.encoding_id == encoding_id, Graphs.hash==primary_hash).first()
-    if db_graph is None:
-        db_graph = Graphs(encoding_id=encoding_id, hash=primary_hash, data=None, sort=current_app.json.dumps(primary_sort))
-        db_session.add(db_graph)
-        db_session.commit()
-        generate_graph(encoding_id, analyzer)
-    elif db_graph.data is None:
-        generate_graph(encoding_id, analyzer)
+    ensure_graph_of_sort(encoding_id, primary_sort, analyzer)
 
 
 def save_recursions(analyzer: ProgramAnalyzer, encoding_id: str):
-    for t in analyzer.check_positive_recursion():
-        db_recursion = Recursions(encoding_id=encoding_id,
-                    recursive_transformation_hash=t)
-        db_session.add(db_recursion)
-        try:
-            db_session.commit()
-        except IntegrityError:
-            db_session.rollback()
+    insert_or_ignore(Recursions, [
+        dict(encoding_id=encoding_id, recursive_transformation_hash=t)
+        for t in analyzer.check_positive_recursion()
+    ])
 
 
 def save_analyzer_values(analyzer: ProgramAnalyzer, encoding_id: str):
@@ -280,40 +296,22 @@ def save_analyzer_values(analyzer: ProgramAnalyzer, encoding_id: str):
         )) if analyzer.dependency_graph != None else None
     db_session.add(db_dependency_graph)
 
-    db_names = db_session.query(AnalyzerNames).filter_by(
-        encoding_id=encoding_id).all()
-    seen = set([n.name for n in db_names])
-    for n in analyzer.get_names():
-        if n not in seen:
-            db_name = AnalyzerNames(encoding_id=encoding_id, name=n)
-            db_session.add(db_name)
-            seen.add(n)
-
-    db_facts = db_session.query(AnalyzerFacts).filter_by(
-        encoding_id=encoding_id).all()
-    seen = set([f.fact for f in db_facts])
-    for f in analyzer.facts:
-        if f not in seen:
-            db_fact = AnalyzerFacts(encoding_id=encoding_id, fact=f)
-            db_session.add(db_fact)
-            seen.add(str(f))
-    db_constants = db_session.query(AnalyzerConstants).filter_by(
-        encoding_id=encoding_id).all()
-    seen = set([f.constant for f in db_constants])
-    for c in analyzer.constants:
-        if c not in seen:
-            db_constant = AnalyzerConstants(encoding_id=encoding_id, constant=c)
-            db_session.add(db_constant)
-            seen.add(str(c))
+    insert_or_ignore(AnalyzerNames, [
+        dict(encoding_id=encoding_id, name=n) for n in analyzer.get_names()
+    ])
+    insert_or_ignore(AnalyzerFacts, [
+        dict(encoding_id=encoding_id, fact=f) for f in analyzer.facts
+    ])
+    insert_or_ignore(AnalyzerConstants, [
+        dict(encoding_id=encoding_id, constant=c) for c in analyzer.constants
+    ])
     db_session.commit()
 
 def analyze_program(encoding_id):
     try:
         analyzer = load_analyzer(encoding_id)
     except DatabaseInconsistencyError:
-        program = db_session.execute(
-            select(Encodings.program).where(
-                Encodings.encoding_id == encoding_id)).scalars().all()
+        program = get_encoding_programs(encoding_id)
         db_transformer = db_session.query(Transformers).filter(
             Transformers.encoding_id == encoding_id).first()
         transformer = current_app.json.loads(
@@ -327,20 +325,20 @@ def analyze_program(encoding_id):
 def show_selected_models():
     try:
         encoding_id = session['encoding_id']
+        cancel_sort_precomputation(encoding_id)
         analyzer = analyze_program(encoding_id)
 
-        warnings = [
-            Warnings(encoding_id=encoding_id,
-                     warning=current_app.json.dumps(w))
+        insert_or_ignore(Warnings, [
+            dict(encoding_id=encoding_id, warning=current_app.json.dumps(w))
             for w in analyzer.get_filtered()
-        ]
-        db_session.add_all(warnings)
+        ])
         db_session.commit()
 
         if analyzer.will_work():
             save_recursions(analyzer, encoding_id)
             set_primary_sort(analyzer, encoding_id)
             save_analyzer_values(analyzer, encoding_id)
+            start_sort_precomputation(encoding_id)
     except Exception as e:
         return str(e), 500
     return "ok", 200
@@ -356,9 +354,7 @@ def transform_relax():
         kwargs = request.json["kwargs"] if "kwargs" in request.json else {}
 
         encoding_id = session['encoding_id']
-        encoding = db_session.execute(
-            select(Encodings.program).where(
-                Encodings.encoding_id == encoding_id)).scalars().all()
+        encoding = get_encoding_programs(encoding_id)
         if len(encoding) != 0:
             program = "".join(encoding)
         else:
@@ -437,8 +433,15 @@ def deregister_session():
         if request.json is None:
             return "Invalid request", 400
         session_id = request.json["session_id"] if "session_id" in request.json else session['encoding_id']
+        cancel_sort_precomputation(session_id)
+        graph_cache.invalidate(session_id)
+        search_workers.invalidate(session_id)
 
         queries = [
+            delete(EncodingChunks).where(
+                EncodingChunks.encoding.in_(
+                    select(Encodings.id).where(
+                        Encodings.encoding_id == session_id))),
             delete(Encodings).where(Encodings.encoding_id == session_id),
             delete(Models).where(Models.encoding_id == session_id),
             delete(Graphs).where(Graphs.encoding_id == session_id),
@@ -450,6 +453,11 @@ def deregister_session():
                         GraphNodes.encoding_id == session_id))),
             delete(GraphNodes).where(GraphNodes.encoding_id == session_id),
             delete(GraphEdges).where(GraphEdges.encoding_id == session_id),
+            delete(GraphReasons).where(GraphReasons.encoding_id == session_id),
+            delete(SearchTrigrams).where(
+                SearchTrigrams.encoding_id == session_id),
+            delete(SearchSymbols).where(
+                SearchSymbols.encoding_id == session_id),
             delete(DependencyGraphs).where(
                 DependencyGraphs.encoding_id == session_id),
             delete(Recursions).where(Recursions.encoding_id == session_id),
@@ -468,6 +476,7 @@ def deregister_session():
         for q in queries:
             db_session.execute(q)
         db_session.commit()
+        release_graph_generation_locks(session_id)
     number_of_active_sessions = db_session.execute(
         select(func.count()).select_from(Encodings)).scalar()
     return jsonify(number_of_active_sessions)
@@ -481,9 +490,11 @@ def set_show_all_derived():
             return "Invalid request", 400
         show = request.json["show"] if "show" in request.json else False
         color_theme = request.json["color_theme"] if "color_theme" in request.json else "blue"
+        jobs = request.json["jobs"] if "jobs" in request.json else DEFAULT_JOBS
         db_session.add(
             SessionInfo(encoding_id=session['encoding_id'],
                         show=show,
-                        color_theme=color_theme))
+                        color_theme=color_theme,
+                        jobs=jobs))
         db_session.commit()
     return "ok", 200
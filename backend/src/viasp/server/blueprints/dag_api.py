@@ -1,24 +1,30 @@
+import gzip
 import os
-from collections import defaultdict
-from typing import Union, Collection, Dict, List, Iterable, Optional
+import threading
+import time
+import zlib
+from collections import defaultdict, OrderedDict
+from functools import wraps
+from typing import Any, Callable, Union, Collection, Dict, List, Iterable, Optional, Set, Tuple
 import uuid
 
 import igraph
 import networkx as nx
-import numpy as np
-from flask import Blueprint, current_app, session, request, jsonify, abort, Response, send_file
+from flask import Flask, Blueprint, current_app, session, request, jsonify, abort, Response, send_file
+from clingo import Symbol
 from clingo.ast import AST
 from sqlalchemy.exc import MultipleResultsFound, NoResultFound
-from sqlalchemy import select, delete, update
+from sqlalchemy import select, delete, update, insert, literal, func
 
 from ...asp.reify import ProgramAnalyzer, reify_list
-from ...asp.justify import build_graph, search_nonground_term_in_symbols
-from ...shared.defaults import STATIC_PATH
-from ...shared.model import SearchResultSymbolWrapper, Transformation, Node, Signature
-from ...shared.util import get_start_node_from_graph, hash_from_sorted_transformations, pairwise, get_compatible_node_link_data
-from ...shared.io import StableModel
+from ...asp.justify import build_graph, get_unchanged_prefixes, SearchWorkerPool
+from ...shared.defaults import STATIC_PATH, DEFAULT_JOBS, SORTGENERATION_PRECOMPUTE, SORTGENERATION_TIMEOUT_SECONDS, SORTGENERATION_BATCH_SIZE, GRAPH_CACHE_MAX_ENTRIES, GRAPH_CACHE_MAX_BYTES, SAVE_GRAPH_BATCH_SIZE, RESPONSE_COMPRESSION_MIN_BYTES, RESPONSE_COMPRESSION_LEVEL, SEARCH_TIMEOUT_SECONDS, SEARCH_CONTEXT_LOAD_TIMEOUT_SECONDS
+from ...shared.model import SearchResultSymbolWrapper, Transformation, Node, Signature, SymbolIdentifier
+from ...shared.util import get_start_node_from_graph, hash_from_sorted_transformations, pairwise, get_compatible_node_link_data, hash_string
+from ...shared.io import StableModel, parse_symbols, to_msgpack, msgpack, MSGPACK_MIMETYPE
 from ...shared.simple_logging import error
 from ..database import ensure_encoding_id, db_session
+from ..storage import get_encoding_programs, delete_encoding
 from ..models import *
 
 
@@ -28,14 +34,110 @@ bp = Blueprint("dag_api",
                static_folder='../static/',
                static_url_path='/static')
 
+graph_generation_locks: Dict[Tuple[str, str], threading.RLock] = {}
+graph_generation_locks_lock = threading.Lock()
+sort_precomputations: Dict[str, threading.Event] = {}
+sort_precomputations_lock = threading.Lock()
+
+
+def get_graph_generation_lock(encoding_id: str, graph_hash: str) -> threading.RLock:
+    with graph_generation_locks_lock:
+        return graph_generation_locks.setdefault((encoding_id, graph_hash),
+                                                 threading.RLock())
+
+
+def release_graph_generation_locks(encoding_id: str):
+    with graph_generation_locks_lock:
+        for key in [k for k in graph_generation_locks if k[0] == encoding_id]:
+            del graph_generation_locks[key]
+
+
+class GraphCache:
+    """
+    LRU cache of decoded graphs, keyed by (encoding_id, graph_hash).
+
+    The size of an entry is estimated by the length of its serialized data,
+    the cache evicts the least recently used graphs once either
+    ``max_entries`` or ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, max_entries: int = GRAPH_CACHE_MAX_ENTRIES,
+                 max_bytes: int = GRAPH_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries: OrderedDict[Tuple[str, str], Tuple[nx.DiGraph, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, encoding_id: str, graph_hash: str) -> Optional[nx.DiGraph]:
+        with self._lock:
+            entry = self._entries.get((encoding_id, graph_hash))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((encoding_id, graph_hash))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, encoding_id: str, graph_hash: str, graph: nx.DiGraph, size: int):
+        with self._lock:
+            self._discard((encoding_id, graph_hash))
+            if size > self.max_bytes:
+                return
+            self._entries[(encoding_id, graph_hash)] = (graph, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def invalidate(self, encoding_id: str, graph_hash: Optional[str] = None):
+        with self._lock:
+            if graph_hash is not None:
+                self._discard((encoding_id, graph_hash))
+                return
+            for key in [k for k in self._entries if k[0] == encoding_id]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _discard(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+graph_cache = GraphCache()
+
+
+search_workers = SearchWorkerPool()
+
 class DatabaseInconsistencyError(Exception):
     def __init__(self, message="Database inconsistency found"):
         self.message = message
         super().__init__(self.message)
 
 def nx_to_igraph(nx_graph: nx.DiGraph):
-    return igraph.Graph.Adjacency((np.array(nx.to_numpy_array(nx_graph))
-                                   > 0).tolist())
+    # vertex i of the igraph is the i-th node of nx_graph.nodes(), edges are
+    # added in the row-major order of the adjacency matrix
+    node_index = {node: i for i, node in enumerate(nx_graph.nodes())}
+    edges = sorted((node_index[u], node_index[v]) for u, v in nx_graph.edges())
+    return igraph.Graph(n=len(node_index), edges=edges, directed=True)
 
 def get_current_graph_hash(encoding_id: str) -> Optional[str]:
     query = select(CurrentGraphs.hash).filter_by(encoding_id=encoding_id)
@@ -43,9 +145,13 @@ def get_current_graph_hash(encoding_id: str) -> Optional[str]:
 
 def _get_graph(encoding_id: str):
     current_graph_hash = get_current_graph_hash(encoding_id)
+    graph = graph_cache.get(encoding_id, current_graph_hash)
+    if graph is not None:
+        return graph
     result = db_session.query(Graphs).filter_by(encoding_id=encoding_id, hash=current_graph_hash).first()
     if result is not None and result.data is not None and result.data != "":
         graph = nx.node_link_graph(current_app.json.loads(result.data))
+        graph_cache.put(encoding_id, current_graph_hash, graph, len(result.data))
     else:
         graph = generate_graph(encoding_id)
     return graph
@@ -78,10 +184,9 @@ def handle_request_for_children(
         encoding_id: str) -> Collection[Union[Node, uuid.UUID]]:
     current_graph_hash = get_current_graph_hash(encoding_id)
     result = db_session.query(GraphNodes).filter_by(encoding_id=encoding_id, graph_hash=current_graph_hash, transformation_hash=transformation_hash, recursive_supernode_uuid = None).order_by(GraphNodes.branch_position).all()
-    ordered_children = [current_app.json.loads(n.node) for n in result]
     if ids_only:
-        ordered_children = [node.uuid for node in ordered_children]
-    return ordered_children
+        return [uuid.UUID(n.node_uuid) for n in result]
+    return load_nodes(result)
 
 
 def handle_request_for_children_with_sortHash(
@@ -89,12 +194,14 @@ def handle_request_for_children_with_sortHash(
         current_hash: str,
         encoding_id: str) -> Collection[Node]:
     result = db_session.query(GraphNodes).filter_by(encoding_id=encoding_id, graph_hash=current_hash, transformation_hash=transformation_hash, recursive_supernode_uuid = None).order_by(GraphNodes.branch_position).all()
-    ordered_children = [current_app.json.loads(n.node) for n in result]
-    return ordered_children
+    return load_nodes(result)
 
 
 def clear_encoding_session_data(encoding_id: str):
-    db_session.query(Encodings).filter_by(encoding_id=encoding_id).delete()
+    cancel_sort_precomputation(encoding_id)
+    graph_cache.invalidate(encoding_id)
+    search_workers.invalidate(encoding_id)
+    delete_encoding(encoding_id)
     db_session.query(Models).filter_by(encoding_id = encoding_id).delete()
     db_session.query(Graphs).filter_by(encoding_id = encoding_id).delete()
     db_session.query(CurrentGraphs).filter_by(encoding_id = encoding_id).delete()
@@ -105,6 +212,8 @@ def clear_encoding_session_data(encoding_id: str):
     db_session.execute(delete(GraphSymbols).filter(GraphSymbols.node.in_(db_graph_node_uuids)))
     db_session.query(GraphNodes).filter_by(encoding_id = encoding_id).delete()
     db_session.query(GraphEdges).filter_by(encoding_id = encoding_id).delete()
+    db_session.execute(delete(GraphReasons).filter_by(encoding_id = encoding_id))
+    delete_symbol_index(encoding_id)
     db_session.query(DependencyGraphs).filter_by(encoding_id = encoding_id).delete()
     db_session.query(Recursions).filter_by(encoding_id = encoding_id).delete()
     db_session.query(Clingraphs).filter_by(encoding_id = encoding_id).delete()
@@ -114,22 +223,142 @@ def clear_encoding_session_data(encoding_id: str):
     db_session.execute(delete(AnalyzerFacts).filter_by(encoding_id = encoding_id))
     db_session.execute(delete(AnalyzerConstants).filter_by(encoding_id = encoding_id))
     db_session.commit()
+    release_graph_generation_locks(encoding_id)
+
+
+def negotiate_mimetype() -> str:
+    offered = ["application/json"]
+    if msgpack is not None:
+        offered.append(MSGPACK_MIMETYPE)
+    return request.accept_mimetypes.best_match(offered) or "application/json"
+
+
+def negotiated_response(obj) -> Response:
+    """
+    Respond with MessagePack if the request accepts it rather than JSON, see
+    ``to_msgpack``. JSON stays the default, also if msgpack is not installed.
+    """
+    if negotiate_mimetype() == MSGPACK_MIMETYPE:
+        response = Response(to_msgpack(obj), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(obj)
+    response.vary.add("Accept")
+    return response
+
+
+def get_graph_version(encoding_id: str,
+                      graph_hash: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    Get the hash and version of a graph.
+
+    :param graph_hash: The hash of the graph, by default the current graph.
+    :return: None if the graph is not generated yet.
+    """
+    query = select(Graphs.hash, Graphs.version).where(Graphs.encoding_id == encoding_id)
+    if graph_hash is None:
+        query = query.join(CurrentGraphs,
+                           (CurrentGraphs.encoding_id == Graphs.encoding_id) &
+                           (CurrentGraphs.hash == Graphs.hash))
+    else:
+        query = query.where(Graphs.hash == graph_hash)
+    row = db_session.execute(query).one_or_none()
+    if row is None or row.version == "":
+        return None
+    return row.hash, row.version
+
+
+def make_graph_etag() -> Optional[str]:
+    """
+    Make the ETag of a request to a read-only graph endpoint. It is derived
+    from the version of the graph the request reads, which is the one of its
+    ``currentSort`` or the current graph, and everything else the response
+    depends on. The clingraphs of the encoding are part of it, because they
+    are added and removed without saving the graph again.
+    """
+    encoding_id = session['encoding_id']
+    body = request.get_json(silent=True)
+    graph_hash = body.get("currentSort") if isinstance(body, dict) else None
+    version = get_graph_version(encoding_id, graph_hash)
+    if version is None:
+        return None
+    clingraph_names = db_session.execute(
+        select(Clingraphs.filename).where(
+            Clingraphs.encoding_id == encoding_id).order_by(
+                Clingraphs.filename)).scalars().all()
+    return hash_string("\0".join([
+        encoding_id, *version, *clingraph_names, request.path,
+        request.query_string.decode(), request.get_data(as_text=True),
+        negotiate_mimetype()]))
+
+
+def compress_response(response: Response, content_encoding: Optional[str]) -> None:
+    response.vary.add("Accept-Encoding")
+    if content_encoding is None or response.direct_passthrough or \
+            response.content_length is None or \
+            response.content_length < RESPONSE_COMPRESSION_MIN_BYTES:
+        return
+    data = response.get_data()
+    if content_encoding == "gzip":
+        response.set_data(gzip.compress(data, RESPONSE_COMPRESSION_LEVEL))
+    else:
+        response.set_data(zlib.compress(data, RESPONSE_COMPRESSION_LEVEL))
+    response.headers["Content-Encoding"] = content_encoding
+
+
+def conditional_graph_response(methods: Collection[str] = ("GET", "POST")) -> Callable:
+    """
+    Make a read-only graph endpoint answer with a strong ETag, with
+    ``304 Not Modified`` if the request already has it, and compress large
+    responses with gzip or deflate if the request accepts it.
+    The responses of a graph never change until it is saved again, so the
+    ETag only depends on the version of the graph and the request.
+
+    :param methods: The methods of the endpoint that only read the graph.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in methods:
+                return view(*args, **kwargs)
+            content_encoding = request.accept_encodings.best_match(["gzip", "deflate"])
+            etag = make_graph_etag()
+            if etag is not None:
+                for tag in [etag, f"{etag}-{content_encoding}"]:
+                    if tag in request.if_none_match:
+                        response = Response(status=304)
+                        response.set_etag(tag)
+                        response.vary.update(["Accept", "Accept-Encoding"])
+                        return response
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            compress_response(response, content_encoding)
+            etag = etag or make_graph_etag()
+            if etag is not None:
+                encoding = response.headers.get("Content-Encoding")
+                response.set_etag(etag if encoding is None else f"{etag}-{encoding}")
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
 
 
 @bp.route("/graph/children/<transformation_hash>", methods=["GET"])
 @ensure_encoding_id
+@conditional_graph_response()
 def get_children(transformation_hash):
     if request.method == "GET":
         ids_only = request.args.get("ids_only", default=False, type=bool)
         to_be_returned = handle_request_for_children(transformation_hash,
                                                      ids_only,
                                                      session['encoding_id'])
-        return jsonify(to_be_returned)
+        return negotiated_response(to_be_returned)
     raise NotImplementedError
 
 
 @bp.route("/graph/children", methods=["POST"])
 @ensure_encoding_id
+@conditional_graph_response()
 def get_children_of_transformation_hash_and_current_Sort():
     if request.method == "POST":
         if request.json is None:
@@ -145,7 +374,7 @@ def get_children_of_transformation_hash_and_current_Sort():
         to_be_returned = handle_request_for_children_with_sortHash(
             transformation_hash, current_hash, session['encoding_id'])
 
-        return jsonify(to_be_returned)
+        return negotiated_response(to_be_returned)
     raise NotImplementedError
 
 
@@ -182,45 +411,54 @@ def get_src_tgt_mapping_from_graph(encoding_id: str,
     return db_edges
 
 
-def find_reason_by_uuid(symbolid, nodeid, encoding_id):
-    node = find_node_by_uuid(nodeid, encoding_id)
-
-    symbolstr = str(
-        getattr(next(filter(lambda x: x.uuid == symbolid, node.diff)),
-                "symbol", ""))
-    reasonids = list(
-        set(getattr(r, "uuid", "") for r in node.reason.get(symbolstr, [])
-    ))
-    return reasonids
+def find_reason_by_uuid(symbolid: uuid.UUID, nodeid: uuid.UUID,
+                        encoding_id: str) -> List[str]:
+    current_graph_hash = get_current_graph_hash(encoding_id)
+    reason_uuids = db_session.execute(
+        select(GraphReasons.reason_uuid).filter_by(
+            encoding_id=encoding_id,
+            graph_hash=current_graph_hash,
+            node=nodeid.hex,
+            symbol_uuid=symbolid.hex).where(
+                GraphReasons.reason_uuid.is_not(None)).order_by(
+                    GraphReasons.id)).scalars()
+    return list(dict.fromkeys(reason_uuids))
 
 
-def find_reason_rule_by_uuid(symbolid, nodeid, encoding_id) -> Optional[int]:
+def find_reason_rule_by_uuid(symbolid: uuid.UUID, nodeid: uuid.UUID,
+                             encoding_id: str) -> Optional[str]:
     current_graph_hash = get_current_graph_hash(encoding_id)
-    matching_nodes = db_session.query(GraphNodes).filter_by(
-        encoding_id=encoding_id,
-        graph_hash=current_graph_hash,
-        node_uuid=nodeid).all()
-
-    if len(matching_nodes) == 0:
-        for node in db_session.query(GraphNodes).all():
-            n = current_app.json.loads(node.node)
-            if len(n.recursive) > 0:
-                matching_nodes = [
-                    x for x in n.recursive
-                    if x.uuid == nodeid
-                ]
-
-    if len(matching_nodes) != 1:
-        # raise ValueError(f"Couldn't find reason rule of {symbolid}.")
-        return None
-    node = current_app.json.loads(matching_nodes[0].node)
+    return db_session.execute(
+        select(GraphReasons.rule_hash).filter_by(
+            encoding_id=encoding_id,
+            graph_hash=current_graph_hash,
+            node=nodeid.hex,
+            symbol_uuid=symbolid.hex).limit(1)).scalar()
 
-    symbolstr = str(
-        getattr(next(filter(lambda x: x.uuid == symbolid, node.diff)),
-                "symbol", ""))
-    reasonrule = node.reason_rules.get(symbolstr, None)
 
-    return reasonrule
+def find_reasons_of_node(node_uuid: str,
+                         encoding_id: str) -> Dict[str, List[SymbolIdentifier]]:
+    """
+    Get the reasons of the symbols derived in a node, like ``Node.reason``.
+    """
+    current_graph_hash = get_current_graph_hash(encoding_id)
+    rows = db_session.execute(
+        select(GraphReasons.symbol, GraphReasons.reason_uuid,
+               GraphReasons.reason_symbol,
+               GraphReasons.reason_has_reason).filter_by(
+                   encoding_id=encoding_id,
+                   graph_hash=current_graph_hash,
+                   node=node_uuid).order_by(GraphReasons.id)).all()
+    reason_symbols = iter(parse_symbols(
+        [row.reason_symbol for row in rows if row.reason_uuid is not None]))
+    reasons: Dict[str, List[SymbolIdentifier]] = {}
+    for row in rows:
+        symbol_reasons = reasons.setdefault(row.symbol, [])
+        if row.reason_uuid is not None:
+            symbol_reasons.append(
+                SymbolIdentifier(next(reason_symbols), row.reason_has_reason,
+                                 uuid.UUID(row.reason_uuid)))
+    return reasons
 
 def get_current_sort_by_hash(encoding_id, current_hash):
     db_current_sort = db_session.query(Graphs).filter_by(
@@ -247,8 +485,125 @@ def load_analyzer(encoding_id) -> ProgramAnalyzer:
 
     return ProgramAnalyzer(dependency_graph=dependency_graph, names=analyzer_names, facts=analyzer_facts, constants=analyzer_constants)
 
+def ensure_graph_of_sort(encoding_id: str,
+                         sorted_program: List[Transformation],
+                         analyzer: ProgramAnalyzer,
+                         previous_hash: Optional[str] = None,
+                         first_changed_index: int = 0,
+                         cancelled: Optional[threading.Event] = None) -> None:
+    """
+    Generate and save the graph of the sort, unless it is already stored.
+    Holds the generation lock of the graph, so a graph that is precomputed in
+    the background is not generated a second time, while the graphs of other
+    sorts and encodings are generated independently.
+    """
+    graph_hash = hash_from_sorted_transformations(sorted_program)
+    with get_graph_generation_lock(encoding_id, graph_hash):
+        db_graph = db_session.query(Graphs).filter_by(
+            encoding_id=encoding_id,
+            hash=graph_hash).populate_existing().one_or_none()
+        if db_graph is None:
+            db_graph = Graphs(encoding_id=encoding_id,
+                              hash=graph_hash,
+                              data=None,
+                              sort=current_app.json.dumps(sorted_program))
+            db_session.add(db_graph)
+            db_session.commit()
+        if db_graph.data is None or db_graph.data == "":
+            generate_graph(encoding_id, analyzer, previous_hash,
+                           first_changed_index, sorted_program, cancelled)
+
+
+def get_adjacent_moves(sorted_program: List[Transformation]) -> List[Tuple[int, int]]:
+    """
+    Get all moves of a single transformation that lead to another valid sort,
+    the most likely ones, which move a transformation the least, first.
+
+    :return: Tuples of the old and new index of the moved transformation.
+    """
+    moves = [(t.id, new_index) for t in sorted_program
+             for new_index in range(t.adjacent_sort_indices["lower_bound"],
+                                    t.adjacent_sort_indices["upper_bound"] + 1)
+             if new_index != t.id]
+    moves.sort(key=lambda move: (abs(move[1] - move[0]), move[0]))
+    return moves
+
+
+def precompute_adjacent_sorts(app: Flask, encoding_id: str,
+                              cancelled: Optional[threading.Event] = None) -> None:
+    """
+    Generate the graphs of the sorts that are reached by moving a single
+    transformation of the current sort, so that dragging a transformation
+    in the frontend finds its graph already stored.
+    Stops after ``SORTGENERATION_BATCH_SIZE`` sorts, when
+    ``SORTGENERATION_TIMEOUT_SECONDS`` have passed or once ``cancelled`` is set.
+    """
+    if cancelled is None:
+        cancelled = threading.Event()
+    deadline = time.monotonic() + app.config.get(
+        "SORTGENERATION_TIMEOUT_SECONDS", SORTGENERATION_TIMEOUT_SECONDS)
+    batch_size = app.config.get("SORTGENERATION_BATCH_SIZE",
+                                SORTGENERATION_BATCH_SIZE)
+    with app.app_context():
+        try:
+            analyzer = load_analyzer(encoding_id)
+            current_hash = get_current_graph_hash(encoding_id)
+            current_sort = get_current_sort_by_hash(encoding_id, current_hash)
+            for old_index, new_index in get_adjacent_moves(current_sort)[:batch_size]:
+                if time.monotonic() > deadline or cancelled.is_set():
+                    break
+                sorted_program_rules = [t.rules for t in current_sort]
+                moved_item = sorted_program_rules.pop(old_index)
+                sorted_program_rules.insert(new_index, moved_item)
+                ensure_graph_of_sort(
+                    encoding_id,
+                    analyzer.make_transformations_from_sorted_program(
+                        sorted_program_rules), analyzer, current_hash,
+                    min(old_index, new_index), cancelled)
+        except Exception as e:
+            error(f"Precomputing sorts stopped: {e}")
+        finally:
+            db_session.remove()
+            with sort_precomputations_lock:
+                if sort_precomputations.get(encoding_id) is cancelled:
+                    del sort_precomputations[encoding_id]
+
+
+def cancel_sort_precomputation(encoding_id: str) -> None:
+    """
+    Stop the precomputation of the encoding's sorts before its next sort,
+    a graph that is being generated is not saved.
+    """
+    with sort_precomputations_lock:
+        cancelled = sort_precomputations.pop(encoding_id, None)
+    if cancelled is not None:
+        cancelled.set()
+
+
+def start_sort_precomputation(encoding_id: str) -> None:
+    """
+    Precompute the adjacent sorts in the background, if ``SORTGENERATION_PRECOMPUTE``
+    is set. Off by default, because the stored graphs compete with the
+    requests for the write lock of the database.
+    """
+    if not current_app.config.get("SORTGENERATION_PRECOMPUTE", SORTGENERATION_PRECOMPUTE) or \
+            current_app.config.get("SORTGENERATION_TIMEOUT_SECONDS", 0) <= 0:
+        return
+    cancelled = threading.Event()
+    with sort_precomputations_lock:
+        previous = sort_precomputations.get(encoding_id)
+        if previous is not None:
+            previous.set()
+        sort_precomputations[encoding_id] = cancelled
+    threading.Thread(target=precompute_adjacent_sorts,
+                     args=(current_app._get_current_object(), encoding_id,
+                           cancelled),
+                     daemon=True).start()
+
+
 @bp.route("/graph/sorts", methods=["GET", "POST"])
 @ensure_encoding_id
+@conditional_graph_response(methods=["GET"])
 def handle_new_sort():
     if request.method == "POST":
         if request.json is None:
@@ -286,14 +641,9 @@ def handle_new_sort():
         except Exception as e:
             return str(e), 500
 
-        db_graph = db_session.query(Graphs).filter_by(encoding_id=encoding_id, hash=new_hash).one_or_none()
-        if db_graph is None:
-            db_graph = Graphs(encoding_id = encoding_id, hash = new_hash, data = None, sort = current_app.json.dumps(new_sorted_program_transformations))
-            db_session.add(db_graph)
-            db_session.commit()
-            generate_graph(encoding_id, analyzer)
-        elif db_graph.data is None or db_graph.data == "":
-            generate_graph(encoding_id, analyzer)
+        ensure_graph_of_sort(encoding_id, new_sorted_program_transformations,
+                             analyzer, current_sort,
+                             min(old_index, new_index))
         return jsonify({"hash":new_hash})
     elif request.method == "GET":
         encoding_id = session['encoding_id']
@@ -304,6 +654,7 @@ def handle_new_sort():
 
 @bp.route("/graph/edges", methods=["GET", "POST"])
 @ensure_encoding_id
+@conditional_graph_response()
 def get_edges():
     to_be_returned = []
     if request.method == "POST":
@@ -321,8 +672,7 @@ def get_edges():
     elif request.method == "GET":
         to_be_returned = get_src_tgt_mapping_from_graph(session['encoding_id'])
 
-    jsonified = jsonify(to_be_returned)
-    return jsonified
+    return negotiated_response(to_be_returned)
 
 
 @bp.route("/graph/transformation/<uuid>", methods=["GET"])
@@ -337,6 +687,7 @@ def get_rule(uuid):
 
 @bp.route("/graph/transformations", methods=["POST"])
 @ensure_encoding_id
+@conditional_graph_response()
 def get_transformation_by_id_and_current_sort():
     if request.method == "POST":
         if request.json is None:
@@ -357,19 +708,15 @@ def get_transformation_by_id_and_current_sort():
 @bp.route("/graph/model/<uuid>", methods=["GET"])
 @ensure_encoding_id
 def get_node(uuid):
-    graph_nodes = db_session.query(GraphNodes).filter_by(encoding_id=session['encoding_id']).order_by(GraphNodes.branch_position).all()
-    if graph_nodes is None:
-        raise DatabaseInconsistencyError
-
-    for node in graph_nodes:
-        n = current_app.json.loads(node.node)
-        if n.uuid == uuid:
-            return jsonify(n)
-    abort(400)
+    graph_nodes = db_session.query(GraphNodes).filter_by(encoding_id=session['encoding_id'], node_uuid=uuid).all()
+    if len(graph_nodes) == 0:
+        abort(400)
+    return jsonify(load_nodes(graph_nodes)[0])
 
 
 @bp.route("/graph/facts", methods=["GET"])
 @ensure_encoding_id
+@conditional_graph_response()
 def get_facts():
     encoding_id = session['encoding_id']
 
@@ -378,9 +725,9 @@ def get_facts():
         encoding_id=encoding_id,
         graph_hash=current_graph_hash,
         transformation_hash="-1").order_by(GraphNodes.branch_position).all()
-    facts = [current_app.json.loads(n.node) for n in facts]
+    facts = load_nodes(facts)
 
-    return jsonify(facts)
+    return negotiated_response(facts)
 
 
 @bp.route("/graph/sorted_program", methods=["GET"])
@@ -483,6 +830,9 @@ def entire_graph():
                 encoding_id=encoding_id, hash=current_graph_hash).first()
             if db_graph is not None and db_graph.data is not None and db_graph.data != "":
                 db_graph.data = ""
+                db_graph.version = ""
+            graph_cache.invalidate(encoding_id, current_graph_hash)
+            search_workers.invalidate(encoding_id, current_graph_hash)
             # db_session.query(CurrentGraphs).filter_by(encoding_id=encoding_id).delete()
             # db_session.query(GraphNodes).filter_by(encoding_id=encoding_id, graph_hash=current_graph_hash).delete()
             db_session.commit()
@@ -492,119 +842,275 @@ def entire_graph():
     raise NotImplementedError
 
 
+def make_symbol_rows(node: Node) -> Iterable[Dict[str, Any]]:
+    for symbol in node.diff:
+        yield dict(node=node.uuid.hex,
+                   symbol_uuid=symbol.uuid.hex,
+                   symbol=str(symbol.symbol),
+                   has_reason=symbol.has_reason)
+
+
+def make_reason_rows(node: Node, encoding_id: str,
+                     graph_hash: str) -> Iterable[Dict[str, Any]]:
+    symbol_uuids = {str(s.symbol): s.uuid.hex for s in node.diff}
+    for symbol in dict.fromkeys([*node.reason, *node.reason_rules]):
+        row = dict(encoding_id=encoding_id,
+                   graph_hash=graph_hash,
+                   node=node.uuid.hex,
+                   symbol=symbol,
+                   symbol_uuid=symbol_uuids.get(symbol),
+                   rule_hash=node.reason_rules.get(symbol))
+        reasons = [r for r in node.reason.get(symbol, [])
+                   if isinstance(r, SymbolIdentifier)]
+        if len(reasons) == 0:
+            yield dict(row, reason_uuid=None, reason_symbol=None,
+                       reason_has_reason=False)
+        for reason in reasons:
+            yield dict(row,
+                       reason_uuid=reason.uuid.hex,
+                       reason_symbol=str(reason.symbol),
+                       reason_has_reason=reason.has_reason)
+
+
+def get_ancestor_uuids(node_uuids: Collection[str]) -> Dict[str, List[str]]:
+    """
+    Follow the parent_uuid column from every node up to the start of its path.
+
+    :param node_uuids: The nodes to find the ancestors of.
+    :return: A mapping from every node to itself and its ancestors, closest first.
+    """
+    ancestors = select(
+        GraphNodes.node_uuid.label("node"),
+        GraphNodes.node_uuid.label("ancestor"),
+        GraphNodes.parent_uuid.label("parent"),
+        literal(0).label("depth")).where(
+            GraphNodes.node_uuid.in_(node_uuids)).cte("ancestors",
+                                                      recursive=True)
+    ancestors = ancestors.union_all(
+        select(ancestors.c.node, GraphNodes.node_uuid, GraphNodes.parent_uuid,
+               ancestors.c.depth + 1).join(
+                   GraphNodes, GraphNodes.node_uuid == ancestors.c.parent))
+    result = db_session.execute(
+        select(ancestors.c.node, ancestors.c.ancestor).order_by(
+            ancestors.c.node, ancestors.c.depth)).all()
+    ancestor_uuids: Dict[str, List[str]] = defaultdict(list)
+    for node_uuid, ancestor_uuid in result:
+        ancestor_uuids[node_uuid].append(ancestor_uuid)
+    return ancestor_uuids
+
+
+def get_symbols_of_nodes(
+        node_uuids: Collection[str]) -> Dict[str, List[SymbolIdentifier]]:
+    db_symbols = db_session.execute(
+        select(GraphSymbols.node, GraphSymbols.symbol,
+               GraphSymbols.symbol_uuid, GraphSymbols.has_reason).where(
+                   GraphSymbols.node.in_(node_uuids))).all()
+    symbols: Dict[str, List[SymbolIdentifier]] = defaultdict(list)
+    parsed_symbols = parse_symbols([row.symbol for row in db_symbols])
+    for (node_uuid, _, symbol_uuid, has_reason), symbol in zip(db_symbols, parsed_symbols):
+        symbols[node_uuid].append(
+            SymbolIdentifier(symbol, has_reason, uuid.UUID(symbol_uuid)))
+    return symbols
+
+
+def load_nodes(db_nodes: List[GraphNodes]) -> List[Node]:
+    """
+    Create the nodes of the given rows of the nodes_table.
+    Only the diff of a node is stored in the symbols_table, its atoms are
+    rebuilt from the diffs of its ancestors. Nodes that are not part of a
+    recursion get their recursive subnodes attached.
+
+    :param db_nodes: The rows of the nodes_table.
+    :return: The nodes in the order of the rows.
+    """
+    if len(db_nodes) == 0:
+        return []
+    node_uuids = [n.node_uuid for n in db_nodes]
+    db_subnodes = db_session.query(GraphNodes).filter(
+        GraphNodes.recursive_supernode_uuid.in_([
+            n.node_uuid for n in db_nodes if n.recursive_supernode_uuid is None
+        ])).all()
+    ancestor_uuids = get_ancestor_uuids(
+        node_uuids + [n.node_uuid for n in db_subnodes])
+    symbols = get_symbols_of_nodes(
+        {a for ancestors in ancestor_uuids.values() for a in ancestors})
+
+    def make_node(db_node: GraphNodes) -> Node:
+        atoms: Dict[Symbol, SymbolIdentifier] = {}
+        for ancestor_uuid in ancestor_uuids[db_node.node_uuid]:
+            for symbol in symbols[ancestor_uuid]:
+                atoms.setdefault(symbol.symbol, symbol)
+        return Node(diff=frozenset(symbols[db_node.node_uuid]),
+                    rule_nr=db_node.rule_nr,
+                    atoms=frozenset(atoms.values()),
+                    reason=current_app.json.loads(db_node.reason),
+                    reason_rules=current_app.json.loads(db_node.reason_rules),
+                    space_multiplier=db_node.space_multiplier,
+                    uuid=uuid.UUID(db_node.node_uuid))
+
+    subnodes: Dict[str, List[Node]] = defaultdict(list)
+    for db_subnode in sorted(db_subnodes,
+                             key=lambda n: len(ancestor_uuids[n.node_uuid])):
+        subnodes[db_subnode.recursive_supernode_uuid].append(
+            make_node(db_subnode))
+    nodes = []
+    for db_node in db_nodes:
+        node = make_node(db_node)
+        node.recursive = subnodes[db_node.node_uuid]
+        nodes.append(node)
+    return nodes
+
+
+def delete_graph_rows(encoding_id: str, graph_hash: str):
+    """
+    Delete the nodes, edges, symbols and reasons of a graph, so that saving
+    it again does not add to the rows of the previous save.
+    """
+    graph_node_uuids = select(GraphNodes.node_uuid).filter_by(
+        encoding_id=encoding_id, graph_hash=graph_hash)
+    db_session.execute(delete(GraphSymbols).where(GraphSymbols.node.in_(graph_node_uuids)))
+    db_session.execute(delete(GraphReasons).filter_by(encoding_id=encoding_id, graph_hash=graph_hash))
+    db_session.execute(delete(GraphEdges).filter_by(encoding_id=encoding_id, graph_hash=graph_hash))
+    db_session.execute(delete(GraphNodes).filter_by(encoding_id=encoding_id, graph_hash=graph_hash))
+
+
 def save_graph(graph: nx.DiGraph, encoding_id: str,
-               sorted_program: List[Transformation]):
+               sorted_program: List[Transformation], bulk: bool = True):
     graph_hash = hash_from_sorted_transformations(sorted_program)
+    graph_cache.invalidate(encoding_id, graph_hash)
+    search_workers.invalidate(encoding_id, graph_hash)
 
     db_graph = db_session.query(Graphs).filter_by(
         encoding_id=encoding_id, hash=graph_hash).one_or_none()
     if db_graph is not None:
         db_graph.data = current_app.json.dumps(
-            get_compatible_node_link_data(graph))
+            get_compatible_node_link_data(graph), compact_symbols=True)
     else:
         db_graph = Graphs(encoding_id=encoding_id,
                           hash=graph_hash,
                           data=current_app.json.dumps(
-                              get_compatible_node_link_data(graph)),
+                              get_compatible_node_link_data(graph),
+                              compact_symbols=True),
                           sort=current_app.json.dumps(sorted_program))
         db_session.add(db_graph)
+    db_graph.version = uuid.uuid4().hex
 
+    delete_graph_rows(encoding_id, graph_hash)
+    rows = make_graph_rows(graph, encoding_id, graph_hash)
+    if bulk:
+        insert_rows_in_batches(rows)
+    else:
+        db_session.add_all(model(**row) for model, row in rows)
+    build_symbol_index(encoding_id, graph_hash)
+    db_session.commit()
+
+
+def make_node_row(node: Node, encoding_id: str, graph_hash: str,
+                  transformation_hash: str, branch_position: float,
+                  parent_uuid: Optional[str] = None,
+                  recursive_supernode_uuid: Optional[str] = None,
+                  space_multiplier: Optional[float] = None) -> Dict[str, Any]:
+    return dict(encoding_id=encoding_id,
+                graph_hash=graph_hash,
+                transformation_hash=transformation_hash,
+                branch_position=branch_position,
+                rule_nr=node.rule_nr,
+                reason=current_app.json.dumps(dict(node.reason)),
+                reason_rules=current_app.json.dumps(node.reason_rules),
+                node_uuid=node.uuid.hex,
+                parent_uuid=parent_uuid,
+                recursive_supernode_uuid=recursive_supernode_uuid,
+                space_multiplier=node.space_multiplier
+                if space_multiplier is None else space_multiplier)
+
+
+def make_edge_row(source: Node, target: Node, encoding_id: str,
+                  graph_hash: str, transformation_hash: str,
+                  recursion_anchor_keyword: Optional[str] = None,
+                  recursive_supernode_uuid: Optional[str] = None) -> Dict[str, Any]:
+    return dict(encoding_id=encoding_id,
+                graph_hash=graph_hash,
+                source=source.uuid.hex,
+                target=target.uuid.hex,
+                transformation_hash=transformation_hash,
+                style="solid",
+                recursion_anchor_keyword=recursion_anchor_keyword,
+                recursive_supernode_uuid=recursive_supernode_uuid)
+
+
+def make_graph_rows(graph: nx.DiGraph, encoding_id: str, graph_hash: str):
+    """
+    Traverse the graph and yield the rows of the nodes, symbols, reasons and edges tables.
+
+    :param graph: The graph to be saved.
+    :return: Pairs of the mapped class and the row to be inserted into its table.
+    """
     pos: Dict[Node, List[float]] = get_node_positions(graph)
-    db_nodes = []
-    db_symbols = []
-    db_edges = []
     for source, target, edge in graph.edges(data=True):
-        db_edges.append(GraphEdges(
-            encoding_id=encoding_id,
-            graph_hash=graph_hash,
-            source=source.uuid.hex,
-            target=target.uuid.hex,
-            transformation_hash=edge["transformation"].hash,
-            style="solid"
-        ))
-
+        transformation_hash = edge["transformation"].hash
         branch_position = pos[target][0]
-        db_nodes.append(
-        GraphNodes(encoding_id=encoding_id,
-                   graph_hash=graph_hash,
-                   transformation_hash=edge["transformation"].hash,
-                   branch_position=branch_position,
-                   node=current_app.json.dumps(target),
-                   node_uuid=target.uuid.hex,
-                   space_multiplier=target.space_multiplier)
-        )
-        for symbol in target.diff:
-            db_symbols.append(
-                GraphSymbols(node=target.uuid.hex,
-                             symbol_uuid=symbol.uuid.hex,
-                             symbol=str(symbol.symbol)))
+        yield GraphEdges, make_edge_row(source, target, encoding_id,
+                                        graph_hash, transformation_hash)
+        yield GraphNodes, make_node_row(target, encoding_id, graph_hash,
+                                        transformation_hash, branch_position,
+                                        parent_uuid=source.uuid.hex)
+        for row in make_symbol_rows(target):
+            yield GraphSymbols, row
+        for row in make_reason_rows(target, encoding_id, graph_hash):
+            yield GraphReasons, row
 
         if len(target.recursive) > 0:
+            parent_uuid = None
             for subnode in target.recursive:
-                db_nodes.append(
-                    GraphNodes(encoding_id=encoding_id,
-                               graph_hash=graph_hash,
-                               transformation_hash=edge["transformation"].hash,
-                               branch_position=branch_position,
-                               node=current_app.json.dumps(subnode),
-                               node_uuid=subnode.uuid.hex,
-                               recursive_supernode_uuid=target.uuid.hex,
-                               space_multiplier=1)
-                )
-                for symbol in subnode.diff:
-                    db_symbols.append(
-                        GraphSymbols(node=subnode.uuid.hex,
-                                     symbol_uuid=symbol.uuid.hex,
-                                     symbol=str(symbol.symbol)))
-            db_edges.append(GraphEdges(
-                encoding_id=encoding_id,
-                graph_hash=graph_hash,
-                source=target.uuid.hex,
-                target=target.recursive[0].uuid.hex,
-                transformation_hash=edge["transformation"].hash,
-                style="solid",
-                recursion_anchor_keyword="in",
-                recursive_supernode_uuid=target.uuid.hex
-            ))
+                yield GraphNodes, make_node_row(
+                    subnode, encoding_id, graph_hash, transformation_hash,
+                    branch_position, parent_uuid=parent_uuid,
+                    recursive_supernode_uuid=target.uuid.hex,
+                    space_multiplier=1)
+                for row in make_symbol_rows(subnode):
+                    yield GraphSymbols, row
+                for row in make_reason_rows(subnode, encoding_id, graph_hash):
+                    yield GraphReasons, row
+                parent_uuid = subnode.uuid.hex
+            yield GraphEdges, make_edge_row(
+                target, target.recursive[0], encoding_id, graph_hash,
+                transformation_hash, recursion_anchor_keyword="in",
+                recursive_supernode_uuid=target.uuid.hex)
             for s, t in pairwise(target.recursive):
-                db_edges.append(GraphEdges(
-                    encoding_id=encoding_id,
-                    graph_hash=graph_hash,
-                    source=s.uuid.hex,
-                    target=t.uuid.hex,
-                    transformation_hash=edge["transformation"].hash,
-                    style="solid",
-                    recursive_supernode_uuid=target.uuid.hex
-                ))
+                yield GraphEdges, make_edge_row(
+                    s, t, encoding_id, graph_hash, transformation_hash,
+                    recursive_supernode_uuid=target.uuid.hex)
             if graph.out_degree(target) > 0:
-                db_edges.append(
-                    GraphEdges(encoding_id=encoding_id,
-                               graph_hash=graph_hash,
-                               source=target.recursive[-1].uuid.hex,
-                               target=target.uuid.hex,
-                               transformation_hash=edge["transformation"].hash,
-                               style="solid",
-                               recursion_anchor_keyword="out",
-                               recursive_supernode_uuid=target.uuid.hex))
+                yield GraphEdges, make_edge_row(
+                    target.recursive[-1], target, encoding_id, graph_hash,
+                    transformation_hash, recursion_anchor_keyword="out",
+                    recursive_supernode_uuid=target.uuid.hex)
     fact_node = get_start_node_from_graph(graph)
-    db_nodes.append(
-        GraphNodes(encoding_id=encoding_id,
-                   graph_hash=graph_hash,
-                   transformation_hash="-1",
-                   branch_position=0,
-                   node=current_app.json.dumps(fact_node),
-                   node_uuid=fact_node.uuid.hex,
-                   space_multiplier=1))
-    for symbol in fact_node.diff:
-        db_symbols.append(
-            GraphSymbols(node=fact_node.uuid.hex,
-                         symbol_uuid=symbol.uuid.hex,
-                         symbol=str(symbol.symbol)))
-    db_session.add_all(db_nodes)
-    db_session.add_all(db_symbols)
-    db_session.add_all(db_edges)
+    yield GraphNodes, make_node_row(fact_node, encoding_id, graph_hash, "-1",
+                                    0, space_multiplier=1)
+    for row in make_symbol_rows(fact_node):
+        yield GraphSymbols, row
+    for row in make_reason_rows(fact_node, encoding_id, graph_hash):
+        yield GraphReasons, row
 
-    db_session.commit()
+
+def insert_rows_in_batches(rows: Iterable[Tuple[Any, Dict[str, Any]]],
+                           batch_size: int = SAVE_GRAPH_BATCH_SIZE):
+    """
+    Insert the rows with executemany statements, bypassing the unit of work of the ORM.
+    The rows are buffered per table and written whenever a buffer is full, so
+    that the rows of large graphs are never all held in memory at once.
+    """
+    batches: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+    for model, row in rows:
+        batch = batches[model]
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db_session.execute(insert(model.__table__), batch)
+            batches[model] = []
+    for model, batch in batches.items():
+        if len(batch) > 0:
+            db_session.execute(insert(model.__table__), batch)
 
 
 def get_atoms_in_path_by_signature(uuid: str, encoding_id: str):
@@ -626,7 +1132,7 @@ def find_node_by_uuid(uuid: str, encoding_id: str) -> Node:
 
     if len(matching_nodes) == 0:
         raise ValueError(f"No node with uuid {uuid}.")
-    return current_app.json.loads(matching_nodes[0].node)
+    return load_nodes(matching_nodes)[0]
 
 
 def is_recursive(node: str) -> bool:
@@ -657,13 +1163,14 @@ def get_kind(uuid: str, encoding_id: str) -> str:
 
 @bp.route("/detail/<uuid>", methods=["GET"])
 @ensure_encoding_id
+@conditional_graph_response()
 def model(uuid):
     if uuid is None:
         abort(Response("Parameter 'key' required.", 400))
     encoding_id = session['encoding_id']
     kind = get_kind(uuid, encoding_id)
     path = get_atoms_in_path_by_signature(uuid, encoding_id)
-    return jsonify((kind, path))
+    return negotiated_response((kind, path))
 
 
 @bp.route("/detail/explain/<uuid>", methods=["GET"])
@@ -671,8 +1178,7 @@ def model(uuid):
 def explain(uuid):
     if uuid is None:
         abort(Response("Parameter 'key' required.", 400))
-    node = find_node_by_uuid(uuid, session['encoding_id'])
-    explain = node.reason
+    explain = find_reasons_of_node(uuid, session['encoding_id'])
     return jsonify(explain)
 
 
@@ -714,23 +1220,96 @@ def get_all_symbols_in_graph(encoding_id, current_graph_hash):
     return db_graph_symbols
 
 
-def search_ground_term_in_symbols(query, db_graph_symbols, is_autocomplete=False):
-    all_filtered_symbols = list(
-        filter(lambda x: query in x[0].symbol, db_graph_symbols))
-    all_filtered_symbols.reverse()
-    symbols_results = []
-    for symbol, _ in all_filtered_symbols:
-        if symbol.symbol not in symbols_results:
-            symbols_results.append(
-                SearchResultSymbolWrapper(
-                    repr=symbol.symbol,
-                    includes=[symbol.symbol_uuid],
-                    is_autocomplete=is_autocomplete
-                ))
-        else:
-            symbols_results[symbols_results.index(
-                symbol.symbol)].includes.append(symbol.symbol_uuid)
-    return symbols_results
+def get_trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def delete_symbol_index(encoding_id: str, graph_hash: Optional[str] = None):
+    filters = dict(encoding_id=encoding_id)
+    if graph_hash is not None:
+        filters["graph_hash"] = graph_hash
+    db_session.execute(delete(SearchTrigrams).filter_by(**filters))
+    db_session.execute(delete(SearchSymbols).filter_by(**filters))
+
+
+def build_symbol_index(encoding_id: str, graph_hash: str):
+    """
+    Index the distinct symbols of the graph's top level nodes by their trigrams,
+    so that ground queries only look at the symbols sharing all of the query's
+    trigrams instead of scanning every symbol of the graph.
+    """
+    delete_symbol_index(encoding_id, graph_hash)
+    occurrences = db_session.execute(
+        select(GraphSymbols.symbol, GraphSymbols.symbol_uuid).join(
+            GraphNodes, GraphNodes.node_uuid == GraphSymbols.node).filter(
+                GraphNodes.encoding_id == encoding_id,
+                GraphNodes.graph_hash == graph_hash,
+                GraphNodes.recursive_supernode_uuid.is_(None)).order_by(
+                    GraphNodes.branch_position)).all()
+    includes: Dict[str, List[str]] = defaultdict(list)
+    for symbol, symbol_uuid in occurrences:
+        includes[symbol].append(symbol_uuid)
+    insert_rows_in_batches(
+        (SearchSymbols,
+         dict(encoding_id=encoding_id,
+              graph_hash=graph_hash,
+              symbol=symbol,
+              includes=current_app.json.dumps(symbol_uuids)))
+        for symbol, symbol_uuids in includes.items())
+    indexed_symbols = db_session.execute(
+        select(SearchSymbols.id, SearchSymbols.symbol).filter_by(
+            encoding_id=encoding_id, graph_hash=graph_hash)).all()
+    insert_rows_in_batches(
+        (SearchTrigrams,
+         dict(encoding_id=encoding_id,
+              graph_hash=graph_hash,
+              trigram=trigram,
+              search_symbol=search_symbol))
+        for search_symbol, symbol in indexed_symbols
+        for trigram in get_trigrams(symbol))
+
+
+def search_nonground_term(query: str, encoding_id: str,
+                          graph_hash: str) -> List[SearchResultSymbolWrapper]:
+    """
+    Search the non-ground query in a search worker, which loads the symbols
+    of the graph once per version of the graph.
+    """
+    graph_version = get_graph_version(encoding_id, graph_hash)
+    version = "" if graph_version is None else graph_version[1]
+
+    def load_occurrences():
+        return ((s.symbol, s.symbol_uuid, branch_position) for s, branch_position
+                in get_all_symbols_in_graph(encoding_id, graph_hash))
+
+    return search_workers.search(
+        (encoding_id, graph_hash, version), query, load_occurrences,
+        current_app.config.get("SEARCH_TIMEOUT_SECONDS", SEARCH_TIMEOUT_SECONDS),
+        current_app.config.get("SEARCH_CONTEXT_LOAD_TIMEOUT_SECONDS",
+                               SEARCH_CONTEXT_LOAD_TIMEOUT_SECONDS))
+
+
+def search_ground_term_in_index(query: str, encoding_id: str, graph_hash: str,
+                                is_autocomplete: bool = False
+                                ) -> List[SearchResultSymbolWrapper]:
+    statement = select(SearchSymbols.symbol, SearchSymbols.includes).filter_by(
+        encoding_id=encoding_id, graph_hash=graph_hash)
+    query_trigrams = get_trigrams(query)
+    if len(query_trigrams) > 0:
+        candidates = select(SearchTrigrams.search_symbol).filter(
+            SearchTrigrams.encoding_id == encoding_id,
+            SearchTrigrams.graph_hash == graph_hash,
+            SearchTrigrams.trigram.in_(query_trigrams)).group_by(
+                SearchTrigrams.search_symbol).having(
+                    func.count() == len(query_trigrams))
+        statement = statement.filter(SearchSymbols.id.in_(candidates))
+    return [
+        SearchResultSymbolWrapper(repr=symbol,
+                                  includes=current_app.json.loads(includes),
+                                  is_autocomplete=is_autocomplete)
+        for symbol, includes in db_session.execute(statement)
+        if query in symbol
+    ]
 
 
 @bp.route("/query", methods=["GET"])
@@ -765,13 +1344,13 @@ def search():
         #            transformation.rules.str_) and transformation not in result:
         #         result.append(transformation)
 
-        db_graph_symbols = get_all_symbols_in_graph(encoding_id,
-                                                    current_graph_hash)
-        results = search_ground_term_in_symbols(query,
-                                                db_graph_symbols,
-                                                is_autocomplete=True)
+        results = search_ground_term_in_index(query,
+                                              encoding_id,
+                                              current_graph_hash,
+                                              is_autocomplete=True)
         if len(results) == 0:
-            results = search_nonground_term_in_symbols(query, db_graph_symbols)
+            results = search_nonground_term(query, encoding_id,
+                                            current_graph_hash)
         results.sort()
         return jsonify(results)
 
@@ -879,6 +1458,88 @@ def get_reasons_of():
     raise NotImplementedError
 
 
+def get_why_chain(symbol_uuid: str, encoding_id: str,
+                  max_depth: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Follow the reasons of a symbol transitively down to the facts, one
+    indexed select on the reasons table per hop.
+
+    :param max_depth: The number of hops to follow, all if None.
+    :return: The symbols of the chain with the hash of the rule deriving them
+        and the hop they were first reached at, the edges from the symbols to
+        their reasons and whether ``max_depth`` cut off the chain.
+        None if the symbol is not in the current graph.
+    """
+    current_graph_hash = get_current_graph_hash(encoding_id)
+    symbols: Dict[str, Dict[str, Any]] = {}
+    has_reason: Dict[str, bool] = {symbol_uuid: True}
+    edges: Dict[Tuple[str, str], None] = {}
+    frontier = [symbol_uuid]
+    depth = 0
+    while len(frontier) > 0 and (max_depth is None or depth < max_depth):
+        rows = db_session.execute(
+            select(GraphReasons.symbol_uuid, GraphReasons.symbol,
+                   GraphReasons.rule_hash, GraphReasons.reason_uuid,
+                   GraphReasons.reason_symbol,
+                   GraphReasons.reason_has_reason).filter_by(
+                       encoding_id=encoding_id,
+                       graph_hash=current_graph_hash).where(
+                           GraphReasons.symbol_uuid.in_(frontier)).order_by(
+                               GraphReasons.id)).all()
+        frontier = []
+        for row in rows:
+            entry = symbols.setdefault(
+                row.symbol_uuid,
+                dict(uuid=row.symbol_uuid, symbol=row.symbol, rule=None, depth=depth))
+            entry["rule"] = entry["rule"] or row.rule_hash
+            if row.reason_uuid is None:
+                continue
+            edges[(row.symbol_uuid, row.reason_uuid)] = None
+            if row.reason_uuid not in symbols:
+                symbols[row.reason_uuid] = dict(uuid=row.reason_uuid,
+                                                symbol=row.reason_symbol,
+                                                rule=None,
+                                                depth=depth + 1)
+                has_reason[row.reason_uuid] = row.reason_has_reason
+                frontier.append(row.reason_uuid)
+        depth += 1
+
+    if symbol_uuid not in symbols:
+        db_symbol = db_session.execute(
+            select(GraphSymbols.symbol, GraphSymbols.has_reason).join(
+                GraphNodes, GraphNodes.node_uuid == GraphSymbols.node).filter(
+                    GraphNodes.encoding_id == encoding_id,
+                    GraphNodes.graph_hash == current_graph_hash,
+                    GraphSymbols.symbol_uuid == symbol_uuid).limit(1)).first()
+        if db_symbol is None:
+            return None
+        symbols[symbol_uuid] = dict(uuid=symbol_uuid, symbol=db_symbol.symbol,
+                                    rule=None, depth=0)
+        has_reason[symbol_uuid] = db_symbol.has_reason
+    return {
+        "symbols": list(symbols.values()),
+        "edges": [{"src": src, "tgt": tgt} for src, tgt in edges],
+        "truncated": any(has_reason[u] for u in frontier),
+    }
+
+
+@bp.route("/graph/why/<symbol_uuid>", methods=["GET"])
+@ensure_encoding_id
+@conditional_graph_response(methods=["GET"])
+def get_why_chain_of(symbol_uuid):
+    try:
+        symbol_uuid = uuid.UUID(symbol_uuid).hex
+    except ValueError:
+        abort(Response("Invalid symbol uuid.", 400))
+    max_depth = request.args.get("depth", None, type=int)
+    if max_depth is not None and max_depth < 0:
+        abort(Response("Parameter 'depth' must not be negative.", 400))
+    chain = get_why_chain(symbol_uuid, session['encoding_id'], max_depth)
+    if chain is None:
+        abort(Response(f"No symbol with uuid {symbol_uuid}.", 404))
+    return negotiated_response(chain)
+
+
 def wrap_marked_models(
         marked_models: Iterable[StableModel],
         conflict_free_showTerm: str = "showTerm",
@@ -897,10 +1558,37 @@ def wrap_marked_models(
     return result
 
 
-def generate_graph(encoding_id: str, analyzer: Optional[ProgramAnalyzer] = None) -> nx.DiGraph:
-    encoding = db_session.execute(
-            select(Encodings.program).where(
-                Encodings.encoding_id == encoding_id)).scalars().all()
+def get_prefixes_from_previous_graph(
+        encoding_id: str, previous_hash: str,
+        marked_models: List[StableModel],
+        first_changed_index: int) -> Optional[List[List[Node]]]:
+    if first_changed_index <= 0 or len(marked_models) == 0:
+        return None
+    db_graph = db_session.query(Graphs).filter_by(
+        encoding_id=encoding_id, hash=previous_hash).one_or_none()
+    if db_graph is None or db_graph.data is None or db_graph.data == "":
+        return None
+    previous_graph = nx.node_link_graph(current_app.json.loads(db_graph.data))
+    return get_unchanged_prefixes(
+        previous_graph,
+        [list(m.atoms) + list(m.terms) for m in marked_models],
+        first_changed_index)
+
+
+def generate_graph(encoding_id: str,
+                   analyzer: Optional[ProgramAnalyzer] = None,
+                   previous_hash: Optional[str] = None,
+                   first_changed_index: int = 0,
+                   sorted_program: Optional[List[Transformation]] = None,
+                   cancelled: Optional[threading.Event] = None) -> nx.DiGraph:
+    """
+    Justify the marked models of a sort, by default the current one, and save the graph.
+    If the graph of a previous sort is given, whose transformations before
+    ``first_changed_index`` are the same, the beginning of its paths is reused
+    and only the transformations from ``first_changed_index`` on are justified.
+    The graph is not saved if ``cancelled`` is set in the meantime.
+    """
+    encoding = get_encoding_programs(encoding_id)
     if len(encoding) != 0:
         program = "".join(encoding)
     else:
@@ -922,7 +1610,7 @@ def generate_graph(encoding_id: str, analyzer: Optional[ProgramAnalyzer] = None)
 
     if analyzer is None:
         analyzer = ProgramAnalyzer()
-        analyzer.add_program(program, transformer)
+        analyzer.add_program([program], transformer)
         if not analyzer.will_work():
             error("Input program contains forbidden part of clingo language.")
             return nx.DiGraph()
@@ -930,19 +1618,30 @@ def generate_graph(encoding_id: str, analyzer: Optional[ProgramAnalyzer] = None)
     show_all_derived = db_session.execute(
         select(
             SessionInfo.show).where(SessionInfo.encoding_id ==
-                                    session['encoding_id'])).scalar() or False
+                                    encoding_id)).scalar() or False
+    jobs = db_session.execute(
+        select(SessionInfo.jobs).where(
+            SessionInfo.encoding_id == encoding_id)).scalar() or DEFAULT_JOBS
 
     db_models = db_session.query(Models).filter_by(encoding_id=encoding_id).all()
     marked_models = [current_app.json.loads(m.model) for m in db_models]
+    prefixes = None
+    if previous_hash is not None:
+        prefixes = get_prefixes_from_previous_graph(encoding_id,
+                                                    previous_hash,
+                                                    marked_models,
+                                                    first_changed_index)
     marked_models = wrap_marked_models(marked_models,
                                        analyzer.get_conflict_free_showTerm())
     db_recursions = db_session.query(Recursions).filter_by(encoding_id=encoding_id).all()
     recursion_rules = {
         r.recursive_transformation_hash for r in db_recursions
     }
-    sorted_program = get_current_sort(encoding_id)
+    if sorted_program is None:
+        sorted_program = get_current_sort(encoding_id)
     reified: Collection[AST] = reify_list(
-        sorted_program,
+        sorted_program if prefixes is None else
+        [t for t in sorted_program if t.id >= first_changed_index],
         h_str=analyzer.get_conflict_free_h(),
         h_showTerm_str=analyzer.get_conflict_free_h_showTerm(),
         model_str=analyzer.get_conflict_free_model(),
@@ -950,8 +1649,11 @@ def generate_graph(encoding_id: str, analyzer: Optional[ProgramAnalyzer] = None)
         get_conflict_free_variable_str=analyzer.get_conflict_free_variable,
         clear_temp_names=analyzer.clear_temp_names)
     g = build_graph(marked_models, reified, sorted_program, analyzer,
-                    recursion_rules, commandline_constants, show_all_derived)
+                    recursion_rules, commandline_constants, show_all_derived,
+                    jobs=jobs, prefixes=prefixes)
 
+    if cancelled is not None and cancelled.is_set():
+        return g
     save_graph(g, encoding_id, sorted_program)
 
     return g
@@ -1,12 +1,14 @@
 from functools import wraps
+from typing import Any, Dict, List
 import uuid
 from flask import session, request
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from ..shared.defaults import GRAPH_PATH
+from ..shared.defaults import GRAPH_PATH, STORAGE_PROFILES, DEFAULT_STORAGE_PROFILE
 
 try:
     from greenlet import getcurrent as _get_ident  # type: ignore
@@ -15,7 +17,34 @@ except ImportError:
 
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{GRAPH_PATH}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)#, connect_args={"check_same_thread": False})
+
+def create_storage_engine(url: str = SQLALCHEMY_DATABASE_URL,
+                          profile: str = DEFAULT_STORAGE_PROFILE):
+    """
+    Create the engine of the graph storage.
+    The pragmas of the storage profile are set on every new connection.
+
+    :param url: The database url.
+    :param profile: The name of a profile in ``STORAGE_PROFILES``.
+    :raises ValueError: If the profile is unknown.
+    """
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(
+            f"Unknown storage profile {profile}, expected one of {', '.join(STORAGE_PROFILES)}.")
+    pragmas = STORAGE_PROFILES[profile]
+    storage_engine = create_engine(url)#, connect_args={"check_same_thread": False})
+
+    @event.listens_for(storage_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+    return storage_engine
+
+
+engine = create_storage_engine()
 db_session = scoped_session(
     sessionmaker(autocommit=False, autoflush=False, bind=engine),
     scopefunc=_get_ident)
@@ -33,6 +62,37 @@ def init_db():
     # you will have to import them first before calling init_db()
     import viasp.server.models
     Base.metadata.create_all(bind=engine)
+    migrate_db()
+
+
+def migrate_db():
+    """
+    Bring a database created by an earlier version up to date.
+    ``create_all`` skips tables that already exist, so indexes added to
+    existing tables are created here. Tables whose columns changed only
+    hold session data and are recreated.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        if existing_columns != {c.name for c in table.columns}:
+            table.drop(bind=engine, checkfirst=True)
+            table.create(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def insert_or_ignore(model, rows: List[Dict[str, Any]]):
+    """
+    Insert the rows into the table of the model as part of the current
+    transaction. Rows that violate a unique constraint are skipped by the
+    database (``INSERT ... ON CONFLICT DO NOTHING``).
+    """
+    if len(rows) > 0:
+        db_session.execute(
+            sqlite_insert(model.__table__).on_conflict_do_nothing(), rows)
+
 
 encodings_counter = 0
 
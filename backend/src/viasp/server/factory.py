@@ -5,6 +5,7 @@ import secrets
 import os
 
 from ..shared.io import DataclassJSONProvider
+from ..shared.defaults import SORTGENERATION_PRECOMPUTE, SORTGENERATION_TIMEOUT_SECONDS, SORTGENERATION_BATCH_SIZE, SEARCH_TIMEOUT_SECONDS
 from .database import init_db, db_session
 
 def register_blueprints(app):
@@ -20,6 +21,10 @@ def create_app():
     app = Flask('api',static_url_path='/static', static_folder='/static')
     app.json = DataclassJSONProvider(app)
     app.config['CORS_HEADERS'] = 'Content-Type'
+    app.config['SORTGENERATION_PRECOMPUTE'] = SORTGENERATION_PRECOMPUTE
+    app.config['SORTGENERATION_TIMEOUT_SECONDS'] = SORTGENERATION_TIMEOUT_SECONDS
+    app.config['SORTGENERATION_BATCH_SIZE'] = SORTGENERATION_BATCH_SIZE
+    app.config['SEARCH_TIMEOUT_SECONDS'] = SEARCH_TIMEOUT_SECONDS
 
     init_db()
     register_blueprints(app)
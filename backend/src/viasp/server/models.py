@@ -1,8 +1,12 @@
+import zlib
+from typing import List
+
 from sqlalchemy import ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.schema import UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.schema import UniqueConstraint, Index
 from dataclasses import dataclass
 from viasp.server.database import Base
+from viasp.shared.util import hash_string
 
 class SessionInfo(Base):
     __tablename__ = "sessions_table"
@@ -10,6 +14,7 @@ class SessionInfo(Base):
     encoding_id: Mapped[str] = mapped_column(primary_key=True)
     show: Mapped[bool]
     color_theme: Mapped[str]
+    jobs: Mapped[int] = mapped_column(default=1)
 
 
 class Encodings(Base):
@@ -18,7 +23,39 @@ class Encodings(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     encoding_id: Mapped[str]
     filename: Mapped[str]
-    program: Mapped[str]
+    # chained over the chunks of the program: sha1(previous program_hash + chunk)
+    program_hash: Mapped[str] = mapped_column(default="")
+    chunks: Mapped[int] = mapped_column(default=0)
+    program_chunks: Mapped[List["EncodingChunks"]] = relationship(
+        order_by="EncodingChunks.position",
+        cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index('ix_encodings_encoding_filename', 'encoding_id', 'filename'),
+    )
+
+    @property
+    def program(self) -> str:
+        return "".join(c.chunk for c in self.program_chunks)
+
+    @program.setter
+    def program(self, program: str):
+        self.program_chunks = [EncodingChunks(position=0, chunk=program)]
+        self.program_hash = hash_string(program)
+        self.chunks = 1
+
+
+class EncodingChunks(Base):
+    __tablename__ = "encoding_chunks_table"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    encoding: Mapped[int] = mapped_column(ForeignKey("encodings_table.id"))
+    position: Mapped[int]
+    chunk: Mapped[str]
+
+    __table_args__ = (
+        Index('ix_encoding_chunks_encoding_position', 'encoding', 'position'),
+    )
 
 
 class Models(Base):
@@ -26,12 +63,27 @@ class Models(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     encoding_id: Mapped[str] = mapped_column(ForeignKey("encodings_table.encoding_id"))
-    model: Mapped[str]
+    model_hash: Mapped[str]
+    data: Mapped[bytes]
 
     __table_args__ = (
-        UniqueConstraint('encoding_id', 'model', name='_encoding_model_uc'),
+        UniqueConstraint('encoding_id', 'model_hash', name='_encoding_model_hash_uc'),
     )
 
+    @property
+    def model(self) -> str:
+        """The JSON encoded model, stored compressed and identified by its hash."""
+        return zlib.decompress(self.data).decode()
+
+    @model.setter
+    def model(self, model: str):
+        self.model_hash = hash_string(model)
+        self.data = compress_model(model)
+
+
+def compress_model(model: str) -> bytes:
+    return zlib.compress(model.encode(), 1)
+
 
 class Graphs(Base):
     __tablename__ = "graphs_table"
@@ -41,6 +93,8 @@ class Graphs(Base):
     data: Mapped[str] = mapped_column(nullable=True)
     sort: Mapped[str] = mapped_column()
     encoding_id = mapped_column(ForeignKey("encodings_table.encoding_id"))
+    # changes whenever the graph is saved, empty while it is not generated
+    version: Mapped[str] = mapped_column(default="")
 
     __table_args__ = (
         UniqueConstraint('encoding_id', 'hash', name='_encodingid_hash_uc'),
@@ -63,19 +117,91 @@ class GraphNodes(Base):
     graph_hash: Mapped[str] = mapped_column(ForeignKey("graphs_table.hash"))
     transformation_hash: Mapped[str]
     branch_position: Mapped[float]
-    node: Mapped[str]
+    rule_nr: Mapped[int]
+    reason: Mapped[str]
+    reason_rules: Mapped[str]
     node_uuid: Mapped[str] = mapped_column(primary_key=True)
+    parent_uuid: Mapped[str] = mapped_column(nullable=True)
     recursive_supernode_uuid: Mapped[str] = mapped_column(nullable=True)
     space_multiplier: Mapped[float]
 
+    __table_args__ = (
+        Index('ix_nodes_encoding_graph_transformation', 'encoding_id',
+              'graph_hash', 'transformation_hash', 'recursive_supernode_uuid',
+              'branch_position'),
+        Index('ix_nodes_recursive_supernode', 'recursive_supernode_uuid'),
+    )
+
 @dataclass
 class GraphSymbols(Base):
     __tablename__ = "symbols_table"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    node: Mapped[str] = mapped_column(ForeignKey("nodes_table.node_uuid"))
-    symbol_uuid: Mapped[str] = mapped_column()
+    node: Mapped[str] = mapped_column(ForeignKey("nodes_table.node_uuid"), index=True)
+    symbol_uuid: Mapped[str] = mapped_column(index=True)
     symbol: Mapped[str] = mapped_column()
+    has_reason: Mapped[bool] = mapped_column(default=False)
+
+class GraphReasons(Base):
+    """
+    The reasons of the symbols derived in a node, one row per reason. A symbol
+    without reasons has a single row whose reason columns are empty.
+    """
+    __tablename__ = "reasons_table"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    encoding_id: Mapped[str] = mapped_column(ForeignKey("encodings_table.encoding_id"))
+    graph_hash: Mapped[str] = mapped_column(ForeignKey("graphs_table.hash"))
+    node: Mapped[str] = mapped_column(ForeignKey("nodes_table.node_uuid"))
+    symbol: Mapped[str]
+    symbol_uuid: Mapped[str] = mapped_column(nullable=True)
+    rule_hash: Mapped[str] = mapped_column(nullable=True)
+    reason_uuid: Mapped[str] = mapped_column(nullable=True)
+    reason_symbol: Mapped[str] = mapped_column(nullable=True)
+    reason_has_reason: Mapped[bool] = mapped_column(default=False)
+
+    __table_args__ = (
+        Index('ix_reasons_encoding_graph_node_symbol', 'encoding_id',
+              'graph_hash', 'node', 'symbol_uuid'),
+        # the reasons of a symbol in any node, see get_why_chain
+        Index('ix_reasons_encoding_graph_symbol', 'encoding_id',
+              'graph_hash', 'symbol_uuid'),
+    )
+
+
+class SearchSymbols(Base):
+    """
+    The distinct symbols of a graph with the uuids of their occurrences, in
+    the order of their nodes' branch position. Searched through the
+    trigrams in ``SearchTrigrams``.
+    """
+    __tablename__ = "search_symbols_table"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    encoding_id: Mapped[str] = mapped_column(ForeignKey("encodings_table.encoding_id"))
+    graph_hash: Mapped[str] = mapped_column(ForeignKey("graphs_table.hash"))
+    symbol: Mapped[str]
+    includes: Mapped[str]
+
+    __table_args__ = (
+        Index('ix_search_symbols_encoding_graph', 'encoding_id', 'graph_hash'),
+    )
+
+
+class SearchTrigrams(Base):
+    __tablename__ = "search_trigrams_table"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    encoding_id: Mapped[str] = mapped_column(ForeignKey("encodings_table.encoding_id"))
+    graph_hash: Mapped[str] = mapped_column(ForeignKey("graphs_table.hash"))
+    trigram: Mapped[str]
+    search_symbol: Mapped[int] = mapped_column(ForeignKey("search_symbols_table.id"))
+
+    __table_args__ = (
+        Index('ix_search_trigrams_encoding_graph_trigram', 'encoding_id',
+              'graph_hash', 'trigram', 'search_symbol'),
+    )
+
 
 @dataclass
 class GraphEdges(Base):
@@ -91,6 +217,11 @@ class GraphEdges(Base):
     recursion_anchor_keyword: Mapped[str] = mapped_column(nullable=True)
     recursive_supernode_uuid: Mapped[str] = mapped_column(nullable=True)
 
+    __table_args__ = (
+        Index('ix_edges_encoding_graph_supernode', 'encoding_id', 'graph_hash',
+              'recursive_supernode_uuid'),
+    )
+
 class DependencyGraphs(Base):
     __tablename__ = "dependency_graphs_table"
 
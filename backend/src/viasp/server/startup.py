@@ -96,7 +96,11 @@ class ViaspServerLauncher:
 
         if os.path.exists(CLINGRAPH_PATH):
             shutil.rmtree(CLINGRAPH_PATH)
-        for file in [GRAPH_PATH, PROGRAM_STORAGE_PATH, STDIN_TMP_STORAGE_PATH]:
+        graph_journal_files = [
+            GRAPH_PATH.with_name(GRAPH_PATH.name + suffix)
+            for suffix in ["-wal", "-shm", "-journal"]
+        ]
+        for file in [GRAPH_PATH, *graph_journal_files, PROGRAM_STORAGE_PATH, STDIN_TMP_STORAGE_PATH]:
             if os.path.exists(file):
                 os.remove(file)
 
@@ -0,0 +1,76 @@
+from itertools import groupby
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete
+
+from .database import db_session
+from .models import Encodings, EncodingChunks
+from ..shared.util import hash_string
+
+
+def append_program_chunk(encoding_id: str, program: str,
+                         filename: Optional[str] = None):
+    """
+    Append a fragment to the program of a file of the encoding.
+    Earlier fragments are not rewritten, the program hash is chained over
+    the fragments.
+
+    :param filename: The file of the program, the first file of the encoding if None.
+    """
+    query = db_session.query(Encodings).filter_by(encoding_id=encoding_id)
+    if filename is not None:
+        query = query.filter_by(filename=filename)
+    db_encoding = query.order_by(Encodings.id).first()
+    if db_encoding is None:
+        db_encoding = Encodings(encoding_id=encoding_id,
+                                filename=filename if filename is not None else "<string>",
+                                program_hash="",
+                                chunks=0)
+        db_session.add(db_encoding)
+        db_session.flush()
+    db_session.add(EncodingChunks(encoding=db_encoding.id,
+                                  position=db_encoding.chunks,
+                                  chunk=program))
+    db_encoding.program_hash = hash_string(db_encoding.program_hash + program)
+    db_encoding.chunks += 1
+
+
+def _select_program_chunks(encoding_id: str, filename: Optional[str] = None):
+    query = select(Encodings.id, Encodings.filename, EncodingChunks.chunk).join(
+        EncodingChunks, EncodingChunks.encoding == Encodings.id).where(
+            Encodings.encoding_id == encoding_id)
+    if filename is not None:
+        query = query.where(Encodings.filename == filename)
+    query = query.order_by(Encodings.id, EncodingChunks.position)
+    return db_session.execute(query.execution_options(yield_per=1000))
+
+
+def get_program_chunks(encoding_id: str,
+                       filename: Optional[str] = None) -> Iterable[Tuple[str, str]]:
+    """
+    Stream the program fragments of the encoding in the order they were added,
+    file by file.
+
+    :return: Pairs of filename and fragment.
+    """
+    for row in _select_program_chunks(encoding_id, filename):
+        yield row.filename, row.chunk
+
+
+def get_encoding_programs(encoding_id: str) -> List[str]:
+    """
+    :return: The program of every file of the encoding.
+    """
+    return [
+        "".join(row.chunk for row in rows)
+        for _, rows in groupby(_select_program_chunks(encoding_id),
+                               key=lambda row: row.id)
+    ]
+
+
+def delete_encoding(encoding_id: str):
+    db_session.execute(
+        delete(EncodingChunks).where(
+            EncodingChunks.encoding.in_(
+                select(Encodings.id).where(Encodings.encoding_id == encoding_id))))
+    db_session.execute(delete(Encodings).where(Encodings.encoding_id == encoding_id))
@@ -21,8 +21,44 @@ PROGRAM_STORAGE_PATH = SHARED_PATH / "prg.lp"
 STDIN_TMP_STORAGE_PATH = SHARED_PATH / "viasp_stdin_tmp.lp"
 SERVER_PID_FILE_PATH = SERVER_PATH / "viasp_server.pid"
 FRONTEND_PID_FILE_PATH = SERVER_PATH / "viasp_frontend.pid"
+SORTGENERATION_PRECOMPUTE = False
 SORTGENERATION_TIMEOUT_SECONDS = 10
 SORTGENERATION_BATCH_SIZE = 1000
+DEFAULT_JOBS = 1
+GRAPH_CACHE_MAX_ENTRIES = 64
+GRAPH_CACHE_MAX_BYTES = 256 * 1024 * 1024
+SAVE_GRAPH_BATCH_SIZE = 5000
+STORAGE_PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "volatile": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_STORAGE_PROFILE = os.getenv("VIASP_STORAGE_PROFILE", "wal")
+DEFAULT_CALL_BUFFER_SIZE = 0
+DEFAULT_CALL_BUFFER_TIMEOUT_SECONDS = 1.0
+BACKEND_LIVENESS_TTL_SECONDS = 5.0
+DEFAULT_MODEL_STREAM_THRESHOLD = 100
+MODEL_UPLOAD_BATCH_SIZE = 500
+SYMBOL_CACHE_MAX_ENTRIES = 100_000
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+RESPONSE_COMPRESSION_LEVEL = 6
+SEARCH_CONTEXT_CACHE_MAX_ENTRIES = 8
+SEARCH_CONTEXT_MAX_QUERIES = 1000
+SEARCH_TIMEOUT_SECONDS = 2.0
+SEARCH_CONTEXT_LOAD_TIMEOUT_SECONDS = 60.0
+SEARCH_WORKER_MEMORY_LIMIT_BYTES = 2 * 1024 * 1024 * 1024
 
 
 def load_messages(json_path):
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from typing import Sequence, Any, Dict, Collection
 from inspect import Signature as inspect_Signature
 
-from viasp.shared.model import StableModel
+from viasp.shared.model import StableModel, ClingoMethodCall
 
 
 class ViaspClient(ABC):
@@ -16,10 +16,18 @@ class ViaspClient(ABC):
                                args: Sequence[Any], kwargs: Dict[str, Any]):
         pass
 
+    def register_function_calls(self, calls: Sequence[ClingoMethodCall]):
+        for call in calls:
+            self.register_function_call(call.name, inspect_Signature(), [],
+                                        call.kwargs)
+
     @abstractmethod
     def set_target_stable_model(self, stable_models: Collection[StableModel]):
         pass
 
+    def stream_target_stable_models(self, stable_models: Collection[StableModel]):
+        self.set_target_stable_model(stable_models)
+
     @abstractmethod
     def show(self):
         pass
@@ -5,7 +5,7 @@ from json import JSONDecoder, JSONEncoder
 # from enum import IntEnum
 from flask.json.provider import JSONProvider
 from dataclasses import is_dataclass, asdict
-from typing import Union, Collection, Iterable, Sequence, cast, Tuple
+from typing import Any, Callable, Union, Collection, Iterable, Sequence, cast, Tuple, Dict, List, Optional
 from pathlib import PosixPath
 from uuid import UUID
 import os
@@ -15,6 +15,7 @@ import importlib.util
 
 import inspect
 import base64
+import struct
 import types
 
 import clingo
@@ -29,6 +30,12 @@ from .interfaces import ViaspClient
 from .model import Node, ClingraphNode, Transformation, Signature, StableModel, ClingoMethodCall, TransformationError, FailedReason, SymbolIdentifier, TransformerTransport, RuleContainer, SearchResultSymbolWrapper
 from ..server.models import GraphEdges
 from ..shared.util import get_compatible_node_link_data
+from ..shared.defaults import SYMBOL_CACHE_MAX_ENTRIES
+
+try:
+    import msgpack  # type: ignore
+except ImportError:
+    msgpack = None  # type: ignore
 
 class DataclassJSONProvider(JSONProvider):
     def dumps(self, obj, **kwargs):
@@ -41,69 +48,194 @@ def model_to_json(model: Union[clingo_Model, Collection[clingo_Model]], *args, *
     return json.dumps(model, *args, cls=DataclassJSONEncoder, **kwargs)
 
 
+def to_compact_json(obj, *args, **kwargs) -> str:
+    """
+    Serialize the object with the symbols of stable models, nodes and symbol
+    identifiers written as their string representation. This is several
+    times smaller than the default format, but it is not understood by the
+    frontend.
+    """
+    return json.dumps(obj, *args, cls=DataclassJSONEncoder, compact_symbols=True, **kwargs)
+
+
+MSGPACK_MIMETYPE = "application/msgpack"
+UUID_REFERENCE = 1
+SYMBOL_REFERENCE = 2
+
+
+def to_msgpack(obj) -> bytes:
+    """
+    Serialize the object like the default JSON format, but as MessagePack.
+    Every UUID and symbol is written once into a table, which is referenced
+    by index from the data. Symbols are written as their string
+    representation instead of the nested dicts of the JSON format::
+
+        {"uuids": [hex, ...], "symbols": [str(symbol), ...], "data": obj}
+
+    :raises RuntimeError: If msgpack is not installed.
+    """
+    if msgpack is None:
+        raise RuntimeError("Install msgpack to serialize to MessagePack.")
+    tables: Dict[type, Dict[Any, int]] = {UUID: {}, Symbol: {}}
+
+    def reference(table: Dict[Any, int], o, ext_type: int):
+        index = table.setdefault(o, len(table))
+        return msgpack.ExtType(ext_type, struct.pack(">I", index))
+
+    def default(o):
+        if isinstance(o, UUID):
+            return reference(tables[UUID], o, UUID_REFERENCE)
+        if isinstance(o, Symbol):
+            return reference(tables[Symbol], o, SYMBOL_REFERENCE)
+        return encode_object(o)
+
+    data = msgpack.packb(obj, default=default)
+    packer = msgpack.Packer()
+    return b"".join([
+        packer.pack_map_header(3),
+        packer.pack("uuids"),
+        packer.pack([u.hex for u in tables[UUID]]),
+        packer.pack("symbols"),
+        packer.pack([str(s) for s in tables[Symbol]]),
+        packer.pack("data"),
+        data,
+    ])
+
+
+def from_msgpack(data: bytes):
+    """
+    Read the output of ``to_msgpack`` into the objects that the default JSON
+    format is read into by ``json.loads``, with the references resolved.
+    """
+    if msgpack is None:
+        raise RuntimeError("Install msgpack to read MessagePack.")
+    tables = msgpack.unpackb(data)
+    tables["symbols"] = [symbol_to_dict(s) for s in parse_symbols(tables["symbols"])]
+
+    def resolve(o):
+        if isinstance(o, msgpack.ExtType):
+            index, = struct.unpack(">I", o.data)
+            return tables["uuids"][index] if o.code == UUID_REFERENCE else tables["symbols"][index]
+        if isinstance(o, list):
+            return [resolve(x) for x in o]
+        if isinstance(o, dict):
+            return {k: resolve(v) for k, v in o.items()}
+        return o
+
+    return resolve(tables["data"])
+
+
+_symbol_cache: Dict[str, Symbol] = {}
+
+
+def parse_symbols(symbol_strings: Sequence[str]) -> List[Symbol]:
+    """
+    Parse the string representations of symbols. Strings that were not seen
+    before are parsed together in a single call of clingo's term parser.
+    """
+    symbols: Dict[str, Optional[Symbol]] = {s: _symbol_cache.get(s) for s in symbol_strings}
+    unparsed = [s for s, symbol in symbols.items() if symbol is None]
+    if len(unparsed) > 0:
+        if len(_symbol_cache) > SYMBOL_CACHE_MAX_ENTRIES:
+            _symbol_cache.clear()
+        parsed = clingo.parse_term(f"({','.join(unparsed)},)").arguments
+        for symbol_string, symbol in zip(unparsed, parsed):
+            symbols[symbol_string] = symbol
+            _symbol_cache[symbol_string] = symbol
+    return [cast(Symbol, symbols[s]) for s in symbol_strings]
+
+
+def decode_compact_stable_model(obj: dict) -> StableModel:
+    fields = ["atoms", "terms", "shown", "theory"]
+    symbols = iter(parse_symbols([s for f in fields for s in obj[f]]))
+    for f in fields:
+        obj[f] = [next(symbols) for _ in obj[f]]
+    return StableModel(**obj)
+
+
+def decode_compact_node(obj: dict) -> Node:
+    symbol_strings = [s for s, _, _ in obj["atoms"]]
+    symbol_strings.extend(s for s, _, _ in obj["diff"])
+    symbols = iter(parse_symbols(symbol_strings))
+    obj["atoms"] = frozenset(
+        SymbolIdentifier(next(symbols), has_reason, UUID(uuid))
+        for _, has_reason, uuid in obj["atoms"])
+    obj["diff"] = frozenset(
+        SymbolIdentifier(next(symbols), has_reason, UUID(uuid))
+        for _, has_reason, uuid in obj["diff"])
+    obj["uuid"] = UUID(obj["uuid"])
+    return Node(**obj)
+
+
+def decode_compact_symbol_identifier(obj: dict) -> SymbolIdentifier:
+    return SymbolIdentifier(parse_symbols([obj["symbol"]])[0],
+                            obj["has_reason"], UUID(obj["uuid"]))
+
+
+def decode_node(obj: dict) -> Node:
+    obj['atoms'] = frozenset(
+        SymbolIdentifier(symbol=x.symbol, has_reason=x.has_reason, uuid=UUID(x.uuid))
+        for x in obj['atoms'])
+    obj['diff'] = frozenset(
+        SymbolIdentifier(symbol=x.symbol, has_reason=x.has_reason, uuid=UUID(x.uuid))
+        for x in obj['diff'])
+    obj['uuid'] = UUID(obj['uuid'])
+    return Node(**obj)
+
+
+def decode_transformation(obj: dict) -> Transformation:
+    obj['id'] = int(obj['id'])
+    return Transformation(**obj)
+
+
+def decode_search_result_symbol_wrapper(obj: dict) -> SearchResultSymbolWrapper:
+    obj['is_autocomplete'] = obj.pop('isAutocomplete', False)
+    obj['awaiting_input'] = obj.pop('awaitingInput', False)
+    obj['hide_in_suggestions'] = obj.pop('hideInSuggestions', False)
+    obj['too_broad'] = obj.pop('tooBroad', False)
+    return SearchResultSymbolWrapper(**obj)
+
+
+# decoders by the _type of the encoded object, with the _type removed
+object_decoders: Dict[str, Callable[[dict], Any]] = {
+    "Function": lambda obj: clingo.Function(**obj),
+    "Number": lambda obj: clingo.Number(**obj),
+    "String": lambda obj: clingo.String(**obj),
+    "Infimum": lambda obj: clingo.Infimum,
+    "Supremum": lambda obj: clingo.Supremum,
+    "Node": decode_node,
+    "ClingraphNode": lambda obj: ClingraphNode(**obj),
+    "Transformation": decode_transformation,
+    "RuleContainer": lambda obj: RuleContainer(str_=obj["str_"], hash=obj["hash"]),
+    "SearchResultSymbolWrapper": decode_search_result_symbol_wrapper,
+    "Signature": lambda obj: Signature(**obj),
+    "Graph": lambda obj: nx.node_link_graph(obj["_graph"]),
+    "StableModel": lambda obj: StableModel(**obj),
+    "ModelType": lambda obj: ModelType.StableModel,
+    "ClingoMethodCall": lambda obj: ClingoMethodCall(**obj),
+    "SymbolIdentifier": lambda obj: SymbolIdentifier(**obj),
+    "Transformer": lambda obj: reconstruct_transformer(obj),
+    "GraphEdges": lambda obj: GraphEdges(**obj),
+}
+# decoders of the objects written with compact_symbols, see to_compact_json
+compact_object_decoders: Dict[str, Callable[[dict], Any]] = {
+    "StableModel": decode_compact_stable_model,
+    "Node": decode_compact_node,
+    "SymbolIdentifier": decode_compact_symbol_identifier,
+}
+
+
 tagged_serializer = TaggedJSONSerializer()
 def object_hook(obj):
-    obj = tagged_serializer.untag(obj)
-
-    if '_type' not in obj:
-        return obj
-    t = obj['_type']
-    del obj['_type']
-    if t == "Function":
-        return clingo.Function(**obj)
-    elif t == "Number":
-        return clingo.Number(**obj)
-    elif t == "String":
-        return clingo.String(**obj)
-    elif t == "Infimum":
-        return clingo.Infimum
-    elif t == "Supremum":
-        return clingo.Supremum
-    elif t == "Node":
-        # obj['atoms'] = frozenset(obj['atoms'])
-        obj['atoms'] = frozenset(
-            map(lambda x: SymbolIdentifier(
-                symbol=x.symbol,
-                has_reason=x.has_reason,
-                uuid=UUID(x.uuid)), obj['atoms'])
-        )
-        # obj['diff'] = frozenset(obj['diff'])
-        obj['diff'] = frozenset(
-            map(
-                lambda x: SymbolIdentifier(symbol=x.symbol,
-                                           has_reason=x.has_reason,
-                                           uuid=UUID(x.uuid)), obj['diff']))
-        obj['uuid'] = UUID(obj['uuid'])
-        return Node(**obj)
-    elif t == "ClingraphNode":
-        return ClingraphNode(**obj)
-    elif t == "Transformation":
-        obj['id'] = int(obj['id'])
-        return Transformation(**obj)
-    elif t == "RuleContainer":
-        return RuleContainer(str_=obj["str_"], hash=obj["hash"])
-    elif t == "SearchResultSymbolWrapper":
-        obj['is_autocomplete'] = obj.pop('isAutocomplete', False)
-        obj['awaiting_input'] = obj.pop('awaitingInput', False)
-        obj['hide_in_suggestions'] = obj.pop('hideInSuggestions', False)
-        return SearchResultSymbolWrapper(**obj)
-    elif t == "Signature":
-        return Signature(**obj)
-    elif t == "Graph":
-        return nx.node_link_graph(obj["_graph"])
-    elif t == "StableModel":
-        return StableModel(**obj)
-    elif t == "ModelType":
-        return ModelType.StableModel
-    elif t == "ClingoMethodCall":
-        return ClingoMethodCall(**obj)
-    elif t == "SymbolIdentifier":
-        return SymbolIdentifier(**obj)
-    elif t == "Transformer":
-        return reconstruct_transformer(obj)
-    elif t == "GraphEdges":
-        return GraphEdges(**obj)
-    return obj
+    t = obj.pop('_type', None)
+    if t is None:
+        # only objects with a single key can be tagged by flask
+        return tagged_serializer.untag(obj) if len(obj) == 1 else obj
+    if obj.pop('_symbols', None) == "str":
+        decoder = compact_object_decoders.get(t)
+    else:
+        decoder = object_decoders.get(t)
+    return obj if decoder is None else decoder(obj)
 
 
 
@@ -116,121 +248,174 @@ class DataclassJSONDecoder(JSONDecoder):
 
 
 
+def node_to_dict(o: Node) -> dict:
+    sorted_atoms = sorted(o.atoms, key=lambda x: x.symbol)
+    sorted_diff = sorted(o.diff, key=lambda x: x.symbol)
+    sorted_reason = {} if len(o.reason) == 0 else o.reason
+    sorted_reason_rules = {} if len(o.reason_rules) == 0 else o.reason_rules
+    return {"_type": "Node",
+            "atoms": sorted_atoms,
+            "diff": sorted_diff,
+            "reason": sorted_reason,
+            "reason_rules": sorted_reason_rules,
+            "recursive": o.recursive,
+            "uuid": o.uuid,
+            "rule_nr": o.rule_nr,
+            "space_multiplier": o.space_multiplier}
+
+
+def compact_node_to_dict(o: Node) -> dict:
+    return {"_type": "Node",
+            "_symbols": "str",
+            "atoms": sorted([str(a.symbol), a.has_reason, a.uuid.hex] for a in o.atoms),
+            "diff": sorted([str(a.symbol), a.has_reason, a.uuid.hex] for a in o.diff),
+            "reason": {} if len(o.reason) == 0 else o.reason,
+            "reason_rules": {} if len(o.reason_rules) == 0 else o.reason_rules,
+            "recursive": o.recursive,
+            "uuid": o.uuid,
+            "rule_nr": o.rule_nr,
+            "space_multiplier": o.space_multiplier}
+
+
+def transformer_to_dict(o: TransformerTransport) -> dict:
+    # Get the class definition as a string
+    class_definition = inspect.getsource(o.transformer)
+    transformer_bytes = base64.b64encode(
+        class_definition.encode('utf-8')).decode('utf-8')
+
+    o_json = {"_type": "Transformer",
+              "Transformer_definition": transformer_bytes,
+              "Imports": o.imports,
+              "Path": o.path}
+    return o_json
+
+
+# encoders of the dataclasses by their class, see find_encoder
+dataclass_encoders: Dict[type, Callable[[Any], dict]] = {
+    Node: node_to_dict,
+    ClingraphNode: lambda o: {"_type": "ClingraphNode", "uuid": o.uuid},
+    TransformationError: lambda o: {"_type": "TransformationError", "ast": o.ast, "reason": o.reason},
+    SymbolIdentifier: lambda o: {"_type": "SymbolIdentifier", "symbol": o.symbol, "has_reason": o.has_reason, "uuid": o.uuid},
+    Signature: lambda o: {"_type": "Signature", "name": o.name, "args": o.args},
+    Transformation: lambda o: {
+        "_type": "Transformation",
+        "id": str(o.id),
+        "rules": o.rules,
+        "adjacent_sort_indices": o.adjacent_sort_indices,
+        "hash": o.hash
+    },
+    RuleContainer: lambda o: {"_type": "RuleContainer", "ast": o.ast, "str_": o.str_, "hash": o.hash},
+    SearchResultSymbolWrapper: lambda o: {
+        "_type": "SearchResultSymbolWrapper",
+        "repr": o.repr,
+        "includes": o.includes,
+        "isAutocomplete": o.is_autocomplete,
+        "awaitingInput": o.awaiting_input,
+        "hideInSuggestions": o.hide_in_suggestions,
+        "tooBroad": o.too_broad,
+    },
+    StableModel: lambda o: {"_type": "StableModel", "cost": o.cost, "optimality_proven": o.optimality_proven, "type": o.type,
+                            "atoms": o.atoms, "terms": o.terms, "shown": o.shown, "theory": o.theory},
+    ClingoMethodCall: lambda o: {"_type": "ClingoMethodCall", "name": o.name, "kwargs": o.kwargs, "uuid": o.uuid},
+    TransformerTransport: transformer_to_dict,
+    GraphEdges: lambda o: {"_type": "GraphEdges",
+                           "source": o.source,
+                           "target": o.target,
+                           "style": o.style,
+                           "transformation_hash": o.transformation_hash,
+                           "recursion_anchor_keyword": o.recursion_anchor_keyword,
+    },
+}
+compact_dataclass_encoders: Dict[type, Callable[[Any], dict]] = {
+    **dataclass_encoders,
+    Node: compact_node_to_dict,
+    SymbolIdentifier: lambda o: {"_type": "SymbolIdentifier", "_symbols": "str", "symbol": str(o.symbol),
+                                 "has_reason": o.has_reason, "uuid": o.uuid},
+    StableModel: lambda o: {"_type": "StableModel", "_symbols": "str", "cost": o.cost,
+                            "optimality_proven": o.optimality_proven, "type": o.type,
+                            "atoms": [str(s) for s in o.atoms], "terms": [str(s) for s in o.terms],
+                            "shown": [str(s) for s in o.shown], "theory": [str(s) for s in o.theory]},
+}
+
+
+def find_encoder(encoders: Dict[type, Callable], cls: type, default: Callable) -> Callable:
+    """
+    Look up the encoder of a class. Classes without an encoder of their own
+    use the first encoder of a base class, or the default. The result is
+    added to the encoders, so that the lookup is a single dict access the
+    next time.
+    """
+    encoder = encoders.get(cls)
+    if encoder is None:
+        encoder = next((e for base, e in list(encoders.items()) if issubclass(cls, base)), default)
+        encoders[cls] = encoder
+    return encoder
+
+
+def compact_dataclass_to_dict(o):
+    return find_encoder(compact_dataclass_encoders, type(o), asdict)(o)
+
+
 def dataclass_to_dict(o):
-    if isinstance(o, Node):
-        sorted_atoms = sorted(o.atoms, key=lambda x: x.symbol)
-        sorted_diff = sorted(o.diff, key=lambda x: x.symbol)
-        sorted_reason = {} if len(o.reason) == 0 else o.reason
-        sorted_reason_rules = {} if len(o.reason_rules) == 0 else o.reason_rules
-        return {"_type": "Node",
-                "atoms": sorted_atoms,
-                "diff": sorted_diff,
-                "reason": sorted_reason,
-                "reason_rules": sorted_reason_rules,
-                "recursive": o.recursive,
-                "uuid": o.uuid,
-                "rule_nr": o.rule_nr,
-                "space_multiplier": o.space_multiplier}
-    elif isinstance(o, ClingraphNode):
-        return {"_type": "ClingraphNode", "uuid": o.uuid}
-    elif isinstance(o, TransformationError):
-        return {"_type": "TransformationError", "ast": o.ast, "reason": o.reason}
-    elif isinstance(o, SymbolIdentifier):
-        return {"_type": "SymbolIdentifier", "symbol": o.symbol, "has_reason": o.has_reason, "uuid": o.uuid}
-    elif isinstance(o, Signature):
-        return {"_type": "Signature", "name": o.name, "args": o.args}
-    elif isinstance(o, Transformation):
-        return {
-            "_type": "Transformation",
-            "id": str(o.id),
-            "rules": o.rules,
-            "adjacent_sort_indices": o.adjacent_sort_indices,
-            "hash": o.hash
-        }
-    elif isinstance(o, RuleContainer):
-        return {"_type": "RuleContainer", "ast": o.ast, "str_": o.str_, "hash": o.hash}
-    elif isinstance(o, SearchResultSymbolWrapper):
-        return {
-            "_type": "SearchResultSymbolWrapper",
-            "repr": o.repr,
-            "includes": o.includes,
-            "isAutocomplete": o.is_autocomplete,
-            "awaitingInput": o.awaiting_input,
-            "hideInSuggestions": o.hide_in_suggestions,
-        }
-    elif isinstance(o, StableModel):
-        return {"_type": "StableModel", "cost": o.cost, "optimality_proven": o.optimality_proven, "type": o.type,
-                "atoms": o.atoms, "terms": o.terms, "shown": o.shown, "theory": o.theory}
-    elif isinstance(o, ClingoMethodCall):
-        return {"_type": "ClingoMethodCall", "name": o.name, "kwargs": o.kwargs, "uuid": o.uuid}
-    elif isinstance(o, TransformerTransport):
-        # Get the class definition as a string
-        class_definition = inspect.getsource(o.transformer)
-        transformer_bytes = base64.b64encode(
-            class_definition.encode('utf-8')).decode('utf-8')
-
-        o_json = {"_type": "Transformer",
-                  "Transformer_definition": transformer_bytes,
-                  "Imports": o.imports,
-                  "Path": o.path}
-        return o_json
-    elif isinstance(o, GraphEdges):
-        return {"_type": "GraphEdges",
-                "source": o.source,
-                "target": o.target,
-                "style": o.style,
-                "transformation_hash": o.transformation_hash,
-                "recursion_anchor_keyword": o.recursion_anchor_keyword,
-        }
-    else:
-        return asdict(o)
+    return find_encoder(dataclass_encoders, type(o), asdict)(o)
 
 
 class DataclassJSONEncoder(JSONEncoder):
+    def __init__(self, *args, compact_symbols: bool = False, **kwargs):
+        self.compact_symbols = compact_symbols
+        super().__init__(*args, **kwargs)
+
     def default(self, o):
-        encoded = encode_object(o)
+        encoded = encode_object(o, self.compact_symbols)
         if encoded is not None:
             return encoded
         return super().default(o)
 
 
-def encode_object(o):
-    if isinstance(o, clingo_Model):
-        x = model_to_dict(o)
-        return x
-    elif isinstance(o, ViaspClient):
-        return {"_type": "ViaspClient"}
-    elif isinstance(o, Application):
-        return {"_type": "Application"}
-    elif isinstance(o, PosixPath):
-        return str(o)
-    elif isinstance(o, ModelType):
-        return {"_type": "ModelType", "__enum__": str(o)}
-    elif isinstance(o, Symbol):
-        x = symbol_to_dict(o)
-        return x
-    elif isinstance(o, FailedReason):
-        return {"_type": "FailedReason", "value": o.value}
-    elif is_dataclass(o):
-        result = dataclass_to_dict(o)
-        return result
-    elif isinstance(o, nx.Graph):
-        return {
+def resolve_object_encoder(cls: type) -> Callable[[Any, bool], Any]:
+    if issubclass(cls, clingo_Model):
+        return lambda o, compact_symbols: model_to_dict(o)
+    elif issubclass(cls, ViaspClient):
+        return lambda o, compact_symbols: {"_type": "ViaspClient"}
+    elif issubclass(cls, Application):
+        return lambda o, compact_symbols: {"_type": "Application"}
+    elif issubclass(cls, PosixPath):
+        return lambda o, compact_symbols: str(o)
+    elif issubclass(cls, ModelType):
+        return lambda o, compact_symbols: {"_type": "ModelType", "__enum__": str(o)}
+    elif issubclass(cls, Symbol):
+        return lambda o, compact_symbols: symbol_to_dict(o)
+    elif issubclass(cls, FailedReason):
+        return lambda o, compact_symbols: {"_type": "FailedReason", "value": o.value}
+    elif is_dataclass(cls):
+        return lambda o, compact_symbols: compact_dataclass_to_dict(o) if compact_symbols else dataclass_to_dict(o)
+    elif issubclass(cls, nx.Graph):
+        return lambda o, compact_symbols: {
             "_type": "Graph",
             "_graph": get_compatible_node_link_data(o)
         }
-    elif isinstance(o, UUID):
-        return o.hex
-    elif isinstance(o, frozenset):
-        return list(o)
-    elif isinstance(o, set):
-        return list(o)
-    elif isinstance(o, AST):
-        return str(o)
-    elif isinstance(o, Iterable):
-        return list(o)
+    elif issubclass(cls, UUID):
+        return lambda o, compact_symbols: o.hex
+    elif issubclass(cls, (frozenset, set)):
+        return lambda o, compact_symbols: list(o)
+    elif issubclass(cls, AST):
+        return lambda o, compact_symbols: str(o)
+    elif issubclass(cls, Iterable):
+        return lambda o, compact_symbols: list(o)
     else:
-        return tagged_serializer.tag(o)
+        return lambda o, compact_symbols: tagged_serializer.tag(o)
+
+
+# encoders by the class of the object, filled by resolve_object_encoder
+object_encoders: Dict[type, Callable[[Any, bool], Any]] = {}
+
+
+def encode_object(o, compact_symbols: bool = False):
+    encoder = object_encoders.get(type(o))
+    if encoder is None:
+        encoder = resolve_object_encoder(type(o))
+        object_encoders[type(o)] = encoder
+    return encoder(o, compact_symbols)
 
 
 
@@ -257,24 +442,23 @@ def clingo_model_to_stable_model(model: clingo_Model) -> StableModel:
 def clingo_symbols_to_stable_model(atoms: Iterable[Symbol]) -> StableModel:
     return StableModel(atoms=cast(Collection[Symbol], encode_object(atoms)))
 
+# encoders of the symbols by their type
+symbol_encoders: Dict[clingo.SymbolType, Callable[[Symbol], dict]] = {
+    clingo.SymbolType.Function: lambda symbol: {
+        "_type": "Function",
+        "name": symbol.name,
+        "positive": symbol.positive,
+        "arguments": [symbol_to_dict(a) for a in symbol.arguments]
+    },
+    clingo.SymbolType.Number: lambda symbol: {"number": symbol.number, "_type": "Number"},
+    clingo.SymbolType.String: lambda symbol: {"string": symbol.string, "_type": "String"},
+    clingo.SymbolType.Infimum: lambda symbol: {"_type": "Infimum"},
+    clingo.SymbolType.Supremum: lambda symbol: {"_type": "Supremum"},
+}
+
+
 def symbol_to_dict(symbol: clingo.Symbol) -> dict:
-    symbol_dict = {}
-    if symbol.type == clingo.SymbolType.Function:
-        symbol_dict["_type"] = "Function"
-        symbol_dict["name"] = symbol.name
-        symbol_dict["positive"] = symbol.positive
-        symbol_dict["arguments"] = symbol.arguments
-    elif symbol.type == clingo.SymbolType.Number:
-        symbol_dict["number"] = symbol.number
-        symbol_dict["_type"] = "Number"
-    elif symbol.type == clingo.SymbolType.String:
-        symbol_dict["string"] = symbol.string
-        symbol_dict["_type"] = "String"
-    elif symbol.type == clingo.SymbolType.Infimum:
-        symbol_dict["_type"] = "Infimum"
-    elif symbol.type == clingo.SymbolType.Supremum:
-        symbol_dict["_type"] = "Supremum"
-    return symbol_dict
+    return symbol_encoders[symbol.type](symbol)
 
 
 # Legacy: To be deleted in Version 3.0
@@ -30,6 +30,13 @@ class SymbolIdentifier:
     def __repr__(self):
         return f"{{symbol: {str(self.symbol)}, uuid: {self.uuid}, hash_reason: {self.has_reason}}}"
 
+    def __reduce__(self):
+        return (_symbol_identifier_from_state, (self.symbol, self.has_reason, self.uuid.int))
+
+
+def _symbol_identifier_from_state(symbol: Symbol, has_reason: bool, uuid_int: int) -> SymbolIdentifier:
+    return SymbolIdentifier(symbol, has_reason, UUID(int=uuid_int))
+
 
 @dataclass()
 class Node:
@@ -48,6 +55,13 @@ class Node:
     def __hash__(self):
         return hash((self.atoms, self.rule_nr, self.diff))
 
+    def __getstate__(self):
+        # MappingProxyType can not be pickled, e.g. when sending nodes to worker processes
+        state = self.__dict__.copy()
+        if isinstance(self.reason, MappingProxyType):
+            state["reason"] = dict(self.reason)
+        return state
+
     def __eq__(self, o):
         return isinstance(o, type(self)) and (
             self.atoms, self.rule_nr, self.diff, self.reason,
@@ -237,6 +251,7 @@ class SearchResultSymbolWrapper:
     is_autocomplete: bool = True
     awaiting_input: bool = True
     hide_in_suggestions: bool = False
+    too_broad: bool = False
 
     def __eq__(self, o):
         if not isinstance(o, type(self)):
@@ -83,15 +83,16 @@ class RuleType:
 
 
 def get_rules_from_input_program(rules: Tuple) -> Sequence[str]:
-    from ..server.database import db_session
-    from ..server.models import Encodings
+    from ..server.storage import get_program_chunks
 
     rules_from_input_program: Sequence[str] = []
+    programs: Dict[str, List[str]] = {}
     for rule in rules:
         filename = rule.location.begin.filename
-        program = db_session.query(Encodings).filter(
-            Encodings.encoding_id == "0",
-            Encodings.filename == filename).first().program.split("\n")
+        if filename not in programs:
+            programs[filename] = "".join(
+                chunk for _, chunk in get_program_chunks("0", filename)).split("\n")
+        program = programs[filename]
         if isinstance(rule, str):
             rules_from_input_program.append(rule)
             continue
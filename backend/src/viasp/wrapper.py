@@ -1,6 +1,9 @@
+import atexit
 import json
 from re import I
 import sys
+import threading
+import weakref
 
 from inspect import signature
 from typing import List, Union, Tuple
@@ -9,9 +12,9 @@ from clingo import Control as InnerControl, Model
 from dataclasses import asdict, is_dataclass
 
 from .clingoApiClient import ClingoClient
-from .shared.defaults import STDIN_TMP_STORAGE_PATH
+from .shared.defaults import STDIN_TMP_STORAGE_PATH, DEFAULT_JOBS, DEFAULT_CALL_BUFFER_SIZE, DEFAULT_CALL_BUFFER_TIMEOUT_SECONDS, DEFAULT_MODEL_STREAM_THRESHOLD
 from .shared.io import clingo_model_to_stable_model
-from .shared.model import StableModel
+from .shared.model import StableModel, ClingoMethodCall
 from .exceptions import NoRelaxedModelsFoundException
 
 
@@ -19,6 +22,12 @@ def is_non_cython_function_call(attr: classmethod):
     return hasattr(attr, "__call__") and not attr.__name__.startswith("_") and not attr.__name__.startswith("<")
 
 
+def _flush_at_exit(connector_ref: "weakref.ReferenceType[ShowConnector]"):
+    connector = connector_ref()
+    if connector is not None:
+        connector.flush()
+
+
 class ShowConnector:
 
     def __init__(self, **kwargs):
@@ -28,9 +37,29 @@ class ShowConnector:
         else:
             self._database = ClingoClient(**kwargs)
         self._connection = None
+        # with a buffer size > 0, function calls are sent to the backend in
+        # batches, at the latest when the backend is needed for anything else,
+        # when the timeout of the batch runs out or when the interpreter exits
+        self._call_buffer: List[ClingoMethodCall] = []
+        self._call_buffer_size = kwargs.get("viasp_call_buffer_size",
+                                            DEFAULT_CALL_BUFFER_SIZE)
+        self._call_buffer_timeout = kwargs.get(
+            "viasp_call_buffer_timeout", DEFAULT_CALL_BUFFER_TIMEOUT_SECONDS)
+        self._call_buffer_timer: Union[threading.Timer, None] = None
+        # keeps the batches in order when the timer flushes concurrently
+        self._call_buffer_lock = threading.RLock()
+        if self._call_buffer_size > 0:
+            atexit.register(_flush_at_exit, weakref.ref(self))
+        # larger sets of marked models are streamed to the backend
+        self._model_stream_threshold = kwargs.get(
+            "viasp_model_stream_threshold", DEFAULT_MODEL_STREAM_THRESHOLD)
 
     def show(self):
-        self._database.set_target_stable_model(self._marked)
+        self.flush()
+        if len(self._marked) > self._model_stream_threshold:
+            self._database.stream_target_stable_models(self._marked)
+        else:
+            self._database.set_target_stable_model(self._marked)
         self._database.show()
 
     def unmark(self, model: Union[Model, StableModel]):
@@ -51,10 +80,33 @@ class ShowConnector:
         self._marked.clear()
 
     def clear_program(self):
+        self.flush()
         self._database.clear_program()
 
     def register_function_call(self, name, sig, args, kwargs):
-        self._database.register_function_call(name, sig, args, kwargs)
+        if self._call_buffer_size <= 0:
+            self._database.register_function_call(name, sig, args, kwargs)
+            return
+        with self._call_buffer_lock:
+            self._call_buffer.append(
+                ClingoMethodCall.merge(name, sig, args, kwargs))
+            if len(self._call_buffer) >= self._call_buffer_size:
+                self.flush()
+            elif self._call_buffer_timer is None:
+                self._call_buffer_timer = threading.Timer(
+                    self._call_buffer_timeout, self.flush)
+                self._call_buffer_timer.daemon = True
+                self._call_buffer_timer.start()
+
+    def flush(self):
+        r"""Send the buffered function calls to the backend in one request."""
+        with self._call_buffer_lock:
+            if self._call_buffer_timer is not None:
+                self._call_buffer_timer.cancel()
+                self._call_buffer_timer = None
+            if len(self._call_buffer) > 0:
+                calls, self._call_buffer = self._call_buffer, []
+                self._database.register_function_calls(calls)
 
     def get_relaxed_program(self,  head_name:str = "unsat", collect_variables:bool = True) -> Union[str, None]:
         r"""This method relaxes integrity constraints and returns
@@ -68,6 +120,7 @@ class ShowConnector:
             default=True (collect variables from body as a tuple in the head literal)
         """
         # self._database.set_target_stable_model(self._marked)
+        self.flush()
         kwargs = {"head_name": head_name, "collect_variables": collect_variables}
         return self._database.relax_constraints(**kwargs)
 
@@ -84,6 +137,7 @@ class ShowConnector:
             default=True (collect variables from body as a tuple in the head literal)
         """
         # self._database.set_target_stable_model(self._marked)
+        self.flush()
         kwargs = {"head_name": head_name, "collect_variables": collect_variables}
 
         relaxed_prg = self._database.relax_constraints(**kwargs)
@@ -112,22 +166,28 @@ class ShowConnector:
 
 
     def clingraph(self, viz_encoding, engine="dot", graphviz_type="graph"):
+        self.flush()
         self._database.clingraph(viz_encoding, engine, graphviz_type)
 
     def register_transformer(self, transformer, imports="", path=""):
+        self.flush()
         self._database._register_transformer(transformer, imports, path)
 
     def register_constant(self, name, value):
+        self.flush()
         self._database._register_constant(name, value)
 
     def get_session_id(self):
+        self.flush()
         return self._database.get_session_id()
 
     def deregister_session(self, session_id):
+        self.flush()
         return self._database.deregister_session(session_id)
 
-    def show_all_derived(self, show, color_theme):
-        self._database.show_all_derived(show, color_theme)
+    def show_all_derived(self, show, color_theme, jobs=DEFAULT_JOBS):
+        self.flush()
+        self._database.show_all_derived(show, color_theme, jobs)
 
 
 class Control:
@@ -149,8 +209,11 @@ class Control:
 
         if "_viasp_client" in kwargs:
             del kwargs["_viasp_client"]
-        if "viasp_backend_url" in kwargs:
-            del kwargs["viasp_backend_url"]
+        for viasp_kwarg in ["viasp_backend_url", "viasp_call_buffer_size",
+                            "viasp_call_buffer_timeout",
+                            "viasp_model_stream_threshold"]:
+            if viasp_kwarg in kwargs:
+                del kwargs[viasp_kwarg]
 
         self.viasp.register_function_call(
             "__init__", signature(self.passed_control.__init__), args, kwargs)
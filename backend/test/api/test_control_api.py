@@ -1,9 +1,15 @@
 import os
+import json
 import pytest
 
 from helper import get_clingo_stable_models, Transformer
 from viasp.shared.model import ClingoMethodCall, TransformerTransport
+from viasp.shared.io import model_to_json
 from flask import current_app
+from sqlalchemy import event
+
+from viasp.server.database import engine
+from viasp.server.models import Encodings, Warnings
 def test_add_call_endpoint(client, clingo_call_run_sample, db_session):
     bad_value = {"foo": "bar"}
     res = client.post("control/add_call", json=bad_value)
@@ -15,6 +21,27 @@ def test_add_call_endpoint(client, clingo_call_run_sample, db_session):
     res = client.put("control/add_call")
     assert res.status_code == 405
 
+def test_add_calls_are_stored_in_one_transaction(client, db_session):
+    commits = []
+    def count_commit(connection):
+        commits.append(connection)
+
+    calls = [ClingoMethodCall("load", {"path": "a.lp", "program": f"a({i})."})
+             for i in range(50)]
+    calls.append(ClingoMethodCall("add", {"name": "base", "parameters": [], "program": "b."}))
+    event.listen(engine, "commit", count_commit)
+    try:
+        res = client.post("control/add_call", json=calls)
+    finally:
+        event.remove(engine, "commit", count_commit)
+    assert res.status_code == 200
+    assert len(commits) == 1
+
+    db_encodings = db_session.query(Encodings).all()
+    assert len(db_encodings) == 1
+    assert client.get("control/program").json == "".join(f"a({i})." for i in range(50)) + "b."
+
+
 def test_model_endpoint(client, db_session):
     program = "{b;c}."
     res = client.post("control/models", json=get_clingo_stable_models(program))
@@ -46,6 +73,23 @@ def test_model_endpoint(client, db_session):
     assert res.status_code == 400
     assert res.text == "Received unexpected data type, consider using viasp.shared.io.clingo_model_to_stable_model()"
 
+def test_stream_model_endpoint(client, db_session, monkeypatch):
+    monkeypatch.setattr("viasp.server.blueprints.api.MODEL_UPLOAD_BATCH_SIZE", 2)
+    models = get_clingo_stable_models("{a;b;c}.")
+    body = "".join(model_to_json(m) + "\n" for m in models)
+    with client.post("control/models/stream", data=body,
+                     content_type="application/x-ndjson") as res:
+        assert res.status_code == 200
+        progress = [json.loads(line) for line in res.text.splitlines()]
+    assert progress == [{"models": 2}, {"models": 4}, {"models": 6},
+                        {"models": 8}, {"models": 8, "done": True}]
+    assert len(client.get("control/models").json) == len(models)
+
+    with client.post("control/models/stream", data=body + "foobar\n",
+                     content_type="application/x-ndjson") as res:
+        assert "error" in json.loads(res.text.splitlines()[-1])
+    assert len(client.get("control/models").json) == len(models), "A failed upload should keep the models"
+
 def test_program_endpoint(client, db_session):
     program = "{b;c}."
 
@@ -146,12 +190,39 @@ def test_warnings_endpoint(client, db_session):
     assert res.status_code == 200
     assert len(res.json) == 0
 
+
+def test_warnings_of_unsupported_program_are_stored(client, db_session):
+    program = "a. b;c :- a."
+    client.post("control/program", json=program)
+    client.post("control/models", json=get_clingo_stable_models(program))
+    res = client.post("control/show")
+    assert res.status_code == 200
+    db_session.remove()
+
+    res = client.get("control/warnings")
+    assert res.status_code == 200
+    assert len(res.json) > 0
+
+
+def test_rejected_models_leave_marked_models_unchanged(client, db_session):
+    models = get_clingo_stable_models("{a;b}.")
+    client.post("control/models", json=models)
+
+    res = client.post("control/models", json=models[:1] + ["foobar"])
+    assert res.status_code == 400
+    res = client.get("control/models")
+    assert len(res.json) == len(models)
+
     res = client.post("control/warnings", json="foobar")
     assert res.status_code == 400
 
     res = client.post("control/warnings", json=["foobar"])
     assert res.status_code == 200
 
+    res = client.post("control/warnings", json=["foobar", "foobar"])
+    assert res.status_code == 200
+    assert db_session.query(Warnings).count() == 1
+
     res = client.get("control/warnings")
     assert res.status_code == 200
     assert len(res.json) > 0
@@ -1,8 +1,19 @@
 import pytest
 import uuid
+from collections import Counter
+import threading
+import json
+import gzip
+import time
+
+import networkx as nx
 
 from viasp.shared.util import hash_from_sorted_transformations
-from viasp.shared.model import Node, Transformation
+from viasp.shared.model import Node, Transformation, SymbolIdentifier
+from viasp.shared.io import from_msgpack, MSGPACK_MIMETYPE
+from viasp.server.models import GraphNodes, GraphEdges, GraphSymbols, GraphReasons, Graphs, Clingraphs
+from viasp.server.blueprints.dag_api import get_adjacent_moves, precompute_adjacent_sorts, ensure_graph_of_sort, load_analyzer, graph_cache, GraphCache, sort_precomputations
+from viasp.server.factory import create_app
 from conftest import setup_client, program_simple, program_multiple_sorts, program_recursive
 
 
@@ -38,6 +49,29 @@ def test_children_allows_get_only(unique_session, program):
         assert res.status_code == 405
 
 
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_children_are_rebuilt_from_stored_symbols(unique_session, program):
+    client = setup_client(unique_session, program)
+    graph = client.get("graph").json
+    nodes_by_uuid = {node.uuid: node for node in graph.nodes}
+    sorted_program = client.get("graph/sorts").json
+    for t in sorted_program:
+        res = client.get(f"graph/children/{t.hash}")
+        assert res.status_code == 200
+        for child in res.json:
+            expected = nodes_by_uuid[child.uuid]
+            assert child == expected
+            assert {s.uuid for s in child.diff} == {s.uuid for s in expected.diff}
+            assert len(child.recursive) == len(expected.recursive)
+            for subnode, expected_subnode in zip(child.recursive, expected.recursive):
+                assert subnode == expected_subnode
+                assert subnode.uuid == expected_subnode.uuid
+
+
 @pytest.mark.parametrize("program", [
     (program_simple),
     (program_multiple_sorts),
@@ -138,6 +172,138 @@ def test_set_sort(unique_session, program):
 
 
 
+def graph_signature(graph):
+    def node_signature(node):
+        return (node.rule_nr, frozenset(s.symbol for s in node.diff),
+                frozenset(s.symbol for s in node.atoms),
+                frozenset((k, tuple(getattr(r, "symbol", None) for r in v))
+                          for k, v in node.reason.items()),
+                tuple(map(node_signature, node.recursive)))
+    return (Counter(map(node_signature, graph.nodes)),
+            Counter((node_signature(u), node_signature(v))
+                    for u, v in graph.edges))
+
+
+@pytest.mark.parametrize("program", [
+    (program_multiple_sorts),
+    ("a(1..2). {b(X)} :- a(X). c(X) :- a(X). d(X) :- b(X). e(X) :- c(X), not b(X)."),
+    ("e(1,2). e(2,3). {s(1..3)}. r(X) :- s(X). r(Y) :- r(X), e(X,Y). t(X) :- s(X).")
+])
+def test_new_sort_reuses_unchanged_prefix(unique_session, program):
+    client = setup_client(unique_session, program)
+    sorted_program = client.get("graph/sorts").json
+    current_sort = client.get("graph/current").json
+    previous_graph = client.get("graph").json
+
+    for old_index, t in enumerate(sorted_program):
+        for new_index in range(t.adjacent_sort_indices["lower_bound"],
+                               t.adjacent_sort_indices["upper_bound"] + 1):
+            if old_index == new_index:
+                continue
+            res = client.post("graph/sorts",
+                              json={
+                                  "current_sort": current_sort,
+                                  "moved_transformation": {
+                                      "old_index": old_index,
+                                      "new_index": new_index
+                                  }
+                              })
+            assert res.status_code == 200
+            current_sort = res.json["hash"]
+            graph = client.get("graph").json
+
+            previous_symbol_uuids = {
+                s.uuid for n in previous_graph.nodes for s in n.diff}
+            for node in graph.nodes:
+                if min(old_index, new_index) > 0 and \
+                        node.rule_nr < min(old_index, new_index):
+                    assert {s.uuid for s in node.diff} <= previous_symbol_uuids
+
+            assert client.delete("graph").status_code == 200
+            regenerated_graph = client.get("graph").json
+            assert graph_signature(graph) == graph_signature(regenerated_graph)
+            previous_graph = regenerated_graph
+            sorted_program = client.get("graph/sorts").json
+            break
+
+
+@pytest.mark.parametrize("program", [
+    (program_multiple_sorts),
+    ("a(1..2). {b(X)} :- a(X). c(X) :- a(X). d(X) :- b(X). e(X) :- c(X), not b(X)."),
+])
+def test_adjacent_sorts_are_precomputed(encoding_id, unique_session, db_session, program):
+    client = setup_client(unique_session, program)
+    sorted_program = client.get("graph/sorts").json
+    current_sort = client.get("graph/current").json
+    moves = get_adjacent_moves(sorted_program)
+    assert len(moves) > 0
+
+    worker = threading.Thread(target=precompute_adjacent_sorts,
+                              args=(client.application, encoding_id))
+    worker.start()
+    worker.join()
+
+    number_of_nodes = db_session.query(GraphNodes).count()
+    for old_index, new_index in moves:
+        res = client.post("graph/sorts",
+                          json={
+                              "current_sort": current_sort,
+                              "moved_transformation": {
+                                  "old_index": old_index,
+                                  "new_index": new_index
+                              }
+                          })
+        assert res.status_code == 200
+        assert client.post("graph/current", json=current_sort).status_code == 200
+    assert db_session.query(GraphNodes).count() == number_of_nodes
+
+
+@pytest.mark.parametrize("precompute", [False, True])
+def test_sort_precomputation_is_opt_in(encoding_id, db_session, tmp_path, monkeypatch, precompute):
+    # the app of the server, with its configuration
+    monkeypatch.chdir(tmp_path)
+    app = create_app()
+    if precompute:
+        app.config["SORTGENERATION_PRECOMPUTE"] = True
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["encoding_id"] = encoding_id
+        setup_client(client, program_multiple_sorts)
+        deadline = time.monotonic() + 30
+        while encoding_id in sort_precomputations and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert encoding_id not in sort_precomputations
+    number_of_graphs = db_session.query(Graphs).filter_by(encoding_id=encoding_id).count()
+    if precompute:
+        assert number_of_graphs > 1
+    else:
+        assert number_of_graphs == 1
+
+
+def test_cancelled_sort_precomputation_saves_no_graphs(encoding_id, unique_session, db_session):
+    client = setup_client(unique_session, program_multiple_sorts)
+    sorted_program = client.get("graph/sorts").json
+    current_sort = client.get("graph/current").json
+    number_of_graphs = db_session.query(Graphs).count()
+    cancelled = threading.Event()
+    cancelled.set()
+
+    precompute_adjacent_sorts(client.application, encoding_id, cancelled)
+    assert db_session.query(Graphs).count() == number_of_graphs
+
+    old_index, new_index = get_adjacent_moves(sorted_program)[0]
+    sorted_program_rules = [t.rules for t in sorted_program]
+    sorted_program_rules.insert(new_index, sorted_program_rules.pop(old_index))
+    analyzer = load_analyzer(encoding_id)
+    moved_sort = analyzer.make_transformations_from_sorted_program(sorted_program_rules)
+    ensure_graph_of_sort(encoding_id, moved_sort, analyzer, current_sort,
+                         min(old_index, new_index), cancelled)
+    db_graph = db_session.query(Graphs).filter_by(
+        encoding_id=encoding_id,
+        hash=hash_from_sorted_transformations(moved_sort)).one()
+    assert db_graph.data is None
+
+
 @pytest.mark.parametrize("program", [
     (program_simple),
     (program_multiple_sorts),
@@ -182,6 +348,106 @@ def test_edges_with_recursion_endpoint(unique_session, program):
     assert len(res.json) > 0
 
 
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_graph_endpoints_negotiate_msgpack(unique_session, program):
+    msgpack = pytest.importorskip("msgpack")
+    client = setup_client(unique_session, program)
+    sorted_program = client.get("graph/sorts").json
+    node_uuid = next(iter(client.get("graph").json.nodes)).uuid.hex
+    requests = [("GET", "graph/facts", None), ("GET", "graph/edges", None),
+                ("GET", f"detail/{node_uuid}", None)]
+    for t in sorted_program:
+        requests.append(("GET", f"graph/children/{t.hash}", None))
+        requests.append(("POST", "graph/children", {
+            "transformationHash": t.hash,
+            "currentSort": hash_from_sorted_transformations(sorted_program)}))
+    for method, url, body in requests:
+        res_json = client.open(url, method=method, json=body)
+        res_binary = client.open(url, method=method, json=body,
+                                 headers={"Accept": MSGPACK_MIMETYPE})
+        assert res_json.mimetype == "application/json"
+        assert res_binary.mimetype == MSGPACK_MIMETYPE
+        assert "Accept" in res_binary.vary
+        assert from_msgpack(res_binary.data) == json.loads(res_json.data)
+        assert all(isinstance(s, str) for s in msgpack.unpackb(res_binary.data)["symbols"])
+
+
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_graph_endpoints_answer_not_modified(unique_session, program):
+    client = setup_client(unique_session, program)
+    sorted_program = client.get("graph/sorts").json
+    current_sort = hash_from_sorted_transformations(sorted_program)
+    requests = [("GET", "graph/facts", None), ("GET", "graph/sorts", None),
+                ("POST", "graph/edges", {"currentSort": current_sort}),
+                ("POST", "graph/transformations", {"id": 0, "currentSort": current_sort})]
+    for t in sorted_program:
+        requests.append(("GET", f"graph/children/{t.hash}", None))
+    etags = {}
+    for method, url, body in requests:
+        res = client.open(url, method=method, json=body)
+        assert res.status_code == 200
+        etag, _ = res.get_etag()
+        assert etag is not None and etag not in etags.values()
+        etags[url] = etag
+        res = client.open(url, method=method, json=body,
+                          headers={"If-None-Match": f'"{etag}"'})
+        assert res.status_code == 304
+        assert res.data == b""
+
+    client.delete("graph")
+    client.get("graph")
+    res = client.get("graph/facts", headers={"If-None-Match": f'"{etags["graph/facts"]}"'})
+    assert res.status_code == 200, "A regenerated graph should get a new ETag"
+    assert res.get_etag()[0] != etags["graph/facts"]
+
+
+def test_graph_etag_changes_with_clingraphs(unique_session, db_session):
+    client = setup_client(unique_session, program_simple)
+    current_sort = hash_from_sorted_transformations(client.get("graph/sorts").json)
+    res = client.post("graph/edges", json={"currentSort": current_sort})
+    etag, _ = res.get_etag()
+    with client.session_transaction() as sess:
+        encoding_id = sess["encoding_id"]
+    db_session.add(Clingraphs(encoding_id=encoding_id, filename="clingraph_1.svg"))
+    db_session.commit()
+    res = client.post("graph/edges", json={"currentSort": current_sort},
+                      headers={"If-None-Match": f'"{etag}"'})
+    assert res.status_code == 200, "Added clingraphs should change the ETag"
+    assert res.get_etag()[0] != etag
+
+
+def test_large_graph_responses_are_compressed(unique_session, monkeypatch):
+    monkeypatch.setattr("viasp.server.blueprints.dag_api.RESPONSE_COMPRESSION_MIN_BYTES", 0)
+    client = setup_client(unique_session, program_simple)
+    plain = client.get("graph/facts")
+    assert "Content-Encoding" not in plain.headers
+    res = client.get("graph/facts", headers={"Accept-Encoding": "gzip, deflate"})
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in res.vary
+    assert gzip.decompress(res.data) == plain.data
+    etag, _ = res.get_etag()
+    assert etag.endswith("-gzip")
+    res = client.get("graph/facts", headers={"Accept-Encoding": "gzip, deflate",
+                                             "If-None-Match": f'"{etag}"'})
+    assert res.status_code == 304
+
+
+def test_graph_endpoints_default_to_json(unique_session, monkeypatch):
+    monkeypatch.setattr("viasp.server.blueprints.dag_api.msgpack", None)
+    client = setup_client(unique_session, program_simple)
+    res = client.get("graph/facts", headers={"Accept": MSGPACK_MIMETYPE})
+    assert res.mimetype == "application/json"
+    assert len(res.json) > 0
+
+
 @pytest.mark.parametrize("program", [
     (program_simple),
     (program_multiple_sorts),
@@ -227,6 +493,59 @@ def test_get_transformation(unique_session, program):
     assert res.status_code == 404
 
 
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_decoded_graph_is_cached(encoding_id, unique_session, program):
+    client = setup_client(unique_session, program)
+    client.get("/graph/transformation/1")
+    info = graph_cache.cache_info()
+    assert info["entries"] == 1
+
+    client.get("/graph/transformation/1")
+    client.get("/graph/transformation/0")
+    assert graph_cache.cache_info()["hits"] == info["hits"] + 2
+    assert graph_cache.cache_info()["misses"] == info["misses"]
+
+    sorted_program = client.get("graph/sorts").json
+    graph = client.get("graph").json
+    client.post("graph", json={
+        "data": graph,
+        "hash": hash_from_sorted_transformations(sorted_program),
+        "sort": sorted_program
+    })
+    assert graph_cache.cache_info()["entries"] == 0
+
+    client.get("/graph/transformation/1")
+    client.delete("graph")
+    assert graph_cache.cache_info()["entries"] == 0
+
+    client.get("/graph/transformation/1")
+    client.post("control/deregister_session", json={"session_id": encoding_id})
+    assert graph_cache.cache_info()["entries"] == 0
+
+
+def test_graph_cache_evicts_least_recently_used():
+    cache = GraphCache(max_entries=2, max_bytes=100)
+    cache.put("e", "a", nx.DiGraph(), 10)
+    cache.put("e", "b", nx.DiGraph(), 10)
+    assert cache.get("e", "a") is not None
+    cache.put("e", "c", nx.DiGraph(), 10)
+    assert cache.get("e", "b") is None
+    assert cache.get("e", "a") is not None
+
+    cache.put("e", "d", nx.DiGraph(), 95)
+    assert cache.cache_info()["entries"] == 1
+    assert cache.get("e", "d") is not None
+
+    cache.put("e", "f", nx.DiGraph(), 101)
+    assert cache.get("e", "f") is None
+    cache.invalidate("e")
+    assert cache.cache_info() == {"hits": 3, "misses": 2, "entries": 0, "bytes": 0}
+
+
 @pytest.mark.parametrize("program", [
     (program_simple),
     (program_multiple_sorts),
@@ -256,6 +575,96 @@ def test_graph_reason_endpoints(unique_session, program):
                            "nodeid": uuid.uuid4()
                        }).status_code == 200
 
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_graph_reasons_are_read_from_reason_table(unique_session, program):
+    client = setup_client(unique_session, program)
+    graph = client.get("graph").json
+    nodes = list(graph.nodes)
+    nodes.extend(subnode for node in graph.nodes for subnode in node.recursive)
+    for node in nodes:
+        expected_reasons = {
+            symbol: [r for r in reasons if isinstance(r, SymbolIdentifier)]
+            for symbol, reasons in node.reason.items()}
+        for symbol in node.reason_rules:
+            expected_reasons.setdefault(symbol, [])
+        res = client.get(f"detail/explain/{node.uuid.hex}")
+        assert res.status_code == 200
+        assert res.json == expected_reasons
+
+        for source in node.diff:
+            res = client.post("graph/reason", json={"sourceid": source.uuid, "nodeid": node.uuid})
+            assert res.status_code == 200
+            reasons = expected_reasons.get(str(source.symbol), [])
+            assert [s["tgt"] for s in res.json["symbols"]] == \
+                list(dict.fromkeys(uuid.UUID(str(r.uuid)).hex for r in reasons))
+            assert res.json["rule"] == node.reason_rules.get(str(source.symbol))
+
+
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_recursive)
+])
+def test_saving_a_graph_again_replaces_its_rows(encoding_id, unique_session, db_session, program):
+    client = setup_client(unique_session, program)
+    client.get("graph")
+    tables = [GraphNodes, GraphEdges, GraphSymbols, GraphReasons]
+    counts = [db_session.query(t).count() for t in tables]
+
+    client.delete("graph")
+    graph = client.get("graph").json
+    assert [db_session.query(t).count() for t in tables] == counts
+    for node in graph.nodes:
+        res = client.get(f"detail/explain/{node.uuid.hex}")
+        assert res.status_code == 200
+        assert all(len(reasons) == len(set(reasons)) for reasons in res.json.values())
+
+
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_why_chain_follows_reasons_to_facts(unique_session, program):
+    client = setup_client(unique_session, program)
+    graph = client.get("graph").json
+    nodes = list(graph.nodes)
+    nodes.extend(subnode for node in graph.nodes for subnode in node.recursive)
+    reasons = {}
+    for node in nodes:
+        for s in node.diff:
+            reasons.setdefault(uuid.UUID(str(s.uuid)).hex, set()).update(
+                uuid.UUID(str(r.uuid)).hex for r in node.reason.get(str(s.symbol), [])
+                if isinstance(r, SymbolIdentifier))
+
+    for symbol_uuid in reasons:
+        expected_edges, frontier = set(), [symbol_uuid]
+        while len(frontier) > 0:
+            src = frontier.pop()
+            for tgt in reasons.get(src, set()):
+                if (src, tgt) not in expected_edges:
+                    expected_edges.add((src, tgt))
+                    frontier.append(tgt)
+        res = client.get(f"graph/why/{symbol_uuid}")
+        assert res.status_code == 200
+        assert {(e["src"], e["tgt"]) for e in res.json["edges"]} == expected_edges
+        assert not res.json["truncated"]
+        assert res.json["symbols"][0]["uuid"] == symbol_uuid
+        assert {s["uuid"] for s in res.json["symbols"]} == \
+            {symbol_uuid} | {tgt for _, tgt in expected_edges}
+
+        res = client.get(f"graph/why/{symbol_uuid}?depth=1")
+        assert {(e["src"], e["tgt"]) for e in res.json["edges"]} == \
+            {(symbol_uuid, tgt) for tgt in reasons[symbol_uuid]}
+        assert res.json["truncated"] == (len(expected_edges) > len(reasons[symbol_uuid]))
+
+    assert client.get(f"graph/why/{uuid.uuid4().hex}").status_code == 404
+    assert client.get("graph/why/not-a-uuid").status_code == 400
+
+
 @pytest.mark.parametrize("program", [
     (program_simple),
     (program_multiple_sorts),
@@ -2,9 +2,14 @@ import pytest
 from viasp.shared.model import SearchResultSymbolWrapper
 from helper import get_clingo_stable_models
 import uuid
+import threading
+import time
 from urllib.parse import quote_plus
 
 from conftest import setup_client
+from viasp.server.models import Graphs, SearchSymbols, SearchTrigrams
+from viasp.server.blueprints import dag_api
+from viasp.asp.justify import SearchWorkerPool, SymbolSearchContext
 
 program_simple = "a(1..2). {b(X)} :- a(X). c(X) :- b(X)."
 program_multiple_sorts = "a(1..2). {b(X)} :- a(X). c(X) :- a(X)."
@@ -165,3 +170,135 @@ def test_awaiting_input(unique_session, program, query, expected):
     res = unique_session.get(f"query?q={quote_plus(query)}")
     assert res.status_code == 200
     assert (res.json[0].awaiting_input) == expected
+
+
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_recursive)
+])
+def test_ground_search_uses_symbol_index(unique_session, db_session, program):
+    setup_for_query(unique_session, program)
+    with unique_session.session_transaction() as sess:
+        encoding_id = sess['encoding_id']
+    indexed_symbols = db_session.query(SearchSymbols).filter_by(
+        encoding_id=encoding_id).all()
+    assert len(indexed_symbols) > 0
+    assert len(set(s.symbol for s in indexed_symbols)) == len(indexed_symbols)
+    assert db_session.query(SearchTrigrams).filter_by(
+        encoding_id=encoding_id).count() > 0
+
+    for indexed_symbol in indexed_symbols:
+        for query in [indexed_symbol.symbol, indexed_symbol.symbol[1:4]]:
+            res = unique_session.get(f"query?q={quote_plus(query)}")
+            assert res.status_code == 200
+            expected = [s.symbol for s in indexed_symbols if query in s.symbol]
+            assert sorted(r.repr for r in res.json) == sorted(expected)
+
+    unique_session.post("control/deregister_session", json={})
+    assert db_session.query(SearchSymbols).filter_by(
+        encoding_id=encoding_id).count() == 0
+    assert db_session.query(SearchTrigrams).filter_by(
+        encoding_id=encoding_id).count() == 0
+
+
+def test_nonground_search_context_is_loaded_once_per_graph_version(
+        unique_session, db_session, monkeypatch):
+    loads = []
+    get_all_symbols_in_graph = dag_api.get_all_symbols_in_graph
+    monkeypatch.setattr(dag_api, "get_all_symbols_in_graph",
+                        lambda *args: loads.append(args) or get_all_symbols_in_graph(*args))
+    setup_for_query(unique_session, program_recursive)
+    for query, expected_length in [("j(X,X+1)", 6), ("j(X,X+2)", 5),
+                                   ("j(X+Y,1)", 1), ("j(X,", 1),
+                                   ("j(X,Y)", 21), ("j(X,X+1)", 6)]:
+        res = unique_session.get(f"query?q={quote_plus(query)}")
+        assert res.status_code == 200
+        assert len(res.json) == expected_length
+    assert len(loads) == 1
+
+    with unique_session.session_transaction() as sess:
+        encoding_id = sess['encoding_id']
+    db_session.query(Graphs).filter_by(encoding_id=encoding_id).update(
+        {"version": uuid.uuid4().hex})
+    db_session.commit()
+    res = unique_session.get(f"query?q={quote_plus('j(X,X+1)')}")
+    assert len(res.json) == 6
+    assert len(loads) == 2
+
+
+def test_nonground_search_stops_after_timeout(app_context, unique_session):
+    app_context.config["SEARCH_TIMEOUT_SECONDS"] = 0.5
+    setup_for_query(unique_session, program_simple)
+    res = unique_session.get(f"query?q={quote_plus('a(1..1000000000)')}")
+    assert res.status_code == 200
+    assert len(res.json) == 1
+    assert res.json[0].too_broad
+    assert res.json[0].hide_in_suggestions
+
+    res = unique_session.get(f"query?q={quote_plus('a(X)')}")
+    assert len(res.json) == 2
+    assert not any(r.too_broad for r in res.json)
+
+
+def test_slow_search_does_not_block_other_searches():
+    workers = SearchWorkerPool()
+    loads = []
+
+    def occurrences(key):
+        return lambda: loads.append(key) or [("a(1)", "u1", 1.0), ("a(2)", "u2", 2.0)]
+
+    try:
+        assert len(workers.search(("slow", ), "a(X)", occurrences("slow"), 10, 10)) == 2
+        assert len(workers.search(("fast", ), "a(X)", occurrences("fast"), 10, 10)) == 2
+        slow = threading.Thread(target=workers.search,
+                                args=(("slow", ), "a(1..1000000000)",
+                                      occurrences("slow"), 3, 10))
+        slow.start()
+        start = time.perf_counter()
+        results = workers.search(("fast", ), "a(2)", occurrences("fast"), 2, 10)
+        assert [r.repr for r in results] == ["a(2)"]
+        assert time.perf_counter() - start < 2
+        slow.join()
+
+        # the slow search stopped the worker of its own graph only
+        results = workers.search(("fast", ), "a(1)", occurrences("fast"), 2, 10)
+        assert [r.repr for r in results] == ["a(1)"]
+        results = workers.search(("slow", ), "a(1)", occurrences("slow"), 10, 10)
+        assert [r.repr for r in results] == ["a(1)"]
+        assert loads == ["slow", "fast", "slow"]
+
+        results = workers.search(("broken", ), "a(X)", lambda: [("a(", "u", 1.0)], 2, 10)
+        assert results[0].too_broad
+    finally:
+        workers.stop()
+
+
+def test_search_context_releases_query_results():
+    context = SymbolSearchContext([("a(1)", "u1", 1.0), ("a(2)", "u2", 2.0)])
+    loaded_atoms = len(context.control.symbolic_atoms)
+    for query in ["a(X)", "a(1)", "a(3)", "a(X)"]:
+        assert len(context.search(query)) > 0
+        assert len(context.control.symbolic_atoms) == loaded_atoms
+    assert [r.repr for r in context.search("a(X)")] == ["a(1)", "a(2)"]
+
+
+def test_search_context_of_worker_is_reused_and_rebuilt(unique_session, monkeypatch):
+    workers = SearchWorkerPool(max_queries=3)
+    monkeypatch.setattr(dag_api, "search_workers", workers)
+    setup_for_query(unique_session, program_recursive)
+    try:
+        loaded_atoms = None
+        for i, query in enumerate(["j(X,X+1)", "j(X,X+2)", "j(X,Y)"]):
+            res = unique_session.get(f"query?q={quote_plus(query)}")
+            assert not any(r.too_broad for r in res.json)
+            [worker] = workers.workers.values()
+            stats = worker.stats(10)
+            assert stats["queries"] == i + 1
+            # the external of the query is released and its atoms are removed
+            loaded_atoms = loaded_atoms or stats["atoms"]
+            assert stats["atoms"] == loaded_atoms
+
+        unique_session.get(f"query?q={quote_plus('j(0,Y)')}")
+        assert worker.stats(10) == {"queries": 1, "atoms": loaded_atoms}
+    finally:
+        workers.stop()
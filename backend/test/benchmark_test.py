@@ -0,0 +1,140 @@
+import os
+import time
+from uuid import uuid4
+
+import pytest
+from flask import current_app
+import networkx as nx
+from clingo import Function, Number
+
+from viasp.shared.model import Node, SymbolIdentifier, Transformation, RuleContainer
+from viasp.shared.io import to_compact_json
+from viasp.shared.util import get_compatible_node_link_data, hash_from_sorted_transformations
+from viasp.server.models import Encodings
+from viasp.server.blueprints.dag_api import make_graph_rows, insert_rows_in_batches, save_graph, get_all_symbols_in_graph, search_ground_term_in_index, search_nonground_term
+from viasp.server.database import Base, db_session, engine, create_storage_engine
+from viasp.shared.defaults import STORAGE_PROFILES
+from helper import get_clingo_stable_models
+
+run_benchmarks = pytest.mark.skipif(
+    "VIASP_BENCHMARK" not in os.environ,
+    reason="Benchmarks only run if VIASP_BENCHMARK is set.")
+
+
+def make_chain_graph(n_symbols: int, symbols_per_node: int = 100):
+    transformations = [
+        Transformation(i, RuleContainer(str_=(f"p{i+1}(X) :- p{i}(X).", )))
+        for i in range(10)
+    ]
+    graph = nx.DiGraph()
+    previous = Node(frozenset(), -1)
+    graph.add_node(previous)
+    for i in range(n_symbols // symbols_per_node):
+        diff = frozenset(
+            SymbolIdentifier(Function(f"p{i}", [Number(j)]))
+            for j in range(symbols_per_node))
+        node = Node(diff, i % 10, diff)
+        graph.add_edge(previous, node, transformation=transformations[i % 10])
+        previous = node
+    return graph, transformations
+
+
+@run_benchmarks
+@pytest.mark.parametrize("n_symbols", [1_000, 10_000, 100_000])
+def test_benchmark_save_graph_rows(app_context, db_session, n_symbols):
+    timings = {}
+    for bulk in [False, True]:
+        graph, _ = make_chain_graph(n_symbols)
+        encoding_id = uuid4().hex
+        db_session.add(Encodings(encoding_id=encoding_id, filename="", program=""))
+        db_session.commit()
+        start = time.perf_counter()
+        rows = make_graph_rows(graph, encoding_id, "benchmark")
+        if bulk:
+            insert_rows_in_batches(rows)
+        else:
+            db_session.add_all(model(**row) for model, row in rows)
+        db_session.commit()
+        timings["bulk" if bulk else "orm"] = time.perf_counter() - start
+    print(f"\nsaving the rows of {n_symbols} symbols: "
+          f"orm {timings['orm']:.3f}s, bulk {timings['bulk']:.3f}s")
+
+
+@run_benchmarks
+@pytest.mark.parametrize("profile", list(STORAGE_PROFILES))
+def test_benchmark_show_with_storage_profile(tmp_path, app_context, profile):
+    program = "a(1..6). {b(X)} :- a(X). c(X) :- b(X). d(X) :- a(X), not c(X)."
+    models = get_clingo_stable_models(program)
+    storage_engine = create_storage_engine(f"sqlite:///{tmp_path / 'graphs.db'}", profile)
+    Base.metadata.create_all(storage_engine)
+    db_session.remove()
+    db_session.configure(bind=storage_engine)
+    try:
+        durations = []
+        for _ in range(5):
+            with app_context.test_client() as client:
+                with client.session_transaction() as sess:
+                    sess['encoding_id'] = uuid4().hex
+                client.post("control/program", json=program)
+                client.post("control/models", json=models)
+                start = time.perf_counter()
+                assert client.post("control/show").status_code == 200
+                durations.append(time.perf_counter() - start)
+    finally:
+        db_session.remove()
+        db_session.configure(bind=engine)
+        storage_engine.dispose()
+    print(f"\n/control/show with storage profile {profile}: "
+          f"min {min(durations):.3f}s, mean {sum(durations) / len(durations):.3f}s")
+
+
+@run_benchmarks
+@pytest.mark.parametrize("compact_symbols", [False, True])
+def test_benchmark_serialize_graph(app_context, compact_symbols):
+    graph, transformations = make_chain_graph(50_000, symbols_per_node=50)
+    data = {"graph": get_compatible_node_link_data(graph), "sort": transformations}
+    dumps = to_compact_json if compact_symbols else current_app.json.dumps
+    start = time.perf_counter()
+    serialized = dumps(data)
+    encoded = time.perf_counter()
+    current_app.json.loads(serialized)
+    decoded = time.perf_counter()
+    print(f"\nserializing {len(graph)} nodes (compact_symbols={compact_symbols}): "
+          f"dumps {encoded - start:.3f}s, loads {decoded - encoded:.3f}s, {len(serialized)} bytes")
+
+
+@run_benchmarks
+def test_benchmark_ground_search(app_context, db_session):
+    graph, transformations = make_chain_graph(100_000)
+    encoding_id = uuid4().hex
+    db_session.add(Encodings(encoding_id=encoding_id, filename="", program=""))
+    db_session.commit()
+    save_graph(graph, encoding_id, transformations)
+    graph_hash = hash_from_sorted_transformations(transformations)
+    query = "p42(7"
+    start = time.perf_counter()
+    scanned = [s for s, _ in get_all_symbols_in_graph(encoding_id, graph_hash)
+               if query in s.symbol]
+    scan = time.perf_counter()
+    indexed = search_ground_term_in_index(query, encoding_id, graph_hash)
+    index = time.perf_counter()
+    assert len(scanned) == sum(len(r.includes) for r in indexed)
+    print(f"\nsearching {query!r} in 100000 symbols: "
+          f"scan {scan - start:.3f}s, trigram index {index - scan:.3f}s")
+
+
+@run_benchmarks
+def test_benchmark_nonground_search(app_context, db_session):
+    graph, transformations = make_chain_graph(100_000)
+    encoding_id = uuid4().hex
+    db_session.add(Encodings(encoding_id=encoding_id, filename="", program=""))
+    db_session.commit()
+    save_graph(graph, encoding_id, transformations)
+    graph_hash = hash_from_sorted_transformations(transformations)
+    durations = []
+    for query in ["p1(X)", "p2(X)", "p3(X+1)", "p4(X)"]:
+        start = time.perf_counter()
+        search_nonground_term(query, encoding_id, graph_hash)
+        durations.append(time.perf_counter() - start)
+    print(f"\nnon-ground search in 100000 symbols: first query {durations[0]:.3f}s, "
+          f"following queries {max(durations[1:]):.3f}s")
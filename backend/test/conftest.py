@@ -15,7 +15,7 @@ from viasp.asp.justify import build_graph, save_model
 from viasp.asp.reify import ProgramAnalyzer, reify_list
 from viasp.server.blueprints.api import bp as api_bp
 from viasp.server.blueprints.app import bp as app_bp
-from viasp.server.blueprints.dag_api import bp as dag_bp
+from viasp.server.blueprints.dag_api import bp as dag_bp, graph_cache, search_workers
 from viasp.shared.io import DataclassJSONProvider
 from viasp.shared.util import hash_from_sorted_transformations, get_compatible_node_link_data
 from viasp.shared.model import ClingoMethodCall, Node, SymbolIdentifier, Transformation
@@ -47,6 +47,8 @@ def db_session():
     session.rollback()
     session.close()
     Base.metadata.drop_all(engine)
+    graph_cache.clear()
+    search_workers.clear()
 
 @pytest.fixture
 def encoding_id():
@@ -255,7 +257,12 @@ def cleanup(request):
         import shutil
         if os.path.exists(CLINGRAPH_PATH):
             shutil.rmtree(CLINGRAPH_PATH)
-        for file in [GRAPH_PATH, PROGRAM_STORAGE_PATH, STDIN_TMP_STORAGE_PATH]:
+        engine.dispose()
+        graph_journal_files = [
+            GRAPH_PATH.with_name(GRAPH_PATH.name + suffix)
+            for suffix in ["-wal", "-shm", "-journal"]
+        ]
+        for file in [GRAPH_PATH, *graph_journal_files, PROGRAM_STORAGE_PATH, STDIN_TMP_STORAGE_PATH]:
             if os.path.exists(file):
                 os.remove(file)
 
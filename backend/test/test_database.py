@@ -2,13 +2,17 @@ import pytest
 import networkx as nx
 from flask import current_app
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import select, update
+from sqlalchemy import select, update, event, inspect, text
 from clingo.ast import parse_string
 import uuid
 
 from helper import get_clingo_stable_models
 from viasp.shared.model import TransformerTransport, TransformationError, FailedReason, Node
-from viasp.server.models import Encodings, Graphs, Recursions, DependencyGraphs, Models, Clingraphs, Warnings, Transformers, CurrentGraphs, GraphEdges, GraphNodes, GraphSymbols, AnalyzerConstants, AnalyzerFacts, AnalyzerNames
+from viasp.server.models import Encodings, EncodingChunks, Graphs, Recursions, DependencyGraphs, Models, Clingraphs, Warnings, Transformers, CurrentGraphs, GraphEdges, GraphNodes, GraphSymbols, AnalyzerConstants, AnalyzerFacts, AnalyzerNames
+from viasp.server.database import engine, migrate_db, create_storage_engine
+from viasp.server.blueprints.dag_api import get_current_graph_hash, handle_request_for_children, get_src_tgt_mapping_from_graph, get_all_symbols_in_graph, save_graph, get_why_chain
+from viasp.shared.util import hash_string
+from viasp.server.storage import append_program_chunk, get_encoding_programs, delete_encoding
 from conftest import setup_client, register_clingraph, register_transformer, program_simple, program_multiple_sorts, program_recursive
 
 
@@ -38,6 +42,47 @@ def test_program_database(db_session):
     assert len(db_session.query(Encodings).all()) == 0, "Database should be empty after clearing."
 
 
+def test_program_chunks_database(app_context, db_session):
+    encoding_id = "test"
+    filename = "<string>"
+    program1 = "a. b:-a."
+    program2 = "c."
+    append_program_chunk(encoding_id, program1, filename)
+    db_session.commit()
+
+    res = db_session.query(Encodings).all()
+    assert len(res) == 1
+    assert get_encoding_programs(encoding_id) == [program1]
+    assert res[0].program_hash == hash_string(program1)
+
+    append_program_chunk(encoding_id, program2, filename)
+    db_session.commit()
+
+    res = db_session.query(Encodings).all()
+    assert len(res) == 1
+    assert get_encoding_programs(encoding_id) == [program1 + program2]
+    assert res[0].program_hash == hash_string(hash_string(program1) + program2)
+    chunks = res[0].program_chunks
+    assert [c.chunk for c in chunks] == [program1, program2]
+
+    append_program_chunk(encoding_id, program2, "other.lp")
+    db_session.commit()
+    assert get_encoding_programs(encoding_id) == [program1 + program2, program2]
+
+    delete_encoding(encoding_id)
+    db_session.commit()
+    assert len(db_session.query(Encodings).all()) == 0, "Database should be empty after clearing."
+    assert len(db_session.query(EncodingChunks).all()) == 0
+
+
+def test_programs_with_the_same_filename_stay_separate(app_context, db_session):
+    encoding_id = "test"
+    db_session.add(Encodings(encoding_id=encoding_id, filename="<string>", program="a."))
+    db_session.add(Encodings(encoding_id=encoding_id, filename="<string>", program="b."))
+    db_session.commit()
+    assert get_encoding_programs(encoding_id) == ["a.", "b."]
+
+
 def test_models_database(app_context, db_session):
     encoding_id = "test"
     program1 = "a. b:-a."
@@ -80,6 +125,43 @@ def test_models_unique_constraint_database(app_context, db_session):
     assert len(res) == 2
 
 
+def test_models_are_stored_compressed_by_hash(app_context, db_session):
+    program = "a(1..100). {b(X)} :- a(X), X < 3."
+    models = get_clingo_stable_models(program)
+    db_session.add_all([Models(encoding_id="test", model=current_app.json.dumps(m)) for m in models])
+    db_session.commit()
+
+    res = db_session.query(Models).all()
+    assert len(res) == len(models)
+    assert len({m.model_hash for m in res}) == len(models)
+    assert all(len(m.data) < len(m.model) for m in res)
+    assert [current_app.json.loads(m.model) for m in res] == models
+
+    indexes = inspect(engine).get_unique_constraints("models_table")
+    assert [["encoding_id", "model_hash"]] == [i["column_names"] for i in indexes]
+
+
+def test_duplicate_models_in_one_request_are_stored_once(unique_session, db_session):
+    program = "a(1..2). {b(X)} :- a(X)."
+    models = get_clingo_stable_models(program)
+    unique_session.post("control/program", json=program)
+    res = unique_session.post("control/models", json=models + models[:2])
+    assert res.status_code == 200
+    assert db_session.query(Models).count() == len(models)
+
+
+def test_migration_recreates_tables_with_changed_columns(db_session):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE models_table")
+        conn.exec_driver_sql(
+            "CREATE TABLE models_table (id INTEGER PRIMARY KEY, encoding_id VARCHAR, model VARCHAR)")
+
+    migrate_db()
+
+    assert {"id", "encoding_id", "model_hash", "data"} == {
+        column["name"] for column in inspect(engine).get_columns("models_table")}
+
+
 @pytest.mark.parametrize("program, expected_length", [
     (program_simple, 1),
 ])
@@ -106,6 +188,47 @@ def test_graph_database_datatypes(encoding_id, unique_session, db_session, progr
     assert isinstance(current_app.json.loads(graph.sort), list)
 
 
+def graph_table_rows(db_session, encoding_id):
+    nodes = db_session.execute(
+        select(GraphNodes).where(GraphNodes.encoding_id == encoding_id)).scalars().all()
+    symbols = db_session.execute(
+        select(GraphSymbols).where(GraphSymbols.node.in_([n.node_uuid for n in nodes]))).scalars().all()
+    edges = db_session.execute(
+        select(GraphEdges).where(GraphEdges.encoding_id == encoding_id)).scalars().all()
+    return (
+        sorted((n.node_uuid, n.graph_hash, n.transformation_hash, n.branch_position,
+                n.rule_nr, n.reason, n.reason_rules, n.parent_uuid,
+                n.recursive_supernode_uuid, n.space_multiplier) for n in nodes),
+        sorted((s.node, s.symbol_uuid, s.symbol, s.has_reason) for s in symbols),
+        sorted((e.graph_hash, e.source, e.target, e.transformation_hash, e.style,
+                str(e.recursion_anchor_keyword), str(e.recursive_supernode_uuid)) for e in edges),
+    )
+
+
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_bulk_save_graph_matches_orm_save_graph(encoding_id, unique_session, db_session, program):
+    setup_client(unique_session, program)
+    bulk_rows = graph_table_rows(db_session, encoding_id)
+    assert all(len(rows) > 0 for rows in bulk_rows)
+
+    db_graph = db_session.execute(
+        select(Graphs).where(Graphs.encoding_id == encoding_id)).scalar()
+    graph = nx.node_link_graph(current_app.json.loads(db_graph.data))
+    sorted_program = current_app.json.loads(db_graph.sort)
+    node_uuids = [row[0] for row in bulk_rows[0]]
+    db_session.query(GraphSymbols).filter(GraphSymbols.node.in_(node_uuids)).delete()
+    db_session.query(GraphNodes).filter_by(encoding_id=encoding_id).delete()
+    db_session.query(GraphEdges).filter_by(encoding_id=encoding_id).delete()
+    db_session.commit()
+
+    save_graph(graph, encoding_id, sorted_program, bulk=False)
+    assert graph_table_rows(db_session, encoding_id) == bulk_rows
+
+
 @pytest.mark.parametrize("program", [
     (program_simple),
 ])
@@ -201,9 +324,11 @@ def test_graph_nodes_datatypes(encoding_id, unique_session, db_session, program)
         assert isinstance(node.graph_hash, str)
         assert isinstance(node.transformation_hash, str)
         assert isinstance(node.branch_position, float)
-        assert isinstance(node.node, str)
-        assert isinstance(current_app.json.loads(node.node), Node)
+        assert isinstance(node.rule_nr, int)
+        assert isinstance(current_app.json.loads(node.reason), dict)
+        assert isinstance(current_app.json.loads(node.reason_rules), dict)
         assert isinstance(node.node_uuid, str)
+        assert node.parent_uuid == None or type(node.parent_uuid) == str
         assert node.recursive_supernode_uuid == None or \
                 type(node.recursive_supernode_uuid) == str
 
@@ -246,7 +371,9 @@ def test_graph_nodes_uniqueness(encoding_id, unique_session, db_session, program
                                 graph_hash=db_node.graph_hash+"1",
                                 transformation_hash=db_node.transformation_hash+"1",
                                 branch_position=db_node.branch_position+1,
-                                node=db_node.node+"1",
+                                rule_nr=db_node.rule_nr,
+                                reason=db_node.reason,
+                                reason_rules=db_node.reason_rules,
                                 node_uuid=db_node.node_uuid))
     with pytest.raises(IntegrityError):
         db_session.commit()
@@ -276,6 +403,7 @@ def test_graph_symbols_datatypes(encoding_id, unique_session, db_session, progra
         assert isinstance(sym.node, str)
         assert isinstance(sym.symbol_uuid, str)
         assert isinstance(sym.symbol, str)
+        assert isinstance(sym.has_reason, bool)
 
 
 @pytest.mark.parametrize("program", [
@@ -676,3 +804,109 @@ def test_analyzer_constants_uniqueness(encoding_id, unique_session, db_session):
         where(AnalyzerConstants.encoding_id.in_([encoding_id, encoding_id2]))
     ).scalars().all()
     assert len(res) == 3
+
+
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_multiple_sorts),
+    (program_recursive)
+])
+def test_graph_queries_use_indexes(encoding_id, unique_session, db_session, program):
+    setup_client(unique_session, program)
+    current_graph_hash = get_current_graph_hash(encoding_id)
+    transformation_hashes = db_session.execute(
+        select(GraphNodes.transformation_hash).where(
+            GraphNodes.encoding_id == encoding_id).distinct()).scalars().all()
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        for transformation_hash in transformation_hashes:
+            handle_request_for_children(transformation_hash, False, encoding_id)
+        get_src_tgt_mapping_from_graph(encoding_id)
+        get_all_symbols_in_graph(encoding_id, current_graph_hash)
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+
+    assert len(statements) > 0
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}",
+                                        parameters).all()
+            for row in plan:
+                detail = row[-1]
+                for table in ("nodes_table", "edges_table", "symbols_table"):
+                    assert not detail.startswith(f"SCAN {table}"), \
+                        f"{detail} in query plan of {statement}"
+
+
+@pytest.mark.parametrize("program", [
+    (program_simple),
+    (program_recursive)
+])
+def test_why_chain_queries_use_indexes(encoding_id, unique_session, db_session, program):
+    setup_client(unique_session, program)
+    current_graph_hash = get_current_graph_hash(encoding_id)
+    symbol_uuids = [s.symbol_uuid for s, _ in
+                    get_all_symbols_in_graph(encoding_id, current_graph_hash)]
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        for symbol_uuid in symbol_uuids:
+            assert get_why_chain(symbol_uuid, encoding_id) is not None
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}",
+                                        parameters).all()
+            for row in plan:
+                detail = row[-1]
+                for table in ("reasons_table", "symbols_table", "nodes_table"):
+                    assert not detail.startswith(f"SCAN {table}"), \
+                        f"{detail} in query plan of {statement}"
+                if "reasons_table" in detail and "symbol_uuid" in statement:
+                    assert "ix_reasons_encoding_graph_symbol" in detail, \
+                        f"{detail} in query plan of {statement}"
+
+
+def test_migration_creates_missing_indexes(db_session):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_nodes_encoding_graph_transformation")
+    assert "ix_nodes_encoding_graph_transformation" not in {
+        index["name"] for index in inspect(engine).get_indexes("nodes_table")}
+
+    migrate_db()
+
+    assert "ix_nodes_encoding_graph_transformation" in {
+        index["name"] for index in inspect(engine).get_indexes("nodes_table")}
+
+
+@pytest.mark.parametrize("profile, journal_mode, synchronous", [
+    ("default", "delete", 2),
+    ("wal", "wal", 1),
+    ("volatile", "memory", 0),
+])
+def test_storage_profile_pragmas(tmp_path, profile, journal_mode, synchronous):
+    storage_engine = create_storage_engine(f"sqlite:///{tmp_path / 'graphs.db'}", profile)
+    with storage_engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == journal_mode
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == synchronous
+    storage_engine.dispose()
+
+
+def test_unknown_storage_profile(tmp_path):
+    with pytest.raises(ValueError):
+        create_storage_engine(f"sqlite:///{tmp_path / 'graphs.db'}", "unknown")
@@ -1,12 +1,20 @@
+import pytest
+from collections import Counter
 from typing import List
 
+import igraph
 import networkx as nx
+import numpy as np
+from clingo import Symbol
 from clingo.ast import AST, Function, Location, Position
+from multiprocessing.reduction import ForkingPickler
 
 from viasp.asp.justify import make_reason_path_from_facts_to_stable_model, \
-    get_h_symbols_from_model
+    get_h_symbols_from_model, get_h_symbols_from_models, build_graph
 from viasp.shared.util import pairwise
-from viasp.asp.reify import transform
+from viasp.asp import justify
+from viasp.server.blueprints.dag_api import get_node_positions, make_node_positions
+from viasp.asp.reify import transform, reify_list
 from viasp.shared.model import Node, RuleContainer, Transformation, SymbolIdentifier
 from viasp.shared.util import get_start_node_from_graph, get_end_node_from_path
 
@@ -192,6 +200,93 @@ def test_atoms_are_propagated_correctly_through_diffs(app_context):
         assert len(src.atoms) == len(tgt.atoms) - len(tgt.diff)
 
 
+@pytest.mark.parametrize("program", [
+    "a(1..2). {b(X)} :- a(X). c(X) :- b(X).",
+    "a(1..3). {b(X)} :- a(X). c :- #count{X: b(X)} > 1. d(X) :- a(X), not b(X).",
+    "a(1..3). {b(X)} :- a(X). e(X) :- a(X), b(Y) : a(Y), Y<X.",
+    "p(1;2). q(X) :- p(X). -r(X) :- q(X). #show t(X) : q(X).",
+])
+def test_batched_justification_matches_single_model_justification(load_analyzer, program):
+    analyzer = load_analyzer(program)
+    sorted_program = analyzer.get_sorted_program()
+    reified = reify_list(sorted_program,
+                         h_str=analyzer.get_conflict_free_h(),
+                         h_showTerm_str=analyzer.get_conflict_free_h_showTerm(),
+                         model_str=analyzer.get_conflict_free_model(),
+                         conflict_free_showTerm_str=analyzer.get_conflict_free_showTerm(),
+                         get_conflict_free_variable_str=analyzer.get_conflict_free_variable,
+                         clear_temp_names=analyzer.clear_temp_names)
+    saved_models = get_stable_models_for_program(program)
+    facts = analyzer.get_facts({})
+    h, h_showTerm = analyzer.get_conflict_free_h(), analyzer.get_conflict_free_h_showTerm()
+
+    batched = get_h_symbols_from_models(saved_models, reified, facts,
+                                        analyzer.get_constants(), h,
+                                        h_showTerm,
+                                        analyzer.get_conflict_free_model())
+    assert len(batched) == len(saved_models)
+    for model, h_symbols in zip(saved_models, batched):
+        single = get_h_symbols_from_model(model, reified, facts,
+                                          analyzer.get_constants(), h,
+                                          h_showTerm)
+        assert set(h_symbols) == set(single)
+
+
+@pytest.mark.parametrize("program", [
+    "a(1..3). {b(X)} :- a(X). c(X) :- b(X).",
+    "e(1,2). e(2,3). {s(1..3)}. r(X) :- s(X). r(Y) :- r(X), e(X,Y).",
+])
+def test_parallel_graph_construction_matches_sequential(load_analyzer, program):
+    analyzer = load_analyzer(program)
+    sorted_program = analyzer.get_sorted_program()
+    reified = reify_list(sorted_program,
+                         h_str=analyzer.get_conflict_free_h(),
+                         h_showTerm_str=analyzer.get_conflict_free_h_showTerm(),
+                         model_str=analyzer.get_conflict_free_model(),
+                         conflict_free_showTerm_str=analyzer.get_conflict_free_showTerm(),
+                         get_conflict_free_variable_str=analyzer.get_conflict_free_variable,
+                         clear_temp_names=analyzer.clear_temp_names)
+    saved_models = get_stable_models_for_program(program)
+    recursion_rules = analyzer.check_positive_recursion()
+
+    def graph_signature(g: nx.DiGraph):
+        def node_signature(node: Node):
+            return (node.rule_nr, frozenset(s.symbol for s in node.diff),
+                    frozenset(s.symbol for s in node.atoms),
+                    tuple(map(node_signature, node.recursive)))
+        return (Counter(map(node_signature, g.nodes)),
+                Counter((node_signature(u), node_signature(v))
+                        for u, v in g.edges))
+
+    sequential = build_graph(saved_models, reified, sorted_program, analyzer,
+                             recursion_rules, {}, jobs=1)
+    parallel = build_graph(saved_models, reified, sorted_program, analyzer,
+                           recursion_rules, {}, jobs=2)
+    assert graph_signature(sequential) == graph_signature(parallel)
+
+    # the pool of the process is reused
+    pool = justify._reason_pool
+    parallel = build_graph(saved_models, reified, sorted_program, analyzer,
+                           recursion_rules, {}, jobs=2)
+    assert justify._reason_pool is pool
+    assert graph_signature(sequential) == graph_signature(parallel)
+    # multiprocessing itself still pickles symbols as they are
+    assert Symbol not in ForkingPickler._extra_reducers
+
+
+@pytest.mark.parametrize("program", [
+    "a(1..2). {b(X)} :- a(X). c(X) :- b(X).",
+    "a(1..4). {b(X)} :- a(X). c(X) :- b(X). {d(X)} :- c(X).",
+])
+def test_layout_matches_dense_adjacency_layout(get_sort_program_and_get_graph, program):
+    graph_info, _ = get_sort_program_and_get_graph(program)
+    graph = graph_info[0]
+    dense = igraph.Graph.Adjacency(
+        (np.array(nx.to_numpy_array(graph)) > 0).tolist())
+
+    assert get_node_positions(graph) == make_node_positions(graph, dense)
+
+
 def test_multiple_sortings_yield_primary_sort(load_analyzer):
     program= """
     e. f. g.
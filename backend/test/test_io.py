@@ -6,7 +6,7 @@ import clingo.ast
 from clingo import Control, ModelType
 
 from viasp.shared.util import get_compatible_node_link_data
-from viasp.shared.io import clingo_model_to_stable_model
+from viasp.shared.io import clingo_model_to_stable_model, to_compact_json, parse_symbols, _symbol_cache, encode_object, object_encoders
 from viasp.shared.model import RuleContainer, StableModel, ClingoMethodCall, Signature, Transformation, TransformationError, \
     FailedReason
 from viasp.server.models import CurrentGraphs, Graphs
@@ -44,6 +44,58 @@ def test_serialization_model(app_context):
         assert isinstance(model, StableModel)
 
 
+def test_compact_serialization_model(app_context):
+    ctl = Control(["0"])
+    ctl.add("base", [], "{a(1..2)}. b(X) :- a(X). c(\"x, y\"). d(-1). #show e : a(1).")
+    ctl.ground([("base", [])])
+    saved = []
+    with ctl.solve(yield_=True) as h: # type: ignore
+        for model in h:
+            saved.append(clingo_model_to_stable_model(model))
+    serialized = to_compact_json(saved)
+    assert len(serialized) < len(current_app.json.dumps(saved))
+    deserialized = current_app.json.loads(serialized)
+    assert deserialized == saved
+    for model, saved_model in zip(deserialized, saved):
+        assert model.shown == saved_model.shown
+
+
+def test_compact_serialization_graph(get_sort_program_and_get_graph):
+    program = "c(1). c(2). b(X) :- c(X). a(X) :- b(X)."
+    graph_info, _ = get_sort_program_and_get_graph(program)
+    graph = graph_info[0]
+
+    serialized_graph = to_compact_json(get_compatible_node_link_data(graph))
+    assert len(serialized_graph) < len(current_app.json.dumps(get_compatible_node_link_data(graph)))
+    loaded_graph = node_link_graph(current_app.json.loads(serialized_graph))
+    assert nx.is_isomorphic(loaded_graph, graph)
+    for loaded_node, node in zip(loaded_graph.nodes(), graph.nodes()):
+        assert loaded_node == node
+        assert {(a.symbol, a.uuid) for a in loaded_node.atoms} == {(a.symbol, a.uuid) for a in node.atoms}
+
+
+def test_parsed_symbols_are_interned():
+    symbols = parse_symbols(["f(1)", "#sup", "f(1)", "(a,\"b,c\")"])
+    assert list(map(str, symbols)) == ["f(1)", "#sup", "f(1)", "(a,\"b,c\")"]
+    assert symbols[0] is _symbol_cache["f(1)"]
+    assert parse_symbols(["f(1)"])[0] is symbols[0]
+
+
+def test_encoders_are_resolved_once_per_class(app_context):
+    class Subgraph(nx.DiGraph):
+        pass
+
+    graph = Subgraph()
+    graph.add_edge(1, 2)
+    assert Subgraph not in object_encoders
+    assert encode_object(graph)["_type"] == "Graph"
+    assert Subgraph in object_encoders
+    loaded = current_app.json.loads(current_app.json.dumps({"graph": graph, "nodes": {1, 2}, "edge": (1, 2)}))
+    assert list(loaded["graph"].edges()) == [(1, 2)]
+    assert sorted(loaded["nodes"]) == [1, 2]
+    assert loaded["edge"] == [1, 2]
+
+
 def test_serialization_calls(clingo_call_run_sample, app_context):
     serialized = current_app.json.dumps(clingo_call_run_sample)
     deserialized = current_app.json.loads(serialized)
@@ -3,11 +3,13 @@ from inspect import Signature, signature
 from typing import Any, Collection, Dict, Sequence
 import io
 import sys
+import time
 
 from clingo import Control as InnerControl
 from flask.testing import FlaskClient
 from flask import current_app
 import pytest
+import requests
 
 from viasp import wrapper
 import viasp.api
@@ -71,6 +73,42 @@ class DebugClient(ViaspClient):
         pass
 
 
+class BatchingDebugClient(DebugClient):
+
+    def __init__(self, internal_client: FlaskClient, *args, **kwargs):
+        self.batches = []
+        super().__init__(internal_client, *args, **kwargs)
+
+    def register_function_calls(self, calls: Sequence[ClingoMethodCall]):
+        self.batches.append(len(calls))
+        self.client.post("control/add_call", json=list(calls))
+
+
+class RecordingDebugClient(DebugClient):
+
+    def __init__(self, internal_client: FlaskClient, *args, **kwargs):
+        self.batches = []
+        super().__init__(internal_client, *args, **kwargs)
+
+    def register_function_calls(self, calls: Sequence[ClingoMethodCall]):
+        # called from the timer thread of the buffer, outside of the app context
+        self.batches.append([call.name for call in calls])
+
+
+class StreamingDebugClient(DebugClient):
+
+    def __init__(self, internal_client: FlaskClient, *args, **kwargs):
+        self.streamed = []
+        super().__init__(internal_client, *args, **kwargs)
+
+    def stream_target_stable_models(self, stable_models: Collection[StableModel]):
+        self.streamed.append(len(stable_models))
+        body = "".join(current_app.json.dumps(m) + "\n" for m in stable_models)
+        with self.client.post("control/models/stream", data=body,
+                              content_type="application/x-ndjson") as r:
+            r.get_data()
+
+
 def test_load_program_file(unique_session):
     sample_encoding = str(pathlib.Path(__file__).parent.resolve() / "resources" / "sample_encoding.lp")
 
@@ -232,6 +270,55 @@ def test_load_from_stdin(unique_session):
     assert res.json == "sample.{encoding} :- sample."
 
 
+def test_buffered_calls_are_sent_in_batches(unique_session):
+    debug_client = BatchingDebugClient(unique_session)
+    ctl = wrapper.Control(_viasp_client=debug_client,
+                          viasp_call_buffer_size=100,
+                          viasp_call_buffer_timeout=60)
+    for i in range(250):
+        ctl.add("base", [], f"a({i}).")
+    # the __init__ call of the control is buffered as well
+    assert debug_client.batches == [100, 100]
+    res = unique_session.get("control/program")
+    assert res.json == "".join(f"a({i})." for i in range(199))
+
+    ctl.viasp.show()
+    assert debug_client.batches == [100, 100, 51]
+    res = unique_session.get("control/program")
+    assert res.json == "".join(f"a({i})." for i in range(250))
+
+
+def test_large_model_sets_are_streamed(unique_session):
+    debug_client = StreamingDebugClient(unique_session)
+    ctl = wrapper.Control(["0"], _viasp_client=debug_client,
+                          viasp_model_stream_threshold=3)
+    ctl.add("base", [], "{a;b}.")
+    ctl.ground([("base", [])])
+    with ctl.solve(yield_=True) as handle:
+        for m in handle:
+            ctl.viasp.mark(m)
+    ctl.viasp.show()
+    assert debug_client.streamed == [4]
+    res = unique_session.get("control/models")
+    assert len(res.json) == 4
+
+
+def test_buffered_calls_are_sent_after_timeout(unique_session):
+    debug_client = RecordingDebugClient(unique_session)
+    ctl = wrapper.Control(_viasp_client=debug_client,
+                          viasp_call_buffer_size=100,
+                          viasp_call_buffer_timeout=0.2)
+    ctl.add("base", [], "a.")
+    assert debug_client.batches == []
+    # the batch is sent without waiting for another call
+    deadline = time.monotonic() + 5
+    while debug_client.batches == [] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert debug_client.batches == [["__init__", "add"]]
+    ctl.viasp.flush()
+    assert len(debug_client.batches) == 1
+
+
 def test_mark_model_from_string(unique_session):
     debug_client = DebugClient(unique_session)
 
@@ -463,3 +550,31 @@ def test_mix_methods2(unique_session):
     res = unique_session.get("control/models")
     assert res.status_code == 200
     assert len(res.json) == 1
+
+
+def test_clingo_client_checks_health_once_per_liveness_period(monkeypatch):
+    from viasp import clingoApiClient
+    requests_sent = []
+
+    def send(self, request, **kwargs):
+        requests_sent.append((request.method, request.path_url))
+        response = requests.Response()
+        response.status_code = 200
+        response.request = request
+        return response
+
+    url = "http://localhost:5999"
+    monkeypatch.setattr(clingoApiClient.HTTPAdapter, "send", send)
+    monkeypatch.setattr(clingoApiClient, "_alive_until", {})
+    client = clingoApiClient.ClingoClient(viasp_backend_url=url)
+    other_client = clingoApiClient.ClingoClient(viasp_backend_url=url)
+    for _ in range(3):
+        client.register_function_call("load", signature(InnerControl.load), ["a.lp"], {})
+    assert requests_sent.count(("GET", "/healthcheck")) == 1
+    assert requests_sent.count(("POST", "/control/add_call")) == 3
+    assert client.session.get_adapter(url) is other_client.session.get_adapter(url)
+    assert client.session is not other_client.session
+
+    clingoApiClient._alive_until.clear()
+    client.register_function_call("load", signature(InnerControl.load), ["b.lp"], {})
+    assert requests_sent.count(("GET", "/healthcheck")) == 2
@@ -110,6 +110,7 @@ export const SEARCHRESULTSYMBOLWRAPPER = PropTypes.exact({
     isAutocomplete: PropTypes.bool,
     awaitingInput: PropTypes.bool,
     hideInSuggestions: PropTypes.bool,
+    tooBroad: PropTypes.bool,
     color: PropTypes.string,
     recent: PropTypes.bool,
     selected: PropTypes.number,